@@ -0,0 +1,182 @@
+"""Admission control: shed low-priority requests before the DB pool saturates.
+
+Every request path falls into a route class by prefix (longest match wins):
+
+- critical: health checks, auth, order placement and the admission metrics
+  themselves; never shed;
+- low: analytics, CSV import, metrics-heavy admin pages and the sitemap;
+  shed first;
+- normal: everything else;
+- exempt: long-lived streams (the admin order feed) and static files, which
+  are neither counted nor shed.
+
+A request is rejected with 503 and Retry-After when its class already has
+its maximum number of requests in flight, or when the connection pool is
+under more pressure than the class tolerates. Pool pressure is the longer
+of the recent average checkout time (an EWMA fed by TimedQueuePool, decaying
+while nothing checks out) and how long the oldest caller has currently been
+waiting for a connection, so it rises as soon as checkouts start queueing
+rather than after they time out. Low-priority work is turned away first,
+while normal traffic still gets connections; normal traffic is shed too
+before its callers would sit out the whole pool timeout in `get_db`.
+
+Limits of 0 mean unlimited. Everything is configured with LOAD_SHED_*
+variables; LOAD_SHED_ENABLED=false turns the middleware into a pass-through
+that still counts requests.
+"""
+import itertools
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+LOAD_SHED_ENABLED = os.getenv('LOAD_SHED_ENABLED', 'true').lower() == 'true'
+RETRY_AFTER_SECONDS = int(os.getenv('LOAD_SHED_RETRY_AFTER_SECONDS', '5'))
+POOL_WAIT_EWMA_ALPHA = 0.2
+# Without new checkouts the average halves every this many seconds, so an old spike does not shed forever
+POOL_WAIT_HALF_LIFE_SECONDS = 1.0
+
+
+def _paths(name: str, default: str) -> Tuple[str, ...]:
+    return tuple(p.strip() for p in os.getenv(name, default).split(',') if p.strip())
+
+
+ROUTE_CLASS_PATHS: Dict[str, Tuple[str, ...]] = {
+    'critical': _paths('LOAD_SHED_CRITICAL_PATHS', '/health,/api/auth,/api/admin/login,/api/orders,/api/admin/metrics/admission'),
+    'low': _paths(
+        'LOAD_SHED_LOW_PRIORITY_PATHS',
+        '/api/admin/analytics,/api/admin/stats,/api/admin/products/import,/api/admin/metrics,/sitemap.xml,/sitemaps',
+    ),
+    'exempt': _paths('LOAD_SHED_EXEMPT_PATHS', '/api/admin/orders/events,/static'),
+}
+MAX_IN_FLIGHT = {
+    'critical': 0,
+    'normal': int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT_NORMAL', '200')),
+    'low': int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT_LOW', '4')),
+}
+# Pool pressure (seconds) above which a class is shed
+MAX_POOL_WAIT_SECONDS = {
+    'critical': 0,
+    'normal': float(os.getenv('LOAD_SHED_MAX_POOL_WAIT_MS_NORMAL', '2000')) / 1000,
+    'low': float(os.getenv('LOAD_SHED_MAX_POOL_WAIT_MS_LOW', '100')) / 1000,
+}
+
+
+class PoolWaitStats:
+    def __init__(self):
+        self.checkouts = 0
+        self._ewma = 0.0
+        self._ewma_at = time.monotonic()
+        self._waiting: Dict[int, float] = {}
+        self._tokens = itertools.count()
+
+    def average(self) -> float:
+        idle = time.monotonic() - self._ewma_at
+        return self._ewma * 0.5 ** (idle / POOL_WAIT_HALF_LIFE_SECONDS)
+
+    def started(self) -> int:
+        token = next(self._tokens)
+        self._waiting[token] = time.monotonic()
+        return token
+
+    def finished(self, token: int) -> None:
+        now = time.monotonic()
+        waited = now - self._waiting.pop(token)
+        average = self.average()
+        self._ewma = average + POOL_WAIT_EWMA_ALPHA * (waited - average)
+        self._ewma_at = now
+        self.checkouts += 1
+
+    def pressure(self) -> float:
+        """Seconds: recent average checkout time, or the current longest wait if that is longer."""
+        if not self._waiting:
+            return self.average()
+        return max(self.average(), time.monotonic() - min(self._waiting.values()))
+
+    def stats(self) -> dict:
+        return {
+            'checkout_ms_ewma': round(self.average() * 1000, 2),
+            'waiting': len(self._waiting),
+            'pressure_ms': round(self.pressure() * 1000, 2),
+            'checkouts': self.checkouts,
+        }
+
+
+pool_wait = PoolWaitStats()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, timing every checkout into pool_wait."""
+
+    def _do_get(self):
+        token = pool_wait.started()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.finished(token)
+
+
+def route_class(path: str) -> str:
+    best, best_length = 'normal', 0
+    for name, prefixes in ROUTE_CLASS_PATHS.items():
+        for prefix in prefixes:
+            if path.startswith(prefix) and len(prefix) > best_length:
+                best, best_length = name, len(prefix)
+    return best
+
+
+in_flight = {'critical': 0, 'normal': 0, 'low': 0}
+shed = {'critical': 0, 'normal': 0, 'low': 0}
+
+
+def rejection_reason(name: str) -> Optional[str]:
+    limit = MAX_IN_FLIGHT[name]
+    if limit and in_flight[name] >= limit:
+        return 'too many requests in flight'
+    max_wait = MAX_POOL_WAIT_SECONDS[name]
+    if max_wait and pool_wait.pressure() > max_wait:
+        return 'database pool saturated'
+    return None
+
+
+def stats() -> dict:
+    return {'enabled': LOAD_SHED_ENABLED, 'in_flight': dict(in_flight), 'shed': dict(shed), 'pool': pool_wait.stats()}
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or scope.get('method') == 'OPTIONS':
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope.get('path', ''))
+        if name == 'exempt':
+            await self.app(scope, receive, send)
+            return
+
+        reason = rejection_reason(name) if LOAD_SHED_ENABLED else None
+        if reason is not None:
+            shed[name] += 1
+            body = json.dumps({'detail': f'Server busy ({reason}), retry shortly'}).encode()
+            await send({
+                'type': 'http.response.start',
+                'status': 503,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode()),
+                    (b'retry-after', str(RETRY_AFTER_SECONDS).encode()),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        in_flight[name] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight[name] -= 1
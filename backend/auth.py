@@ -62,6 +62,17 @@ async def get_current_user(request: Request):
 
     return payload
 
+async def get_optional_user(request: Request):
+    """The logged-in customer's token payload, or None for guests (never raises)."""
+    token = request.cookies.get("access_token")
+    if not token:
+        return None
+    try:
+        payload = decode_token(token)
+    except HTTPException:
+        return None
+    return payload if payload.get("role") == "user" else None
+
 async def get_current_admin(request: Request):
     token = request.cookies.get("access_token")
 
@@ -0,0 +1,367 @@
+"""Load-testing benchmark for the storefront, checkout and admin hot paths.
+
+Drives the FastAPI app either in-process (httpx ASGI transport, no network) or
+against a running server, at several concurrency levels, and reports throughput
+and p50/p95/p99 latency per scenario. Results are written as JSON so two runs
+can be compared and regressions flagged.
+
+Usage (from the backend directory):
+    python benchmark.py --populate                      # seed data, run in-process
+    python benchmark.py --target http://localhost:8010  # against a running uvicorn
+    python benchmark.py --compare ../test_reports/benchmarks/baseline.json
+    python benchmark.py --serialization 1000            # response serialization CPU only
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Never send real confirmation emails, hit the rate limiter or shed load while benchmarking
+os.environ['GMAIL_APP_PASSWORD'] = ''
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+os.environ.setdefault('LOAD_SHED_ENABLED', 'false')
+
+import httpx
+from sqlalchemy import select, func, update, desc
+
+import synthetic_data
+from auth import create_access_token
+from database import AsyncSessionLocal, Category, Product, User, Order
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_OUTPUT_DIR = ROOT_DIR.parent / 'test_reports' / 'benchmarks'
+
+
+SCENARIOS = {
+    'products': {'method': 'GET', 'path': '/api/products'},
+    'products_by_category': {'method': 'GET', 'path': '/api/products?category_id={category_id}'},
+    'product_detail': {'method': 'GET', 'path': '/api/products/{product_id}'},
+    'cities': {'method': 'GET', 'path': '/api/locations/cities?state_code=MH&q=pu'},
+    'create_order': {'method': 'POST', 'path': '/api/orders', 'auth': 'user'},
+    'my_orders': {'method': 'GET', 'path': '/api/orders/my-orders', 'auth': 'user'},
+    'admin_orders': {'method': 'GET', 'path': '/api/admin/orders', 'auth': 'admin'},
+    'admin_analytics': {'method': 'GET', 'path': '/api/admin/analytics?range=1y', 'auth': 'admin'},
+}
+
+
+async def seed_benchmark_data(users: int, products: int, orders: int, seed: int = 42) -> None:
+    """Seed a deterministic dataset unless one is already loaded."""
+    async with AsyncSessionLocal() as session:
+        existing = await session.scalar(select(func.count(Order.id)))
+    if existing and existing >= orders:
+        print(f'Found {existing} orders, skipping seed.')
+    else:
+        await synthetic_data.generate(users=users, products=products, orders=orders,
+                                      reviews=orders // 10, seed=seed)
+
+    # Checkout scenarios must never fail on inventory
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(Product).where(Product.stock < 100_000).values(stock=1_000_000))
+        await session.commit()
+
+
+async def resolve_fixtures() -> Dict[str, object]:
+    """Look up ids and tokens the scenarios need from the seeded database."""
+    async with AsyncSessionLocal() as session:
+        # The heaviest customer makes my-orders representative of repeat buyers
+        user_id = await session.scalar(
+            select(Order.user_id).group_by(Order.user_id).order_by(desc(func.count(Order.id))).limit(1)
+        )
+        user = await session.get(User, user_id) if user_id else None
+        if not user or user.state != 'Maharashtra':
+            user = await session.scalar(select(User).where(User.state == 'Maharashtra').limit(1))
+        if not user:
+            raise SystemExit('No seeded users found; run with --populate first.')
+        product_ids = list((await session.execute(select(Product.id).limit(500))).scalars())
+        category_ids = list((await session.execute(select(Category.id))).scalars())
+
+    return {
+        'product_ids': product_ids,
+        'category_ids': category_ids,
+        'user_cookie': 'access_token=' + create_access_token({'user_id': user.id, 'email': user.email}, role='user'),
+        'admin_cookie': 'access_token=' + create_access_token({'admin_id': 0, 'username': 'benchmark'}, role='admin'),
+    }
+
+
+def build_request(name: str, fixtures: Dict[str, object], rng: random.Random):
+    scenario = SCENARIOS[name]
+    path = scenario['path'].format(
+        product_id=rng.choice(fixtures['product_ids']),
+        category_id=rng.choice(fixtures['category_ids']),
+    )
+    headers = {}
+    if scenario.get('auth'):
+        headers['Cookie'] = fixtures[f"{scenario['auth']}_cookie"]
+
+    body = None
+    if name == 'create_order':
+        body = {
+            'items': [
+                {'product_id': product_id, 'quantity': 1}
+                for product_id in rng.sample(fixtures['product_ids'], min(3, len(fixtures['product_ids'])))
+            ],
+            'customer_name': 'Benchmark User',
+            'phone': '9999999999',
+            'address': '1 Benchmark Lane',
+            'city': 'Pune',
+            'state': 'Maharashtra',
+            'pincode': '411001',
+        }
+    return scenario['method'], path, headers, body
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, fixtures, concurrency: int,
+                       total_requests: int, seed: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = total_requests
+    rng = random.Random(f'{seed}-{name}-{concurrency}')
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, path, headers, body = build_request(name, fixtures, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+def make_client(target: str, concurrency: int) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if target == 'inprocess':
+        from server import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark', timeout=60)
+    return httpx.AsyncClient(base_url=target, limits=limits, timeout=60)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare_results(baseline: dict, current: dict, threshold_pct: float) -> List[str]:
+    """Return a message per scenario/concurrency whose p95 or throughput regressed."""
+    previous = {(r['scenario'], r['concurrency']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous.get((result['scenario'], result['concurrency']))
+        if not before:
+            continue
+        label = f"{result['scenario']} @ c={result['concurrency']}"
+        if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + threshold_pct / 100.0):
+            regressions.append(f"{label}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+        if before['throughput_rps'] and result['throughput_rps'] < before['throughput_rps'] * (1 - threshold_pct / 100.0):
+            regressions.append(f"{label}: throughput {before['throughput_rps']} -> {result['throughput_rps']} rps")
+    return regressions
+
+
+def sample_payloads(items: int, seed: int) -> Dict[str, list]:
+    """Product and order payloads shaped exactly like the list handlers build them."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    products = [{
+        'id': i,
+        'name': f'Product {i}',
+        'description': 'Certified organic product for healthy soil and crops. ' * rng.randint(1, 5),
+        'category_id': rng.randint(1, 8),
+        'category_name': 'Organic Seeds',
+        'price': round(rng.uniform(49, 2499), 2),
+        'stock': rng.randint(0, 1000),
+        'image_url': f'/static/uploads/{i}.png',
+        'is_featured': rng.random() < 0.05,
+        'created_at': now,
+    } for i in range(items)]
+    orders = [{
+        'id': i,
+        'order_number': f'ORD-{i:08X}',
+        'customer_name': 'Ramesh Patil',
+        'email': 'ramesh@example.com',
+        'phone': '9999999999',
+        'address': '1 Farm Road',
+        'city': 'Pune',
+        'state': 'Maharashtra',
+        'pincode': '411001',
+        'total_amount': 1299.0,
+        'status': 'delivered',
+        'notes': None,
+        'created_at': now,
+        'items': [{'id': i * 10 + j, 'product_id': j, 'product_name': f'Product {j}', 'quantity': 2,
+                   'price': 649.5, 'subtotal': 1299.0} for j in range(rng.randint(1, 4))],
+    } for i in range(items)]
+    return {'products': products, 'orders': orders}
+
+
+async def run_serialization_benchmark(items: int, rounds: int, seed: int) -> List[dict]:
+    """Compare CPU time of FastAPI's validate+json path with the orjson fast path."""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    import fast_json
+    from server import ProductResponse, OrderResponse
+
+    payloads = sample_payloads(items, seed)
+    models = {'products': ProductResponse, 'orders': OrderResponse}
+    results = []
+    for name, payload in payloads.items():
+        field = create_response_field(name=f'bench_{name}', type_=List[models[name]])
+
+        started = time.process_time()
+        for _ in range(rounds):
+            content = await serialize_response(field=field, response_content=payload)
+            default_body = JSONResponse(content).body
+        default_ms = (time.process_time() - started) * 1000.0 / rounds
+
+        started = time.process_time()
+        for _ in range(rounds):
+            fast_body = fast_json.dumps(payload)
+        fast_ms = (time.process_time() - started) * 1000.0 / rounds
+
+        result = {
+            'payload': name,
+            'items': items,
+            'default_cpu_ms': round(default_ms, 3),
+            'fast_cpu_ms': round(fast_ms, 3),
+            'saved_cpu_ms_per_1000_items': round((default_ms - fast_ms) * 1000.0 / items, 3),
+            'speedup': round(default_ms / fast_ms, 1) if fast_ms else None,
+            'identical_json': json.loads(default_body) == json.loads(fast_body),
+        }
+        results.append(result)
+        print(f"{name:10} items={items}  default={result['default_cpu_ms']} ms  fast={result['fast_cpu_ms']} ms  "
+              f"saved/1000 items={result['saved_cpu_ms_per_1000_items']} ms  x{result['speedup']}")
+    return results
+
+
+async def run_benchmark(args) -> dict:
+    if args.target == 'inprocess':
+        import migrate
+        from server import startup
+        await migrate.upgrade()
+        await migrate.sync_seed_data()
+        await startup()
+    if args.populate:
+        await seed_benchmark_data(args.users, args.products, args.orders, args.seed)
+
+    fixtures = await resolve_fixtures()
+    concurrency_levels = [int(c) for c in args.concurrency.split(',')]
+    scenarios = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+
+    results = []
+    for concurrency in concurrency_levels:
+        async with make_client(args.target, concurrency) as client:
+            for name in scenarios:
+                # Warm caches, connection pool and prepared statements
+                await run_scenario(client, name, fixtures, concurrency, min(args.warmup, args.requests), args.seed)
+                result = await run_scenario(client, name, fixtures, concurrency, args.requests, args.seed)
+                results.append(result)
+                print(f"{name:22} c={concurrency:<4} {result['throughput_rps']:>9} rps  "
+                      f"p50={result['p50_ms']:>8} ms  p95={result['p95_ms']:>8} ms  "
+                      f"p99={result['p99_ms']:>8} ms  errors={result['errors']}")
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'target': args.target,
+        'seed': args.seed,
+        'requests_per_scenario': args.requests,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Samruddhi Organics API')
+    parser.add_argument('--target', default='inprocess', help="'inprocess' or a base URL such as http://localhost:8010")
+    parser.add_argument('--scenarios', default='', help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', default='1,10,50', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario and concurrency level')
+    parser.add_argument('--warmup', type=int, default=50, help='warm-up requests (not measured)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--populate', action='store_true', help='seed the benchmark dataset first')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT_DIR), help='directory for the JSON results')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    parser.add_argument('--regression-threshold', type=float, default=15.0, help='allowed slowdown in percent')
+    parser.add_argument('--serialization', type=int, metavar='ITEMS',
+                        help='only measure response serialization CPU for ITEMS-long lists')
+    parser.add_argument('--rounds', type=int, default=50, help='rounds for --serialization')
+    args = parser.parse_args()
+
+    if args.serialization:
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'serialization': asyncio.run(run_serialization_benchmark(args.serialization, args.rounds, args.seed)),
+        }
+        output_dir = Path(args.output)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / f"serialization-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        output_path.write_text(json.dumps(report, indent=2))
+        print(f'Results written to {output_path}')
+        return
+
+    report = asyncio.run(run_benchmark(args))
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, indent=2))
+    print(f'Results written to {output_path}')
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare_results(baseline, report, args.regression_threshold)
+        if regressions:
+            print('Regressions detected:')
+            for message in regressions:
+                print(f'  {message}')
+            sys.exit(1)
+        print('No regressions against baseline.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+In-process caches register an evict function per namespace. A writer calls
+`publish(namespace, keys)` after committing: the local cache is evicted at
+once, and the keys are queued for the other workers. `run_publisher`
+coalesces what was published in the last PUBLISH_DELAY_SECONDS into one
+NOTIFY per namespace, so a burst of writes costs one round trip and no
+request waits on it. Every worker's pg_notify listener receives the message
+and evicts locally; a worker ignores its own messages.
+
+Notifications are not queued for a listener that is disconnected, so every
+(re)connect evicts all registered caches, and while the listener is down
+`reliable()` is False and caches fall back to short TTLs. Without Postgres
+(sqlite in development, a single process) local eviction is all there is
+and `reliable()` is True.
+
+Payloads are JSON {"o": origin, "n": namespace, "k": [keys] or null}; null
+(or more than MAX_KEYS_PER_MESSAGE keys) evicts the whole namespace.
+"""
+import asyncio
+import json
+import os
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+
+from database import engine
+import pg_notify
+
+CACHE_BUS_CHANNEL = 'cache_invalidation'
+PUBLISH_DELAY_SECONDS = float(os.getenv('CACHE_BUS_PUBLISH_DELAY_SECONDS', '0.05'))
+MAX_KEYS_PER_MESSAGE = 500
+RETRY_SECONDS = 1
+
+# Namespaces of the caches in this codebase
+CATALOG = 'catalog'
+SITEMAP = 'sitemap'
+PRODUCT_LISTS = 'product_lists'
+CATEGORIES = 'categories'
+
+ORIGIN = uuid.uuid4().hex[:12]
+
+_evictors: Dict[str, List[Callable[[Optional[list]], None]]] = {}
+# namespace -> keys to send, or None for the whole namespace
+_pending: Dict[str, Optional[set]] = {}
+_pending_event = asyncio.Event()
+stats = {'published': 0, 'received': 0, 'full_evictions': 0}
+
+
+def register(namespace: str, evict: Callable[[Optional[list]], None]) -> None:
+    """evict(keys) drops the given keys from a local cache, or everything when keys is None."""
+    _evictors.setdefault(namespace, []).append(evict)
+
+
+def reliable() -> bool:
+    """Whether evictions published by other workers are currently being received."""
+    return not pg_notify.is_postgres() or pg_notify.listener.connected
+
+
+def _evict_local(namespace: str, keys: Optional[list]) -> None:
+    for evict in _evictors.get(namespace, ()):
+        try:
+            evict(keys)
+        except Exception as e:
+            print(f"Cache eviction for {namespace} failed: {e}")
+
+
+def _queue(namespace: str, keys: Optional[Iterable]) -> None:
+    if keys is None or (namespace in _pending and _pending[namespace] is None):
+        _pending[namespace] = None
+    else:
+        _pending.setdefault(namespace, set()).update(keys)
+
+
+def publish(namespace: str, keys: Optional[Iterable] = None) -> None:
+    """Evict keys (or the whole namespace) here now and on every other worker shortly."""
+    keys = None if keys is None else list(keys)
+    _evict_local(namespace, keys)
+    if pg_notify.is_postgres():
+        _queue(namespace, keys)
+        _pending_event.set()
+
+
+def _messages(pending: Dict[str, Optional[set]]) -> List[str]:
+    messages = []
+    for namespace, keys in pending.items():
+        if keys is not None and len(keys) > MAX_KEYS_PER_MESSAGE:
+            keys = None
+        messages.append(json.dumps({'o': ORIGIN, 'n': namespace, 'k': None if keys is None else sorted(keys)}))
+    return messages
+
+
+async def flush() -> None:
+    """Send everything published so far (scripts call this before exiting)."""
+    if not _pending:
+        return
+    pending = dict(_pending)
+    _pending.clear()
+    try:
+        async with engine.connect() as conn:
+            for message in _messages(pending):
+                await conn.execute(select(func.pg_notify(CACHE_BUS_CHANNEL, message)))
+            await conn.commit()
+    except Exception:
+        # Put the keys back (merged with anything published meanwhile) for the next attempt
+        for namespace, keys in pending.items():
+            _queue(namespace, keys)
+        raise
+    stats['published'] += len(pending)
+
+
+async def run_publisher() -> None:
+    while True:
+        try:
+            await _pending_event.wait()
+            _pending_event.clear()
+            await asyncio.sleep(PUBLISH_DELAY_SECONDS)
+            await flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Cache invalidation publish failed: {e}")
+            _pending_event.set()
+            await asyncio.sleep(RETRY_SECONDS)
+
+
+def _on_message(payload: str) -> None:
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    if message.get('o') == ORIGIN:
+        return
+    stats['received'] += 1
+    _evict_local(message.get('n'), message.get('k'))
+
+
+async def _evict_everything() -> None:
+    # Whatever was published while nobody was listening is lost
+    stats['full_evictions'] += 1
+    for namespace in list(_evictors):
+        _evict_local(namespace, None)
+
+
+pg_notify.listener.subscribe(CACHE_BUS_CHANNEL, _on_message)
+pg_notify.listener.on_connect(_evict_everything)
@@ -0,0 +1,209 @@
+"""Per-process cache of the product fields needed to price a cart.
+
+Entries hold a product's name, image, price and available stock, keyed by
+id. `get_products` answers from the cache and loads every missing id with one
+query, so a warm cart quote costs no queries at all. A logged-in customer's
+own holds are not shared, so they are never cached: they are joined into the
+miss query, or read with one small query when every product was cached.
+
+Admin product changes, orders and reservations call `invalidate()` for the
+products they touched after committing, which evicts them here and, through
+cache_bus, on every other worker. Entries live for CATALOG_CACHE_TTL_SECONDS
+while the bus is delivering evictions and only CATALOG_CACHE_FALLBACK_TTL_SECONDS
+while it is not, checked on read so existing entries shorten too. Quoted
+stock stays advisory either way: reservations and order placement re-check
+it with the authoritative conditional UPDATE.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from database import InventoryReservation, Product
+from reservations import available_stock, held_quantities
+import cache_bus
+
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv('CATALOG_CACHE_TTL_SECONDS', '300'))
+CATALOG_CACHE_FALLBACK_TTL_SECONDS = float(os.getenv('CATALOG_CACHE_FALLBACK_TTL_SECONDS', '5'))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '10000'))
+
+CATALOG_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.image_url,
+    Product.price,
+    available_stock().label('available_stock'),
+)
+
+
+class CatalogCache:
+    """LRU of product records with a TTL."""
+
+    def __init__(self, ttl: float, fallback_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # Bumped by every invalidation so a load that raced with it is not stored
+        self.generation = 0
+        # product id -> future of the in-flight load that includes it
+        self.loading: Dict[int, asyncio.Future] = {}
+        self._entries: 'OrderedDict[int, Tuple[float, dict]]' = OrderedDict()
+
+    def current_ttl(self) -> float:
+        return self.ttl if cache_bus.reliable() else self.fallback_ttl
+
+    def get_many(self, ids: Iterable[int]) -> Tuple[Dict[int, dict], list]:
+        # Entries keep their load time, so a fallback to the short TTL applies to them at once
+        oldest = time.monotonic() - self.current_ttl()
+        found, missing = {}, []
+        for product_id in ids:
+            entry = self._entries.get(product_id)
+            if entry is None or entry[0] <= oldest:
+                missing.append(product_id)
+                continue
+            self._entries.move_to_end(product_id)
+            found[product_id] = entry[1]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, records: Iterable[dict], generation: int) -> None:
+        if generation != self.generation:
+            return
+        loaded_at = time.monotonic()
+        for record in records:
+            self._entries[record['id']] = (loaded_at, record)
+            self._entries.move_to_end(record['id'])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, ids: Optional[Iterable[int]] = None) -> None:
+        """Drop the given products, or everything when ids is None."""
+        self.generation += 1
+        # Later requests must not join a load that may predate the change
+        if ids is None:
+            self._entries.clear()
+            self.loading.clear()
+            return
+        for product_id in ids:
+            self._entries.pop(product_id, None)
+            self.loading.pop(product_id, None)
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+            'ttl_seconds': self.current_ttl(), 'bus': cache_bus.stats,
+        }
+
+
+catalog_cache = CatalogCache(CATALOG_CACHE_TTL_SECONDS, CATALOG_CACHE_FALLBACK_TTL_SECONDS, CATALOG_CACHE_MAX_ENTRIES)
+cache_bus.register(cache_bus.CATALOG, catalog_cache.invalidate)
+
+
+def invalidate(ids: Optional[Iterable[int]] = None) -> None:
+    """Evict the products (or everything) on this worker and the others."""
+    cache_bus.publish(cache_bus.CATALOG, ids)
+
+
+def _load_query(ids: List[int], user_id: Optional[int] = None, other_ids: List[int] = ()):
+    """Catalog rows for ids; with user_id, plus that user's held quantity of ids and other_ids."""
+    if user_id is None:
+        return select(*CATALOG_COLUMNS).where(Product.id.in_(ids))
+    return (
+        select(*CATALOG_COLUMNS, InventoryReservation.quantity.label('held'))
+        .outerjoin(InventoryReservation, and_(
+            InventoryReservation.product_id == Product.id, InventoryReservation.user_id == user_id,
+        ))
+        # Rows for other_ids are only wanted for their holds
+        .where(
+            Product.id.in_([*ids, *other_ids]),
+            or_(Product.id.in_(ids), InventoryReservation.quantity.is_not(None)),
+        )
+    )
+
+
+async def _load(db, ids: List[int], user_id: Optional[int] = None,
+                other_ids: List[int] = ()) -> Tuple[Dict[int, dict], Dict[int, int]]:
+    """Query ids, letting concurrent requests for any of them await this load instead.
+
+    Returns (records, held); held is user_id's reserved quantity per product
+    among ids and other_ids, read in the same query.
+    """
+    future = asyncio.get_running_loop().create_future()
+    for product_id in ids:
+        catalog_cache.loading[product_id] = future
+    generation = catalog_cache.generation
+    wanted = set(ids)
+    loaded, held = [], {}
+    try:
+        result = await db.execute(_load_query(ids, user_id, other_ids))
+        for row in result.mappings():
+            record = dict(row, price=float(row['price']))
+            quantity = record.pop('held', None)
+            if quantity is not None:
+                held[record['id']] = quantity
+            if record['id'] in wanted:
+                loaded.append(record)
+    except BaseException as e:
+        future.set_exception(e if isinstance(e, Exception) else RuntimeError('catalog load cancelled'))
+        # Marks the exception retrieved when no other request was waiting
+        future.exception()
+        raise
+    finally:
+        for product_id in ids:
+            if catalog_cache.loading.get(product_id) is future:
+                del catalog_cache.loading[product_id]
+    catalog_cache.put_many(loaded, generation)
+    records = {record['id']: record for record in loaded}
+    future.set_result(records)
+    return records, held
+
+
+async def get_products(db, ids: Iterable[int], user_id: Optional[int] = None) -> Tuple[Dict[int, dict], Dict[int, int]]:
+    """(records, held) for the ids that exist, from the cache plus at most one query.
+
+    held is user_id's reserved quantity per product (empty without a user);
+    it comes from the query that loads the missing ids, or from one query of
+    its own when every record was cached. Ids that another request is already
+    loading are awaited rather than queried again, so a burst of quotes for
+    the same products after they expire costs one query. If that load fails
+    the ids are queried here.
+    """
+    ids = list(ids)
+    found, missing = catalog_cache.get_many(ids)
+    if not missing:
+        held = await held_quantities(db, user_id, ids) if user_id is not None and found else {}
+        return found, held
+    joined: Dict[asyncio.Future, List[int]] = defaultdict(list)
+    to_load = []
+    for product_id in missing:
+        future = catalog_cache.loading.get(product_id)
+        if future is None:
+            to_load.append(product_id)
+        else:
+            joined[future].append(product_id)
+    held = {}
+    if to_load:
+        pending = set(to_load)
+        records, held = await _load(db, to_load, user_id, [i for i in ids if i not in pending])
+        found.update(records)
+    elif user_id is not None:
+        held = await held_quantities(db, user_id, ids)
+    retry = []
+    for future, product_ids in joined.items():
+        catalog_cache.coalesced += len(product_ids)
+        try:
+            records = await asyncio.shield(future)
+        except Exception:
+            retry.extend(product_ids)
+            continue
+        found.update((product_id, records[product_id]) for product_id in product_ids if product_id in records)
+    if retry:
+        found.update((await _load(db, retry))[0])
+    return found, held
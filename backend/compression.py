@@ -0,0 +1,268 @@
+"""Response compression middleware.
+
+Negotiates Brotli or gzip from Accept-Encoding and compresses responses above a
+minimum size. Responses that are already encoded, media that is already
+compressed (images, archives, fonts), partial content and event streams pass
+through untouched.
+
+Compressed bodies for cacheable paths (catalog, locations, sitemap) are kept
+in a small LRU keyed by a digest of the uncompressed body, so identical
+payloads are not recompressed on every hit. Large bodies are compressed in the
+threadpool to keep the event loop responsive.
+
+Brotli is optional: without the `brotli` package only gzip is offered.
+"""
+import gzip
+import hashlib
+import os
+import zlib
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+COMPRESSION_CACHE_ENTRIES = int(os.getenv('COMPRESSION_CACHE_ENTRIES', '256'))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+COMPRESSION_CACHE_PATHS = tuple(
+    p.strip() for p in os.getenv(
+        'COMPRESSION_CACHE_PATHS', '/api/products,/api/categories,/api/locations,/api/reviews,/sitemap'
+    ).split(',') if p.strip()
+)
+
+# Bodies larger than this are compressed in the threadpool
+THREADPOOL_THRESHOLD = 64 * 1024
+# Streamed bodies are buffered up to this size and compressed (and cached) as a
+# whole; beyond it they are compressed incrementally
+MAX_BUFFERED_BODY = 1024 * 1024
+
+SKIP_CONTENT_TYPES = (
+    'image/', 'video/', 'audio/', 'font/woff', 'application/zip', 'application/gzip',
+    'application/x-gzip', 'application/pdf', 'application/octet-stream', 'text/event-stream',
+)
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Supported codings ('br', 'gzip') the client accepts, most preferred first."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+
+    def q_for(coding: str) -> float:
+        return accepted.get(coding, accepted.get('*', 0.0))
+
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    # Stable sort keeps br ahead of gzip on equal q
+    return sorted((c for c in supported if q_for(c) > 0), key=q_for, reverse=True)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q-values."""
+    encodings = accepted_encodings(accept_encoding)
+    return encodings[0] if encodings else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (encoding, digest of the raw body)."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple[str, bytes], bytes]' = OrderedDict()
+
+    def get(self, key) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value: bytes) -> None:
+        if len(value) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = value
+        self.size += len(value)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self) -> dict:
+        return {'entries': len(self._entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
+
+
+compressed_cache = CompressedBodyCache(COMPRESSION_CACHE_ENTRIES, COMPRESSION_CACHE_MAX_BYTES)
+
+
+class _StreamingCompressor:
+    """Incremental compressor for bodies sent in several chunks."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get('accept-encoding', ''))
+        if encoding is None or 'range' in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get('path', '')
+        cacheable = scope.get('method') == 'GET' and path.startswith(COMPRESSION_CACHE_PATHS)
+        responder = _CompressionResponder(send, encoding, self.minimum_size, cacheable)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int, cacheable: bool):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.cacheable = cacheable
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.buffer = bytearray()
+        self.streaming: Optional[_StreamingCompressor] = None
+
+    def _should_skip(self, message: Message) -> bool:
+        headers = Headers(raw=message['headers'])
+        if message['status'] in (204, 206, 304) or 'content-encoding' in headers:
+            return True
+        content_type = headers.get('content-type', '').lower()
+        if content_type.startswith(SKIP_CONTENT_TYPES):
+            return True
+        return 'no-transform' in headers.get('cache-control', '').lower()
+
+    def _compressed_headers(self, content_length: Optional[int]) -> Message:
+        headers = MutableHeaders(raw=self.start_message['headers'])
+        headers['content-encoding'] = self.encoding
+        headers.add_vary_header('Accept-Encoding')
+        etag = headers.get('etag')
+        # The encoded representation differs byte-wise, so a strong validator must not be reused
+        if etag and not etag.startswith('W/'):
+            headers['etag'] = f'W/{etag}'
+        if content_length is None:
+            del headers['content-length']
+        else:
+            headers['content-length'] = str(content_length)
+        return self.start_message
+
+    async def _compress_complete(self, body: bytes) -> bytes:
+        key = None
+        if self.cacheable:
+            key = (self.encoding, hashlib.blake2b(body, digest_size=16).digest())
+            cached = compressed_cache.get(key)
+            if cached is not None:
+                return cached
+        if len(body) >= THREADPOOL_THRESHOLD:
+            compressed = await run_in_threadpool(compress, body, self.encoding)
+        else:
+            compressed = compress(body, self.encoding)
+        if key is not None:
+            compressed_cache.put(key, compressed)
+        return compressed
+
+    async def send(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            self.passthrough = self._should_skip(message)
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message['type'] != 'http.response.body' or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.streaming is not None:
+            data = await self._stream_chunk(body) if body else b''
+            if not more_body:
+                data += self.streaming.finish()
+            await self._send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+            return
+
+        self.buffer.extend(body)
+        if more_body and len(self.buffer) < MAX_BUFFERED_BODY:
+            return
+
+        if not more_body:
+            raw = bytes(self.buffer)
+            if len(raw) < self.minimum_size:
+                headers = MutableHeaders(raw=self.start_message['headers'])
+                headers.add_vary_header('Accept-Encoding')
+                await self._send(self.start_message)
+                await self._send({'type': 'http.response.body', 'body': raw, 'more_body': False})
+                return
+            compressed = await self._compress_complete(raw)
+            await self._send(self._compressed_headers(len(compressed)))
+            await self._send({'type': 'http.response.body', 'body': compressed, 'more_body': False})
+            return
+
+        # A streamed body crossed the threshold: compress incrementally from here on
+        self.streaming = _StreamingCompressor(self.encoding)
+        await self._send(self._compressed_headers(None))
+        data = await self._stream_chunk(bytes(self.buffer))
+        self.buffer.clear()
+        await self._send({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+    async def _stream_chunk(self, data: bytes) -> bytes:
+        if len(data) >= THREADPOOL_THRESHOLD:
+            return await run_in_threadpool(self.streaming.chunk, data)
+        return self.streaming.chunk(data)
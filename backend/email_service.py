@@ -107,3 +107,61 @@ async def send_order_confirmation_email(order_data: dict):
     except Exception as e:
         print(f'Email error: {str(e)}')
         return {'status': 'error', 'message': str(e)}
+
+STATUS_MESSAGES = {
+    'shipped': 'Good news! Your order is on its way.',
+    'delivered': 'Your order has been delivered. We hope you enjoy your purchase.',
+    'cancelled': 'Your order has been cancelled. If you have already paid, the amount will be refunded.',
+}
+
+def _status_update_message(order: dict) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f'Order {order["order_number"]} {order["status"].title()} | Samruddhi Organics'
+    msg['From'] = GMAIL_USER
+    msg['To'] = order['email']
+    html_body = f'''
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #2D342C;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: #F5F1E8; padding: 20px; border-radius: 10px; text-align: center;">
+                <h1 style="color: #4A7C59; margin: 0;">Samruddhi Organics</h1>
+            </div>
+            <div style="padding: 30px 0;">
+                <p>Dear {order['customer_name']},</p>
+                <p>{STATUS_MESSAGES.get(order['status'], 'The status of your order has changed.')}</p>
+                <div style="background: #F5F1E8; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                    <p style="margin: 5px 0;"><strong>Order Number:</strong> {order['order_number']}</p>
+                    <p style="margin: 5px 0;"><strong>Status:</strong> {order['status'].title()}</p>
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
+    '''
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+async def send_order_status_emails(orders: list):
+    """Notify customers of status changes, sending the whole batch over one SMTP connection."""
+    if not orders:
+        return {'status': 'sent', 'sent': 0, 'failed': 0}
+    if not GMAIL_USER or not GMAIL_APP_PASSWORD or GMAIL_APP_PASSWORD == 'your_app_password':
+        print('Email not configured. Skipping email send.')
+        print(f'Order status updates for {len(orders)} orders')
+        return {'status': 'skipped', 'message': 'Email service not configured'}
+    
+    sent = failed = 0
+    try:
+        async with aiosmtplib.SMTP(hostname='smtp.gmail.com', port=587, start_tls=True) as smtp:
+            await smtp.login(GMAIL_USER, GMAIL_APP_PASSWORD)
+            for order in orders:
+                try:
+                    await smtp.send_message(_status_update_message(order))
+                    sent += 1
+                except aiosmtplib.SMTPRecipientsRefused as e:
+                    failed += 1
+                    print(f'Email error for {order["order_number"]}: {str(e)}')
+    except Exception as e:
+        print(f'Email error: {str(e)}')
+        return {'status': 'error', 'message': str(e), 'sent': sent, 'failed': len(orders) - sent}
+    return {'status': 'sent', 'sent': sent, 'failed': failed}
@@ -0,0 +1,45 @@
+"""Opt-in fast JSON responses.
+
+List handlers in server.py already build plain, JSON-ready dicts. By default
+FastAPI validates those dicts again against the route's response_model and
+then serializes them with the stdlib json module, which is two full passes over
+large lists. With FAST_JSON_RESPONSES=true the handlers hand their payload
+straight to orjson instead. The response_model stays on the route, so the
+OpenAPI schema does not change.
+"""
+import os
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+FAST_JSON_RESPONSES = os.getenv('FAST_JSON_RESPONSES', 'false').lower() == 'true'
+
+# UTC datetimes are rendered with a 'Z' suffix, matching pydantic's output
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any):
+    """Return content for normal validation, or a pre-serialized response in fast mode.
+
+    Only use this for payloads that already match the route's response_model.
+    """
+    if not FAST_JSON_RESPONSES:
+        return content
+    return FastJSONResponse(content)
@@ -1,9 +1,34 @@
+"""Sitemap generator.
+
+Writes a sitemap index plus gzip-compressed shards:
+
+    sitemap.xml                      index pointing at every shard
+    sitemaps/sitemap-pages.xml.gz    static routes and category listings
+    sitemaps/sitemap-products-N.xml.gz
+
+Products are bucketed by id into fixed ranges of SITEMAP_SHARD_SIZE (at most
+50,000, the protocol limit), so a product always lands in the same shard.
+XML is streamed straight into the gzip file while paging through products
+with a server-side cursor; no document is ever held in memory.
+
+Runs are incremental: a manifest stores the row count and newest `updated_at`
+per shard, and only shards whose products changed (or were added/removed)
+since the last run are rewritten. Pass --full to rebuild everything.
+
+Usage (from the backend directory):
+    python generate_sitemap.py [--output-dir DIR] [--full]
+"""
+import argparse
+import asyncio
+import gzip
+import json
 import os
 import sys
-import asyncio
 from datetime import datetime
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+from typing import Dict, Iterable, List, Optional
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func
 from sqlalchemy.future import select
 
 # Add current dir to path to import database
@@ -12,79 +37,246 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from database import AsyncSessionLocal
 from database import Product, Category
 
-async def generate_sitemap_async():
-    # Setup base URL
+SITEMAP_PROTOCOL_LIMIT = 50000
+SITEMAP_SHARD_SIZE = min(int(os.getenv('SITEMAP_SHARD_SIZE', str(SITEMAP_PROTOCOL_LIMIT))), SITEMAP_PROTOCOL_LIMIT)
+SITEMAP_FETCH_SIZE = 2000
+
+DEFAULT_OUTPUT_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'public')
+)
+SHARD_DIR = 'sitemaps'
+INDEX_FILE = 'sitemap.xml'
+MANIFEST_FILE = 'sitemap-manifest.json'
+PAGES_SHARD = 'sitemap-pages.xml.gz'
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+
+# List of static routes in the React application
+STATIC_ROUTES = [
+    ('/', '1.0'),
+    ('/products', '0.8'),
+    ('/about', '0.8'),
+    ('/contact', '0.8'),
+    ('/signup', '0.8'),
+    ('/login', '0.8'),
+]
+
+
+def get_base_url() -> str:
     base_url = os.environ.get('FRONTEND_URL', 'https://www.samruddhiorganics.shop')
     if 'localhost' in base_url or '127.0.0.1' in base_url:
         print("Warning: FRONTEND_URL is localhost. Using production domain placeholder for sitemap.")
         base_url = 'https://www.samruddhiorganics.shop'
-    
-    # Create the root element
-    urlset = ET.Element('urlset', xmlns="http://www.sitemaps.org/schemas/sitemap/0.9")
-    
-    # List of static routes in the React application
-    static_routes = [
-        '/',
-        '/products',
-        '/about',
-        '/contact',
-        '/signup',
-        '/login',
-    ]
-    
-    # Add static routes
-    current_time = datetime.now().strftime('%Y-%m-%d')
-    for route in static_routes:
-        url = ET.SubElement(urlset, 'url')
-        loc = ET.SubElement(url, 'loc')
-        loc.text = f"{base_url}{route}"
-        lastmod = ET.SubElement(url, 'lastmod')
-        lastmod.text = current_time
-        priority = ET.SubElement(url, 'priority')
-        priority.text = '1.0' if route == '/' else '0.8'
-        changefreq = ET.SubElement(url, 'changefreq')
-        changefreq.text = 'weekly'
-
-    # Add dynamic products
+    return base_url.rstrip('/')
+
+
+def product_shard_name(bucket: int) -> str:
+    return f'sitemap-products-{bucket + 1}.xml.gz'
+
+
+def format_lastmod(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+def url_entry(loc: str, lastmod: Optional[str], priority: str, changefreq: str = 'weekly') -> str:
+    parts = [f'<url><loc>{escape(loc)}</loc>']
+    if lastmod:
+        parts.append(f'<lastmod>{lastmod}</lastmod>')
+    parts.append(f'<changefreq>{changefreq}</changefreq><priority>{priority}</priority></url>\n')
+    return ''.join(parts)
+
+
+def _open_shard(path: str):
+    # mtime=0 keeps the bytes identical for identical content
+    return gzip.GzipFile(filename=os.path.basename(path), mode='wb', fileobj=open(path, 'wb'), mtime=0)
+
+
+def _close_shard(shard) -> None:
+    fileobj = shard.fileobj
+    shard.close()
+    fileobj.close()
+
+
+def _write_lines(shard, lines: Iterable[str]) -> None:
+    shard.write(''.join(lines).encode('utf-8'))
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _replace_if_changed(tmp_path: str, path: str) -> bool:
+    """Move tmp_path over path unless the content is identical. Returns True if replaced."""
+    if os.path.exists(path):
+        with open(tmp_path, 'rb') as new, open(path, 'rb') as old:
+            if new.read() == old.read():
+                os.remove(tmp_path)
+                return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def load_manifest(output_dir: str) -> Dict:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    # A different shard size moves every product to another file
+    if manifest.get('shard_size') != SITEMAP_SHARD_SIZE:
+        return {}
+    return manifest
+
+
+async def product_buckets(db) -> Dict[int, Dict]:
+    """Row count and newest updated_at for every product id bucket, in one grouped query."""
+    bucket = ((Product.id - 1) // SITEMAP_SHARD_SIZE).label('bucket')
+    result = await db.execute(
+        select(bucket, func.count(Product.id), func.max(Product.updated_at))
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    return {
+        int(row_bucket): {'count': count, 'updated_at': updated_at.isoformat() if updated_at else None}
+        for row_bucket, count, updated_at in result
+    }
+
+
+async def write_product_shard(db, bucket: int, path: str, base_url: str) -> None:
+    first_id = bucket * SITEMAP_SHARD_SIZE + 1
+    stmt = (
+        select(Product.id, Product.updated_at)
+        .where(Product.id.between(first_id, first_id + SITEMAP_SHARD_SIZE - 1))
+        .order_by(Product.id)
+        .execution_options(yield_per=SITEMAP_FETCH_SIZE)
+    )
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shard = await asyncio.to_thread(_open_shard, tmp_path)
+    try:
+        await asyncio.to_thread(_write_lines, shard, [XML_HEADER, URLSET_OPEN])
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            lines = [
+                url_entry(f'{base_url}/products/{product_id}', format_lastmod(updated_at), '0.9')
+                for product_id, updated_at in partition
+            ]
+            await asyncio.to_thread(_write_lines, shard, lines)
+        await asyncio.to_thread(_write_lines, shard, [URLSET_CLOSE])
+    finally:
+        await asyncio.to_thread(_close_shard, shard)
+    await asyncio.to_thread(os.replace, tmp_path, path)
+
+
+async def write_pages_shard(db, path: str, base_url: str) -> bool:
+    """Static routes plus one listing URL per category. Returns True if the file changed."""
+    # Categories have no updated_at of their own; use their newest product
+    result = await db.execute(
+        select(Category.id, func.coalesce(func.max(Product.updated_at), Category.created_at))
+        .outerjoin(Product, Product.category_id == Category.id)
+        .group_by(Category.id, Category.created_at)
+        .order_by(Category.id)
+    )
+    lines = [XML_HEADER, URLSET_OPEN]
+    lines.extend(url_entry(f'{base_url}{route}', None, priority) for route, priority in STATIC_ROUTES)
+    lines.extend(
+        url_entry(f'{base_url}/products?category={category_id}', format_lastmod(lastmod), '0.8')
+        for category_id, lastmod in result
+    )
+    lines.append(URLSET_CLOSE)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    body = gzip.compress(''.join(lines).encode('utf-8'), mtime=0)
+    await asyncio.to_thread(_write_bytes, tmp_path, body)
+    return await asyncio.to_thread(_replace_if_changed, tmp_path, path)
+
+
+def render_index(base_url: str, shards: List[Dict]) -> str:
+    lines = [XML_HEADER, '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for shard in shards:
+        entry = f'<sitemap><loc>{escape(base_url)}/{SHARD_DIR}/{shard["file"]}</loc>'
+        if shard.get('lastmod'):
+            entry += f'<lastmod>{shard["lastmod"]}</lastmod>'
+        lines.append(entry + '</sitemap>\n')
+    lines.append('</sitemapindex>\n')
+    return ''.join(lines)
+
+
+async def generate_sitemap_async(output_dir: str = DEFAULT_OUTPUT_DIR, full: bool = False,
+                                 base_url: Optional[str] = None, shard_base_url: Optional[str] = None) -> Dict:
+    """Bring the sitemap index and shards in output_dir up to date.
+
+    base_url is the storefront the page URLs point at; shard_base_url is where
+    the shards themselves are served (defaults to base_url). Returns a summary
+    with the shards that were rewritten and removed.
+    """
+    base_url = base_url or get_base_url()
+    shard_base_url = (shard_base_url or base_url).rstrip('/')
+    shard_dir = os.path.join(output_dir, SHARD_DIR)
+    await asyncio.to_thread(os.makedirs, shard_dir, exist_ok=True)
+
+    previous = {} if full else await asyncio.to_thread(load_manifest, output_dir)
+    previous_shards = previous.get('shards', {})
+    if previous.get('base_url') != base_url:
+        previous_shards = {}
+
+    written, removed = [], []
     async with AsyncSessionLocal() as db:
-        try:
-            result = await db.execute(select(Product))
-            products = result.scalars().all()
-            for product in products:
-                url = ET.SubElement(urlset, 'url')
-                loc = ET.SubElement(url, 'loc')
-                loc.text = f"{base_url}/products/{product.id}"
-                lastmod = ET.SubElement(url, 'lastmod')
-                # Use updated_at if available, else current date
-                lastmod.text = product.updated_at.strftime('%Y-%m-%d') if product.updated_at else current_time
-                priority = ET.SubElement(url, 'priority')
-                priority.text = '0.9'
-                changefreq = ET.SubElement(url, 'changefreq')
-                changefreq.text = 'weekly'
-                
-            print(f"Added {len(products)} active products to sitemap.")
-                
-        except Exception as e:
-            print(f"Error fetching products: {e}")
-
-    # Pretty print XML
-    xmlstr = minidom.parseString(ET.tostring(urlset)).toprettyxml(indent="  ")
-    
-    # Output file path
-    frontend_public_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'public')
-    output_path = os.path.abspath(os.path.join(frontend_public_dir, 'sitemap.xml'))
-    
-    # Write to file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        # Remove empty lines minidom might add
-        f.write('\n'.join([line for line in xmlstr.split('\n') if line.strip()]))
-        
-    print(f"Successfully generated sitemap at: {output_path}")
-
-def generate_sitemap():
-    asyncio.run(generate_sitemap_async())
+        if await write_pages_shard(db, os.path.join(shard_dir, PAGES_SHARD), base_url) or full:
+            written.append(PAGES_SHARD)
+
+        buckets = await product_buckets(db)
+        shards = {}
+        for bucket, state in buckets.items():
+            name = product_shard_name(bucket)
+            shards[name] = state
+            path = os.path.join(shard_dir, name)
+            if previous_shards.get(name) == state and os.path.exists(path):
+                continue
+            await write_product_shard(db, bucket, path, base_url)
+            written.append(name)
+
+    for name in previous_shards:
+        if name not in shards:
+            try:
+                await asyncio.to_thread(os.remove, os.path.join(shard_dir, name))
+            except FileNotFoundError:
+                pass
+            removed.append(name)
+
+    index_entries = [{'file': PAGES_SHARD, 'lastmod': None}] + [
+        {'file': name, 'lastmod': state['updated_at'][:10] if state['updated_at'] else None}
+        for name, state in shards.items()
+    ]
+    index_path = os.path.join(output_dir, INDEX_FILE)
+    index_tmp = f'{index_path}.{os.getpid()}.tmp'
+    await asyncio.to_thread(_write_bytes, index_tmp, render_index(shard_base_url, index_entries).encode('utf-8'))
+    await asyncio.to_thread(_replace_if_changed, index_tmp, index_path)
+
+    manifest = {'shard_size': SITEMAP_SHARD_SIZE, 'base_url': base_url, 'shards': shards}
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest_tmp = f'{manifest_path}.{os.getpid()}.tmp'
+    await asyncio.to_thread(_write_bytes, manifest_tmp, json.dumps(manifest, indent=2).encode('utf-8'))
+    await asyncio.to_thread(os.replace, manifest_tmp, manifest_path)
+
+    product_count = sum(state['count'] for state in shards.values())
+    print(f"Sitemap: {product_count} products in {len(shards)} shard(s); "
+          f"rewrote {len(written)}, removed {len(removed)}, index at {index_path}")
+    return {'written': written, 'removed': removed, 'shards': len(shards) + 1, 'products': product_count}
+
+
+def generate_sitemap(output_dir: str = DEFAULT_OUTPUT_DIR, full: bool = False):
+    return asyncio.run(generate_sitemap_async(output_dir, full))
+
 
 if __name__ == "__main__":
     from dotenv import load_dotenv
     load_dotenv()
-    generate_sitemap()
+
+    parser = argparse.ArgumentParser(description='Generate the sharded sitemap')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='directory for sitemap.xml and shards')
+    parser.add_argument('--full', action='store_true', help='rewrite every shard, ignoring the manifest')
+    args = parser.parse_args()
+    generate_sitemap(args.output_dir, args.full)
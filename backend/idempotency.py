@@ -0,0 +1,115 @@
+"""Idempotency-Key support for POST endpoints (order creation).
+
+The key is claimed by inserting a row into idempotency_keys inside the same
+transaction that does the endpoint's work, and the serialized response is
+written to that row before the commit. This gives three outcomes without any
+polling or in-progress state:
+
+- first attempt: the insert succeeds and the request proceeds normally;
+- retry after success: the insert conflicts and the stored response is
+  replayed without touching products or sending email again;
+- concurrent duplicate: the insert blocks on the unique index until the
+  in-flight transaction ends, then either replays its response (committed)
+  or takes over the key (rolled back, e.g. insufficient stock).
+
+Keys are scoped per user and expire after IDEMPOTENCY_TTL_HOURS; reusing a
+live key with a different request body is rejected with 422.
+"""
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import AsyncSessionLocal, IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))
+PURGE_INTERVAL_SECONDS = 3600
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(body: str) -> str:
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+async def _insert_claim(db, user_id: int, key: str, request_hash: str) -> bool:
+    insert = pg_insert if db.bind.dialect.name == 'postgresql' else sqlite_insert
+    stmt = (
+        insert(IdempotencyKey)
+        .values(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            expires_at=datetime.now(timezone.utc) + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        )
+        .on_conflict_do_nothing(index_elements=['user_id', 'key'])
+        .returning(IdempotencyKey.id)
+    )
+    return (await db.execute(stmt)).scalar_one_or_none() is not None
+
+
+async def claim(db, user_id: int, key: str, request_hash: str) -> Optional[Response]:
+    """Claim key for this request in db's transaction.
+
+    Returns None when the caller owns the key and should do the work, or the
+    stored response to replay. Must be the first statement of the transaction
+    so a concurrent duplicate waits here before any work is done.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f'{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters')
+
+    for _ in range(2):
+        if await _insert_claim(db, user_id, key, request_hash):
+            return None
+        result = await db.execute(
+            select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        )
+        existing = result.scalar_one_or_none()
+        if existing is None:
+            # Purged between the insert and the select; try again
+            continue
+        if existing.expires_at.replace(tzinfo=existing.expires_at.tzinfo or timezone.utc) <= datetime.now(timezone.utc):
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == existing.id))
+            continue
+        if existing.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail=f'{IDEMPOTENCY_HEADER} was already used for a different request')
+        body = existing.response_body
+        await db.rollback()
+        if body is None:
+            break
+        return Response(content=body, media_type='application/json', headers={'Idempotent-Replayed': 'true'})
+    raise HTTPException(status_code=409, detail=f'Could not claim {IDEMPOTENCY_HEADER}, please retry')
+
+
+async def store_response(db, user_id: int, key: str, body: str) -> None:
+    """Record the response for a claimed key; call before committing the endpoint's transaction."""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(response_body=body)
+    )
+
+
+async def purge_expired() -> int:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= func.now()))
+        await session.commit()
+        return result.rowcount
+
+
+async def run_purger() -> None:
+    while True:
+        try:
+            await purge_expired()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Idempotency key purge failed: {e}")
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,183 @@
+"""Responsive image derivatives for uploaded product photos.
+
+After an upload the original is resized to a few standard widths and encoded
+as WebP and JPEG. Pillow work is CPU-bound, so it runs in a process pool and
+never competes with request handling on the event loop. Variants are stored
+under static/uploads/variants with content-hashed names and recorded in the
+image_variants table, keyed by the original's /static path, so product
+responses can expose a srcset-ready list.
+
+Backfill existing uploads (from the backend directory):
+    python image_variants.py --backfill
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, delete
+
+from database import AsyncSessionLocal, ImageVariant, init_db
+
+ROOT_DIR = Path(__file__).parent
+UPLOAD_DIR = ROOT_DIR / "static" / "uploads"
+VARIANT_DIR = UPLOAD_DIR / "variants"
+UPLOAD_URL_PREFIX = "/static/uploads/"
+
+VARIANT_WIDTHS = tuple(int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1024").split(","))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _write_content_addressed(data: bytes, width: int, ext: str, output_dir: Path) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    filename = f"{digest}-{width}w{ext}"
+    path = output_dir / filename
+    # Identical output already on disk: nothing to write
+    if not path.exists():
+        tmp_path = output_dir / f".tmp-{digest}-{os.getpid()}"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    return filename
+
+
+def generate_variants(source_path: str, output_dir: str, widths: Iterable[int] = VARIANT_WIDTHS) -> List[Dict]:
+    """Resize one image to each width (never upscaling) as WebP and JPEG.
+
+    Runs in a worker process; returns plain dicts describing the written files.
+    """
+    from io import BytesIO
+    from PIL import Image, ImageOps
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+        targets = sorted({w for w in widths if w < img.width}) or [img.width]
+        variants = []
+        for width in targets:
+            height = max(1, round(img.height * width / img.width))
+            resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+
+            webp = BytesIO()
+            resized.save(webp, "WEBP", quality=WEBP_QUALITY, method=4)
+
+            # JPEG has no alpha channel; flatten transparent images onto white
+            flat = resized
+            if resized.mode == "RGBA":
+                flat = Image.new("RGB", resized.size, (255, 255, 255))
+                flat.paste(resized, mask=resized.getchannel("A"))
+            jpeg = BytesIO()
+            flat.save(jpeg, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+            for fmt, ext, buffer in (("webp", ".webp", webp), ("jpeg", ".jpg", jpeg)):
+                filename = _write_content_addressed(buffer.getvalue(), width, ext, output)
+                variants.append({"width": width, "height": height, "format": fmt, "filename": filename})
+    return variants
+
+
+async def create_variants(image_path: str) -> List[Dict]:
+    """Generate and record variants for an uploaded image given its /static URL path."""
+    source = UPLOAD_DIR / image_path[len(UPLOAD_URL_PREFIX):]
+    loop = asyncio.get_running_loop()
+    try:
+        variants = await loop.run_in_executor(get_executor(), generate_variants, str(source), str(VARIANT_DIR))
+    except Exception as e:
+        print(f"Image variant generation failed for {image_path}: {e}")
+        return []
+
+    rows = [
+        {
+            "source_path": image_path,
+            "url": f"{UPLOAD_URL_PREFIX}variants/{variant['filename']}",
+            "width": variant["width"],
+            "height": variant["height"],
+            "format": variant["format"],
+        }
+        for variant in variants
+    ]
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(ImageVariant).where(ImageVariant.source_path == image_path))
+        session.add_all(ImageVariant(**row) for row in rows)
+        await session.commit()
+    return rows
+
+
+async def load_variants(db, image_urls: Iterable[Optional[str]]) -> Dict[str, List[Dict]]:
+    """Variants for many images in one query, keyed by source path, widest last."""
+    paths = {url for url in image_urls if url and url.startswith(UPLOAD_URL_PREFIX)}
+    if not paths:
+        return {}
+    result = await db.execute(
+        select(ImageVariant.source_path, ImageVariant.url, ImageVariant.width, ImageVariant.format)
+        .where(ImageVariant.source_path.in_(paths))
+        .order_by(ImageVariant.source_path, ImageVariant.format, ImageVariant.width)
+    )
+    variants: Dict[str, List[Dict]] = {}
+    for source_path, url, width, fmt in result:
+        variants.setdefault(source_path, []).append({"url": url, "width": width, "format": fmt})
+    return variants
+
+
+async def backfill(force: bool = False) -> None:
+    """Create variants for every original in static/uploads that has none yet."""
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        done = set((await session.execute(select(ImageVariant.source_path).distinct())).scalars())
+
+    originals = sorted(p for p in UPLOAD_DIR.iterdir() if p.is_file() and not p.name.startswith("."))
+    pending = [f"{UPLOAD_URL_PREFIX}{p.name}" for p in originals]
+    if not force:
+        pending = [path for path in pending if path not in done]
+
+    print(f"Generating variants for {len(pending)} of {len(originals)} uploads")
+    # Keep every pool worker busy without queueing the whole backlog at once
+    batch_size = IMAGE_WORKERS * 2
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        results = await asyncio.gather(*(create_variants(image_path) for image_path in batch))
+        for image_path, rows in zip(batch, results):
+            print(f"  {image_path}: {len(rows)} variants")
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Generate responsive image variants")
+    parser.add_argument("--backfill", action="store_true", help="process existing uploads")
+    parser.add_argument("--force", action="store_true", help="regenerate even if variants exist")
+    args = parser.parse_args()
+    if args.backfill:
+        asyncio.run(backfill(force=args.force))
+    else:
+        parser.print_help()
@@ -0,0 +1,200 @@
+"""Versioned schema migrations.
+
+Migrations live in the `migrations` package as numbered modules
+(`0001_baseline.py`, `0002_...`), each defining `async def upgrade(conn)`.
+Applied versions are recorded in `schema_migrations`. A module may set
+`transactional = False` for statements that cannot run inside a transaction
+(CREATE INDEX CONCURRENTLY); those must be idempotent, since a failure part
+way through is retried from the start.
+
+Run as a deploy step, once, before starting the workers:
+    python migrate.py            # apply pending migrations and sync seed data
+    python migrate.py --status   # show applied and pending versions
+
+Workers only call `verify_schema()` at startup, a single query that refuses to
+serve against an outdated schema. With AUTO_MIGRATE=true (the default outside
+production) startup applies pending migrations itself instead.
+
+On PostgreSQL an advisory lock serialises concurrent runs.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import pkgutil
+import re
+import sys
+from dataclasses import dataclass
+from typing import List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from database import AsyncSessionLocal, engine
+
+MIGRATIONS_PACKAGE = 'migrations'
+MODULE_NAME = re.compile(r'^(\d{4})_(\w+)$')
+# Arbitrary constant identifying the migration lock in pg_locks
+ADVISORY_LOCK_ID = 814_2024
+
+AUTO_MIGRATE = os.getenv(
+    'AUTO_MIGRATE', 'false' if os.getenv('ENVIRONMENT', 'development') == 'production' else 'true'
+).lower() == 'true'
+
+CREATE_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class SchemaOutdatedError(RuntimeError):
+    pass
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    module: object
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, 'transactional', True)
+
+
+def discover() -> List[Migration]:
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        match = MODULE_NAME.match(info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f'{MIGRATIONS_PACKAGE}.{info.name}')
+        migrations.append(Migration(int(match.group(1)), match.group(2), module))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f'Duplicate migration versions in {MIGRATIONS_PACKAGE}: {versions}')
+    return migrations
+
+
+def latest_version() -> int:
+    migrations = discover()
+    return migrations[-1].version if migrations else 0
+
+
+async def applied_versions(conn) -> List[int]:
+    await conn.execute(text(CREATE_VERSION_TABLE))
+    result = await conn.execute(text('SELECT version FROM schema_migrations ORDER BY version'))
+    return [row[0] for row in result]
+
+
+def _has_version_table(sync_conn) -> bool:
+    return inspect(sync_conn).has_table('schema_migrations')
+
+
+async def current_version() -> Optional[int]:
+    """Highest applied version, or None when the version table does not exist yet.
+
+    Connection and permission errors propagate; they are not a missing schema.
+    """
+    async with engine.connect() as conn:
+        if not await conn.run_sync(_has_version_table):
+            return None
+        return (await conn.execute(text('SELECT max(version) FROM schema_migrations'))).scalar() or 0
+
+
+async def _apply(migration: Migration) -> None:
+    record = text('INSERT INTO schema_migrations (version, name) VALUES (:version, :name)')
+    params = {'version': migration.version, 'name': migration.name}
+    if migration.transactional:
+        async with engine.begin() as conn:
+            await migration.module.upgrade(conn)
+            await conn.execute(record, params)
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level='AUTOCOMMIT')
+        await migration.module.upgrade(conn)
+        await conn.execute(record, params)
+
+
+async def upgrade(target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to target (default: latest). Returns the versions applied."""
+    migrations = discover()
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level='AUTOCOMMIT')
+        is_postgres = lock_conn.dialect.name == 'postgresql'
+        if is_postgres:
+            await lock_conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+        try:
+            done = set(await applied_versions(lock_conn))
+            applied = []
+            for migration in migrations:
+                if migration.version in done or (target is not None and migration.version > target):
+                    continue
+                print(f'Applying migration {migration.version:04d}_{migration.name}')
+                await _apply(migration)
+                applied.append(migration.version)
+            return applied
+        finally:
+            if is_postgres:
+                await lock_conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': ADVISORY_LOCK_ID})
+
+
+async def sync_seed_data() -> None:
+    """Reference data (states, cities); idempotent."""
+    from locations_seed import seed_indian_states, seed_indian_cities
+
+    async with AsyncSessionLocal() as session:
+        await seed_indian_states(session)
+        await seed_indian_cities(session)
+
+
+async def verify_schema() -> None:
+    """Fail fast unless the database is at the latest migration (or migrate it when AUTO_MIGRATE)."""
+    expected = latest_version()
+    current = await current_version()
+    if current == expected:
+        return
+    if AUTO_MIGRATE:
+        await upgrade()
+        await sync_seed_data()
+        return
+    if current is not None and current > expected:
+        raise SchemaOutdatedError(f'Database schema version {current} is newer than this code ({expected}); deploy the matching release.')
+    raise SchemaOutdatedError(f'Database schema is at version {current or 0}, code expects {expected}; run `python migrate.py`.')
+
+
+async def status() -> None:
+    async with engine.connect() as conn:
+        done = set(await applied_versions(conn))
+        await conn.commit()
+    for migration in discover():
+        state = 'applied' if migration.version in done else 'pending'
+        print(f'{migration.version:04d}_{migration.name:40} {state}')
+
+
+async def main(args) -> None:
+    try:
+        if args.status:
+            await status()
+            return
+        applied = await upgrade(args.target)
+        await sync_seed_data()
+        print(f'Applied {len(applied)} migration(s); schema at version {await current_version()}.')
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Apply database schema migrations')
+    parser.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    parser.add_argument('--target', type=int, help='stop after this version')
+    asyncio.run(main(parser.parse_args()))
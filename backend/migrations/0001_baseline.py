@@ -0,0 +1,124 @@
+"""Baseline schema: the tables as they were before versioned migrations.
+
+This is a frozen copy of the models at the time, not database.Base, so later
+model changes cannot leak into it; every change since then is its own
+migration. Tables that already exist (databases created by the old create_all
+startup) are left as they are; later migrations bring them up to date.
+"""
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, Numeric, String, Table, Text, func,
+)
+
+metadata = MetaData()
+
+Table(
+    'indian_states', metadata,
+    Column('code', String(4), primary_key=True),
+    Column('name', String(100), unique=True, nullable=False),
+    Column('type', String(20), nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+indian_cities = Table(
+    'indian_cities', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(150), nullable=False),
+    Column('state_code', String(4), ForeignKey('indian_states.code'), nullable=False, index=True),
+    Column('district', String(150), nullable=True),
+    Column('pin_prefix', String(6), nullable=True),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+Index('ix_indian_cities_state_name', indian_cities.c.state_code, indian_cities.c.name)
+
+Table(
+    'users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('email', String(200), unique=True, nullable=False),
+    Column('phone', String(20), nullable=True),
+    Column('password_hash', String(255), nullable=False),
+    Column('address', Text, nullable=True),
+    Column('city', String(100), nullable=True),
+    Column('state', String(100), nullable=True),
+    Column('pincode', String(10), nullable=True),
+    Column('is_active', Boolean, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column('last_login', DateTime(timezone=True), nullable=True),
+)
+
+Table(
+    'categories', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(100), unique=True, nullable=False),
+    Column('description', Text, nullable=True),
+    Column('image_url', String(500), nullable=True),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    'products', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('description', Text, nullable=True),
+    Column('category_id', Integer, ForeignKey('categories.id'), nullable=True),
+    Column('price', Numeric(10, 2), nullable=False),
+    Column('stock', Integer, nullable=False),
+    Column('image_url', String(500), nullable=True),
+    Column('is_featured', Boolean, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column('updated_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    'orders', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('order_number', String(50), unique=True, nullable=False),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('customer_name', String(200), nullable=False),
+    Column('email', String(200), nullable=False),
+    Column('phone', String(20), nullable=False),
+    Column('address', Text, nullable=False),
+    Column('city', String(100), nullable=True),
+    Column('state', String(100), nullable=True),
+    Column('pincode', String(10), nullable=True),
+    Column('total_amount', Numeric(10, 2), nullable=False),
+    Column('status', String(50), nullable=False),
+    Column('notes', Text, nullable=True),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column('updated_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    'order_items', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('order_id', Integer, ForeignKey('orders.id'), nullable=False),
+    Column('product_id', Integer, ForeignKey('products.id'), nullable=False),
+    Column('product_name', String(200), nullable=False),
+    Column('quantity', Integer, nullable=False),
+    Column('price', Numeric(10, 2), nullable=False),
+    Column('subtotal', Numeric(10, 2), nullable=False),
+)
+
+Table(
+    'reviews', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('product_id', Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=True),
+    Column('customer_name', String(200), nullable=False),
+    Column('rating', Numeric(3, 1), nullable=False),
+    Column('comment', Text, nullable=True),
+    Column('is_approved', Boolean, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+    'admin_users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(100), unique=True, nullable=False),
+    Column('email', String(200), unique=True, nullable=False),
+    Column('password_hash', String(255), nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(metadata.create_all)
@@ -0,0 +1,39 @@
+"""Catalog filter and order/review list indexes on existing tables.
+
+The baseline (0001) predates these indexes, and databases created by the old
+create_all startup may or may not have them, so every one is built here with
+IF NOT EXISTS. On PostgreSQL they are built CONCURRENTLY, which does not
+block writes to orders while the index builds, and therefore runs outside a
+transaction.
+"""
+from sqlalchemy import text
+
+transactional = False
+
+# name -> (table, columns), frozen as declared when this migration was written
+INDEXES = {
+    'ix_products_category_price': ('products', 'category_id, price'),
+    'ix_products_category_created': ('products', 'category_id, created_at'),
+    'ix_products_price': ('products', 'price'),
+    'ix_products_created_at': ('products', 'created_at'),
+    'ix_orders_user_created': ('orders', 'user_id, created_at'),
+    'ix_orders_created_at': ('orders', 'created_at'),
+    'ix_orders_status_created': ('orders', 'status, created_at'),
+    'ix_order_items_order_id': ('order_items', 'order_id'),
+    'ix_reviews_product_created': ('reviews', 'product_id, created_at'),
+}
+
+
+async def upgrade(conn):
+    postgres = conn.dialect.name == 'postgresql'
+    for name, (table, columns) in INDEXES.items():
+        if postgres:
+            # An interrupted concurrent build leaves an INVALID index behind that IF NOT EXISTS would keep
+            invalid = await conn.scalar(text(
+                'SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name'
+            ), {'name': name})
+            if invalid:
+                await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            await conn.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})'))
+        else:
+            await conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})'))
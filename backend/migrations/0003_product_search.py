@@ -0,0 +1,6 @@
+"""Full-text search vector, triggers and GIN index on products (PostgreSQL only)."""
+import search
+
+
+async def upgrade(conn):
+    await search.install(conn)
@@ -0,0 +1,22 @@
+"""Idempotency keys for order creation."""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, UniqueConstraint, func
+
+metadata = MetaData()
+# Only referenced by the foreign key; created by 0001
+Table('users', metadata, Column('id', Integer, primary_key=True))
+
+idempotency_keys = Table(
+    'idempotency_keys', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    Column('key', String(255), nullable=False),
+    Column('request_hash', String(64), nullable=False),
+    Column('response_body', Text, nullable=True),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column('expires_at', DateTime(timezone=True), nullable=False, index=True),
+    UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(lambda sync_conn: idempotency_keys.create(sync_conn, checkfirst=True))
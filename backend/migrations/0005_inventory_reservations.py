@@ -0,0 +1,29 @@
+"""Cart inventory reservations: products.reserved and the reservations table."""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, Table, UniqueConstraint, func, inspect, text
+
+metadata = MetaData()
+# Only referenced by the foreign keys; created by 0001
+Table('users', metadata, Column('id', Integer, primary_key=True))
+Table('products', metadata, Column('id', Integer, primary_key=True))
+
+inventory_reservations = Table(
+    'inventory_reservations', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    Column('product_id', Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False),
+    Column('quantity', Integer, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Column('expires_at', DateTime(timezone=True), nullable=False, index=True),
+    UniqueConstraint('user_id', 'product_id', name='uq_inventory_reservations_user_product'),
+)
+
+
+def _has_reserved_column(sync_conn):
+    return any(column['name'] == 'reserved' for column in inspect(sync_conn).get_columns('products'))
+
+
+async def upgrade(conn):
+    # Databases created by the old create_all startup may already have it
+    if not await conn.run_sync(_has_reserved_column):
+        await conn.execute(text('ALTER TABLE products ADD COLUMN reserved INTEGER NOT NULL DEFAULT 0'))
+    await conn.run_sync(lambda sync_conn: inventory_reservations.create(sync_conn, checkfirst=True))
@@ -0,0 +1,45 @@
+"""Review moderation: reviews.moderated_at and the partial moderation-queue index.
+
+The index only covers reviews awaiting moderation, so it stays small however
+many approved reviews accumulate. Like 0002 it is built CONCURRENTLY on
+PostgreSQL, outside a transaction, so posting reviews is not blocked.
+"""
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, MetaData, Table, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+transactional = False
+
+INDEX_NAME = 'ix_reviews_moderation_queue'
+
+# Just the columns the index needs, frozen as declared when this migration was written
+reviews = Table(
+    'reviews', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('is_approved', Boolean),
+    Column('moderated_at', DateTime(timezone=True)),
+    Column('created_at', DateTime(timezone=True)),
+)
+QUEUE_PREDICATE = (reviews.c.is_approved == False) & reviews.c.moderated_at.is_(None)
+queue_index = Index(
+    INDEX_NAME, reviews.c.created_at, reviews.c.id,
+    postgresql_where=QUEUE_PREDICATE, sqlite_where=QUEUE_PREDICATE,
+)
+
+
+def _has_moderated_at(sync_conn):
+    return any(column['name'] == 'moderated_at' for column in inspect(sync_conn).get_columns('reviews'))
+
+
+async def upgrade(conn):
+    if not await conn.run_sync(_has_moderated_at):
+        await conn.execute(text('ALTER TABLE reviews ADD COLUMN moderated_at TIMESTAMP WITH TIME ZONE'))
+
+    create = str(CreateIndex(queue_index, if_not_exists=True).compile(dialect=conn.dialect))
+    if conn.dialect.name == 'postgresql':
+        invalid = await conn.scalar(text(
+            'SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name'
+        ), {'name': INDEX_NAME})
+        if invalid:
+            await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}'))
+        create = create.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+    await conn.execute(text(create))
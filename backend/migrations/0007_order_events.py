@@ -0,0 +1,17 @@
+"""Order event log behind the admin live order feed."""
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, func
+
+metadata = MetaData()
+
+order_events = Table(
+    'order_events', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('event_type', String(30), nullable=False),
+    Column('order_id', Integer, nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now(), index=True),
+)
+
+
+async def upgrade(conn):
+    await conn.run_sync(lambda sync_conn: order_events.create(sync_conn, checkfirst=True))
@@ -0,0 +1,20 @@
+"""Resized image variants generated for uploads."""
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func
+
+metadata = MetaData()
+
+image_variants = Table(
+    'image_variants', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('source_path', String(500), nullable=False, index=True),
+    Column('url', String(500), nullable=False),
+    Column('width', Integer, nullable=False),
+    Column('height', Integer, nullable=False),
+    Column('format', String(10), nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+
+async def upgrade(conn):
+    # Databases created by the old create_all startup already have it
+    await conn.run_sync(lambda sync_conn: image_variants.create(sync_conn, checkfirst=True))
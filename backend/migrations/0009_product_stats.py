@@ -0,0 +1,22 @@
+"""Per-product rating and sales aggregates behind catalog filters and sorting."""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, Numeric, Table, func
+
+metadata = MetaData()
+# Only referenced by the foreign key; created by 0001
+Table('products', metadata, Column('id', Integer, primary_key=True))
+
+product_stats = Table(
+    'product_stats', metadata,
+    Column('product_id', Integer, ForeignKey('products.id', ondelete='CASCADE'), primary_key=True),
+    Column('rating_avg', Numeric(3, 2), nullable=True),
+    Column('rating_count', Integer, nullable=False),
+    Column('units_sold', Integer, nullable=False),
+    Column('refreshed_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+Index('ix_product_stats_units_sold', product_stats.c.units_sold)
+Index('ix_product_stats_rating_avg', product_stats.c.rating_avg)
+
+
+async def upgrade(conn):
+    # Databases created by the old create_all startup already have it
+    await conn.run_sync(lambda sync_conn: product_stats.create(sync_conn, checkfirst=True))
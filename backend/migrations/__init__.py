@@ -0,0 +1 @@
+"""Numbered schema migrations applied by migrate.py."""
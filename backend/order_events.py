@@ -0,0 +1,174 @@
+"""Live admin order feed: new orders and status changes, as they commit.
+
+`record` writes events to order_events in the same transaction as the order
+change and NOTIFYs ORDER_EVENTS_CHANNEL, so an event exists, and is
+announced to every worker, exactly when the change commits.
+
+Each worker's `hub` reads the new rows once per notification, whatever the
+number of connected dashboards, and fans them out to its subscribers' queues.
+While the LISTEN connection is down (or on sqlite) it polls every
+POLL_SECONDS instead. The table doubles as the replay log: a reconnecting
+client sends Last-Event-ID and gets every event with a greater id. A
+subscriber that falls too far behind is dropped and resumes the same way.
+
+Ids come from a sequence, so a transaction can commit after one that took a
+later id. The hub remembers the ids it skipped over for GAP_SECONDS and
+picks them up if they commit; ids never committed (rolled back) expire.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, or_, select
+
+from database import AsyncSessionLocal, OrderEvent
+import pg_notify
+
+ORDER_EVENTS_CHANNEL = 'order_events'
+ORDER_EVENTS_RETENTION_HOURS = int(os.getenv('ORDER_EVENTS_RETENTION_HOURS', '24'))
+POLL_SECONDS = float(os.getenv('ORDER_EVENTS_POLL_SECONDS', '2'))
+# With a live LISTEN connection the hub still reads the table this often, as a safety net
+LISTEN_POLL_SECONDS = 30
+GAP_SECONDS = 30
+MAX_GAP_IDS = 1000
+FETCH_BATCH_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+PURGE_INTERVAL_SECONDS = 3600
+
+ORDER_CREATED = 'order_created'
+ORDER_STATUS_CHANGED = 'order_status_changed'
+
+
+async def record(db, event_type: str, payloads: List[dict]) -> None:
+    """Queue events (each payload has the order's 'id') in db's transaction; the caller commits."""
+    if not payloads:
+        return
+    await db.execute(insert(OrderEvent).values([
+        {'event_type': event_type, 'order_id': payload['id'], 'payload': json.dumps(payload, default=str)}
+        for payload in payloads
+    ]))
+    await pg_notify.notify(db, ORDER_EVENTS_CHANNEL)
+
+
+def _as_message(event: OrderEvent) -> dict:
+    return {'id': event.id, 'event': event.event_type, 'data': event.payload}
+
+
+async def events_after(last_id: int, limit: int) -> List[dict]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(OrderEvent).where(OrderEvent.id > last_id).order_by(OrderEvent.id).limit(limit)
+        )
+        return [_as_message(event) for event in result.scalars()]
+
+
+async def latest_id() -> int:
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(select(func.max(OrderEvent.id)))).scalar() or 0
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue: 'asyncio.Queue[dict]' = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when the queue overflowed; the stream ends and the client resumes from its last id
+        self.dropped = False
+
+
+class OrderEventHub:
+    """Reads committed events once per worker and hands them to every subscriber."""
+
+    def __init__(self):
+        self.last_id: Optional[int] = None
+        self._subscribers = set()
+        self._gaps: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def wake(self, payload: str = '') -> None:
+        self._wakeup.set()
+
+    async def wake_after_connect(self) -> None:
+        self._wakeup.set()
+
+    def _broadcast(self, message: dict) -> None:
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+
+    async def _fetch_new(self) -> None:
+        if self.last_id is None:
+            self.last_id = await latest_id()
+            return
+        now = time.monotonic()
+        self._gaps = {event_id: seen for event_id, seen in self._gaps.items() if now - seen < GAP_SECONDS}
+        async with AsyncSessionLocal() as session:
+            while True:
+                condition = OrderEvent.id > self.last_id
+                if self._gaps:
+                    condition = or_(condition, OrderEvent.id.in_(list(self._gaps)))
+                result = await session.execute(
+                    select(OrderEvent).where(condition).order_by(OrderEvent.id).limit(FETCH_BATCH_SIZE)
+                )
+                events = list(result.scalars())
+                for event in events:
+                    if self._gaps.pop(event.id, None) is None and event.id > self.last_id + 1:
+                        for missing in range(max(self.last_id + 1, event.id - MAX_GAP_IDS), event.id):
+                            self._gaps[missing] = now
+                    self.last_id = max(self.last_id, event.id)
+                    self._broadcast(_as_message(event))
+                if len(events) < FETCH_BATCH_SIZE:
+                    return
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self._fetch_new()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Order event fetch failed: {e}")
+            timeout = LISTEN_POLL_SECONDS if pg_notify.listener.connected else POLL_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+hub = OrderEventHub()
+pg_notify.listener.subscribe(ORDER_EVENTS_CHANNEL, hub.wake)
+# Events committed while the connection was down are picked up right after it is back
+pg_notify.listener.on_connect(hub.wake_after_connect)
+
+
+async def purge_expired() -> int:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            delete(OrderEvent).where(OrderEvent.created_at < datetime.now(timezone.utc) - timedelta(hours=ORDER_EVENTS_RETENTION_HOURS))
+        )
+        await session.commit()
+        return result.rowcount
+
+
+async def run_purger() -> None:
+    while True:
+        try:
+            await purge_expired()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Order event purge failed: {e}")
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
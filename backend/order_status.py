@@ -0,0 +1,135 @@
+"""Order status state machine and set-based status transitions.
+
+    pending -> processing -> shipped -> delivered
+       \\            \\
+        +------------+--> cancelled
+
+delivered and cancelled are final. `transition` moves any number of orders
+to one target status with one SELECT ... FOR UPDATE of the matching orders
+that are in a status allowed to move to the target, and one set-based
+UPDATE ... RETURNING of those rows. Orders in any other status are left
+alone and reported back instead of being overwritten. The changes are
+recorded for the live admin feed in the same transaction.
+
+Cancelling returns the orders' items to stock: the products are locked in id
+order first, the order checkout locks them in (see reservations.py), then
+one more set-based UPDATE adds the quantities back.
+Everything after the commit (customer emails, product stats rollup, cache
+invalidation) is the caller's job, done once for the whole batch from the
+returned rows.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, update
+
+from database import Order, OrderItem, Product
+import order_events
+
+ORDER_STATUSES = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+TRANSITIONS: Dict[str, frozenset] = {
+    'pending': frozenset({'processing', 'cancelled'}),
+    'processing': frozenset({'shipped', 'cancelled'}),
+    'shipped': frozenset({'delivered'}),
+    'delivered': frozenset(),
+    'cancelled': frozenset(),
+}
+# Customers get an email when their order reaches one of these
+NOTIFY_STATUSES = frozenset({'shipped', 'delivered', 'cancelled'})
+MAX_BULK_ORDERS = 5000
+
+
+def sources_for(target: str) -> List[str]:
+    """Statuses an order may be in to move to target."""
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+async def transition(
+    db,
+    target: str,
+    order_ids: Optional[List[int]] = None,
+    from_status: Optional[str] = None,
+    created_before: Optional[datetime] = None,
+    limit: int = MAX_BULK_ORDERS,
+) -> dict:
+    """Move the selected orders to target, in db's transaction (the caller commits).
+
+    Orders are selected by id (every listed order; limit does not apply), or
+    by current status (oldest first, up to limit). from_status must be one of
+    sources_for(target), else ValueError. Returns {'updated': [rows], 'rejected': [...], 'restocked_product_ids': [...]};
+    each updated row has id, order_number, customer_name, email, status and
+    previous_status. Rejections are only reported for explicitly listed ids.
+    """
+    sources = sources_for(target)
+    if from_status is not None and from_status not in sources:
+        raise ValueError(f"Cannot change status from {from_status} to {target}; allowed from: {', '.join(sources) or 'none'}")
+    conditions = [Order.status.in_(sources)]
+    if order_ids is not None:
+        conditions.append(Order.id.in_(order_ids))
+    if from_status is not None:
+        conditions.append(Order.status == from_status)
+    if created_before is not None:
+        conditions.append(Order.created_at < created_before)
+
+    # Lock the orders first so their previous status is still what we update from
+    query = select(Order.id, Order.status).where(*conditions).order_by(Order.created_at, Order.id)
+    if order_ids is None:
+        query = query.limit(limit)
+    selected = await db.execute(query.with_for_update())
+    previous = dict(selected.all())
+    updated = []
+    if previous:
+        result = await db.execute(
+            update(Order)
+            .where(Order.id.in_(previous))
+            .values(status=target, updated_at=func.now())
+            .returning(Order.id, Order.order_number, Order.customer_name, Order.email, Order.status)
+            .execution_options(synchronize_session=False)
+        )
+        updated = [dict(row, previous_status=previous[row['id']]) for row in result.mappings()]
+        await order_events.record(db, order_events.ORDER_STATUS_CHANGED, [
+            {'id': row['id'], 'order_number': row['order_number'], 'status': row['status'], 'previous_status': row['previous_status']}
+            for row in updated
+        ])
+
+    rejected = []
+    if order_ids is not None:
+        missing = set(order_ids) - {row['id'] for row in updated}
+        if missing:
+            current = dict((await db.execute(select(Order.id, Order.status).where(Order.id.in_(missing)))).all())
+            for order_id in sorted(missing):
+                status = current.get(order_id)
+                error = 'Order not found' if status is None else f'Cannot change status from {status} to {target}'
+                rejected.append({'id': order_id, 'status': status, 'error': error})
+
+    restocked = []
+    if target == 'cancelled' and updated:
+        restocked = await _restock(db, [row['id'] for row in updated])
+    return {'updated': updated, 'rejected': rejected, 'restocked_product_ids': restocked}
+
+
+async def _restock(db, order_ids: List[int]) -> List[int]:
+    """Add the orders' item quantities back to product stock; returns the product ids."""
+    item_products = select(OrderItem.product_id).where(OrderItem.order_id.in_(order_ids))
+    # An UPDATE ... FROM locks rows in whatever order the join yields them
+    locked = await db.execute(
+        select(Product.id).where(Product.id.in_(item_products)).order_by(Product.id).with_for_update()
+    )
+    product_ids = list(locked.scalars())
+    if not product_ids:
+        return []
+    quantities = (
+        select(OrderItem.product_id, func.sum(OrderItem.quantity).label('quantity'))
+        .where(OrderItem.order_id.in_(order_ids))
+        .group_by(OrderItem.product_id)
+        .subquery('quantities')
+    )
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == quantities.c.product_id, Product.id.in_(product_ids))
+        # Stock counters do not date the product's content (see reservations.py)
+        .values(stock=Product.stock + quantities.c.quantity, updated_at=Product.updated_at)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
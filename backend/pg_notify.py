@@ -0,0 +1,105 @@
+"""Postgres LISTEN/NOTIFY between the workers of a deployment.
+
+`notify` queues a NOTIFY in the caller's transaction; Postgres delivers it to
+every listening connection when, and only if, that transaction commits.
+
+Each worker runs one `listener`: a dedicated asyncpg connection (outside the
+SQLAlchemy pool) that LISTENs on every registered channel and calls the
+channel's handler with the payload. A dropped connection is reopened with
+exponential backoff; `on_connect` callbacks run after every (re)connect so
+handlers can catch up on whatever was sent while nobody was listening, and
+`connected` tells callers whether notifications are currently arriving.
+
+On databases other than Postgres (sqlite in development) there is nothing to
+listen to: `notify` is a no-op and `connected` stays False, so callers fall
+back to polling or short TTLs.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import func, select
+
+from database import engine
+
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+# A LISTEN connection is otherwise idle, so a dead peer is only noticed by pinging it
+PING_SECONDS = float(os.getenv('PG_LISTEN_PING_SECONDS', '30'))
+
+
+def is_postgres() -> bool:
+    return engine.dialect.name == 'postgresql'
+
+
+async def notify(db, channel: str, payload: str = '') -> None:
+    """Send payload on channel when db's transaction commits (payloads are limited to ~8000 bytes)."""
+    if db.bind.dialect.name == 'postgresql':
+        await db.execute(select(func.pg_notify(channel, payload)))
+
+
+class Listener:
+    """One LISTEN connection per process, shared by every channel."""
+
+    def __init__(self):
+        self.connected = False
+        self.connects = 0
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._on_connect: List[Callable[[], Awaitable[None]]] = []
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Call handler(payload) for every notification on channel. Register before run() starts."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_connect(self, callback: Callable[[], Awaitable[None]]) -> None:
+        self._on_connect.append(callback)
+
+    def _dispatch(self, connection, pid, channel, payload) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Notification handler for {channel} failed: {e}")
+
+    async def _listen_once(self) -> None:
+        import asyncpg
+
+        dsn = engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+        connection = await asyncpg.connect(dsn)
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        try:
+            for channel in self._handlers:
+                await connection.add_listener(channel, self._dispatch)
+            self.connected = True
+            self.connects += 1
+            for callback in self._on_connect:
+                await callback()
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), timeout=PING_SECONDS)
+                except asyncio.TimeoutError:
+                    await connection.fetchval('SELECT 1', timeout=PING_SECONDS)
+        finally:
+            self.connected = False
+            if not connection.is_closed():
+                connection.terminate()
+
+    async def run(self) -> None:
+        if not is_postgres() or not self._handlers:
+            return
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            connects = self.connects
+            try:
+                await self._listen_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"LISTEN connection lost: {e}")
+            # Back off only while connecting keeps failing, not after a long-lived connection drops
+            delay = RECONNECT_MIN_SECONDS if self.connects != connects else min(delay * 2, RECONNECT_MAX_SECONDS)
+            await asyncio.sleep(delay)
+
+
+listener = Listener()
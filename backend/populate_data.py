@@ -1,6 +1,7 @@
 import asyncio
+import os
 import sys
-sys.path.append('/app/backend')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import AsyncSessionLocal, Category, Product, Review
 from sqlalchemy import select
@@ -0,0 +1,233 @@
+"""Catalog filtering, sorting and facet counts.
+
+Filters (category, price range, in stock, minimum rating, featured) are turned
+into SQL conditions so only matching products leave the database. Rating and
+popularity come from the product_stats table, a per-product snapshot of
+approved review averages and units sold that is refreshed in the background
+every PRODUCT_STATS_REFRESH_SECONDS; aggregating reviews and order items on
+every catalog request would not scale with order history. Every worker runs
+the refresher, but on PostgreSQL a transaction-level advisory lock plus the
+age of the oldest snapshot row let only one of them do the full rebuild per
+interval. Moderation and cancellations refresh just the products they touched.
+
+Facet counts for categories and price buckets come from one grouped query.
+Each facet ignores its own filter (selecting a category still shows how many
+products the other categories have), which is done with per-aggregate FILTER
+clauses over a GROUP BY category, price bucket.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, case, desc, func, literal, select, text, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import AsyncSessionLocal, Category, Order, OrderItem, Product, ProductStats, Review
+from reservations import available_stock
+
+PRODUCT_STATS_REFRESH_SECONDS = int(os.getenv('PRODUCT_STATS_REFRESH_SECONDS', '300'))
+# Held for the duration of a full refresh so concurrent workers skip instead of repeating it
+STATS_REFRESH_LOCK_ID = 814_2025
+PRICE_FACET_EDGES = [float(edge) for edge in os.getenv('PRICE_FACET_EDGES', '0,100,250,500,1000,2500').split(',')]
+
+SORT_OPTIONS = ('newest', 'price_asc', 'price_desc', 'popularity', 'rating')
+
+
+def filter_conditions(
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    min_rating: Optional[float] = None,
+    featured: Optional[bool] = None,
+) -> Dict[str, object]:
+    """SQL conditions keyed by facet name ('category', 'price', ...), so facets can drop their own."""
+    conditions = {}
+    if category_id:
+        conditions['category'] = Product.category_id == category_id
+    if min_price is not None or max_price is not None:
+        price = []
+        if min_price is not None:
+            price.append(Product.price >= min_price)
+        if max_price is not None:
+            price.append(Product.price <= max_price)
+        conditions['price'] = and_(*price)
+    if in_stock:
+        conditions['stock'] = available_stock() > 0
+    if min_rating is not None:
+        conditions['rating'] = ProductStats.rating_avg >= min_rating
+    if featured:
+        conditions['featured'] = Product.is_featured == True
+    return conditions
+
+
+def needs_stats(conditions: Dict[str, object], sort: str = 'newest') -> bool:
+    return 'rating' in conditions or sort in ('popularity', 'rating')
+
+
+def with_stats(query):
+    return query.outerjoin(ProductStats, ProductStats.product_id == Product.id)
+
+
+def sort_order(sort: str) -> list:
+    if sort == 'price_asc':
+        return [Product.price, Product.id]
+    if sort == 'price_desc':
+        return [desc(Product.price), Product.id]
+    if sort == 'popularity':
+        return [desc(func.coalesce(ProductStats.units_sold, 0)), desc(Product.created_at)]
+    if sort == 'rating':
+        return [desc(func.coalesce(ProductStats.rating_avg, 0)), desc(func.coalesce(ProductStats.rating_count, 0)), desc(Product.created_at)]
+    return [desc(Product.created_at)]
+
+
+def _all_of(conditions: Dict[str, object], exclude: str):
+    remaining = [condition for name, condition in conditions.items() if name != exclude]
+    return and_(*remaining) if remaining else true()
+
+
+def price_bucket_expression():
+    """Index into PRICE_FACET_EDGES of the bucket a product's price falls in."""
+    whens = [(Product.price < edge, index - 1) for index, edge in enumerate(PRICE_FACET_EDGES) if index > 0]
+    return case(*whens, else_=literal(len(PRICE_FACET_EDGES) - 1))
+
+
+async def facet_counts(db, conditions: Dict[str, object]) -> dict:
+    bucket = price_bucket_expression().label('bucket')
+    category_count = func.count().filter(_all_of(conditions, 'category')).label('category_count')
+    price_count = func.count().filter(_all_of(conditions, 'price')).label('price_count')
+    total = func.count().filter(_all_of(conditions, None)).label('total')
+
+    # Rows matching neither facet's conditions contribute nothing, so they can be skipped
+    base_conditions = [c for name, c in conditions.items() if name not in ('category', 'price')]
+    query = (
+        select(Product.category_id, Category.name, bucket, category_count, price_count, total)
+        .select_from(Product)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .group_by(Product.category_id, Category.name, bucket)
+    )
+    if 'rating' in conditions:
+        query = with_stats(query)
+    if base_conditions:
+        query = query.where(and_(*base_conditions))
+
+    categories: Dict[Optional[int], dict] = {}
+    buckets = [0] * len(PRICE_FACET_EDGES)
+    matched = 0
+    for category_id, category_name, bucket_index, cat_n, price_n, total_n in await db.execute(query):
+        entry = categories.setdefault(category_id, {'id': category_id, 'name': category_name, 'count': 0})
+        entry['count'] += cat_n
+        buckets[int(bucket_index)] += price_n
+        matched += total_n
+
+    price_buckets = []
+    for index, edge in enumerate(PRICE_FACET_EDGES):
+        upper = PRICE_FACET_EDGES[index + 1] if index + 1 < len(PRICE_FACET_EDGES) else None
+        price_buckets.append({'min': edge, 'max': upper, 'count': buckets[index]})
+
+    return {
+        'total': matched,
+        'categories': sorted(
+            (c for c in categories.values() if c['id'] is not None and c['count']),
+            key=lambda c: c['name'] or '',
+        ),
+        'price_buckets': price_buckets,
+    }
+
+
+def _stats_select(product_ids: Optional[list] = None):
+    ratings = (
+        select(
+            Review.product_id.label('product_id'),
+            func.avg(Review.rating).label('rating_avg'),
+            func.count().label('rating_count'),
+        )
+        .where(Review.is_approved == True, Review.product_id.is_not(None))
+        .group_by(Review.product_id)
+    )
+    sales = (
+        select(OrderItem.product_id.label('product_id'), func.sum(OrderItem.quantity).label('units_sold'))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status != 'cancelled')
+        .group_by(OrderItem.product_id)
+    )
+    products = true()
+    if product_ids is not None:
+        ratings = ratings.where(Review.product_id.in_(product_ids))
+        sales = sales.where(OrderItem.product_id.in_(product_ids))
+        products = Product.id.in_(product_ids)
+    ratings = ratings.subquery()
+    sales = sales.subquery()
+    return (
+        select(
+            Product.id,
+            ratings.c.rating_avg,
+            func.coalesce(ratings.c.rating_count, 0),
+            func.coalesce(sales.c.units_sold, 0),
+            func.now(),
+        )
+        .outerjoin(ratings, ratings.c.product_id == Product.id)
+        .outerjoin(sales, sales.c.product_id == Product.id)
+        # SQLite cannot parse INSERT ... SELECT ... ON CONFLICT without a WHERE clause
+        .where(products)
+    )
+
+
+async def _upsert_stats(session, product_ids: Optional[list] = None) -> None:
+    insert = pg_insert if session.bind.dialect.name == 'postgresql' else sqlite_insert
+    stmt = insert(ProductStats).from_select(
+        ['product_id', 'rating_avg', 'rating_count', 'units_sold', 'refreshed_at'], _stats_select(product_ids)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductStats.product_id],
+        set_={
+            'rating_avg': stmt.excluded.rating_avg,
+            'rating_count': stmt.excluded.rating_count,
+            'units_sold': stmt.excluded.units_sold,
+            'refreshed_at': stmt.excluded.refreshed_at,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def refresh_product_stats(product_ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute product_stats in one INSERT ... SELECT upsert, for all products or just product_ids."""
+    if product_ids is not None:
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return
+    async with AsyncSessionLocal() as session:
+        await _upsert_stats(session, product_ids)
+        await session.commit()
+
+
+async def refresh_stale_product_stats() -> bool:
+    """Full refresh unless another worker holds the lock or did one within the interval."""
+    async with AsyncSessionLocal() as session:
+        if session.bind.dialect.name == 'postgresql':
+            locked = await session.scalar(text('SELECT pg_try_advisory_xact_lock(:id)'), {'id': STATS_REFRESH_LOCK_ID})
+            if not locked:
+                return False
+        # Targeted refreshes only move rows forward, so the oldest row dates the last full refresh
+        oldest = await session.scalar(select(func.min(ProductStats.refreshed_at)))
+        if oldest is not None:
+            if oldest.tzinfo is None:
+                oldest = oldest.replace(tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) - oldest < timedelta(seconds=PRODUCT_STATS_REFRESH_SECONDS):
+                return False
+        await _upsert_stats(session)
+        await session.commit()
+        return True
+
+
+async def run_stats_refresher() -> None:
+    while True:
+        try:
+            await refresh_stale_product_stats()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Product stats refresh failed: {e}")
+        await asyncio.sleep(PRODUCT_STATS_REFRESH_SECONDS)
@@ -0,0 +1,289 @@
+"""Bulk product import and update from CSV.
+
+The first row is a header naming any of the IMPORT_COLUMNS plus an optional
+`id`. Rows with an id update that product, only in the columns the file
+has; rows without one create a product, which needs at least name and price.
+Empty cells leave the current value unchanged. Categories can be given by
+`category_id` or by `category` (the category name).
+
+The whole file (at most MAX_IMPORT_ROWS rows) is decoded, parsed and
+validated in a worker thread before anything is written, so a file that
+cannot be read, or has too many rows, is rejected with CSVFormatError
+without having changed a product. Row errors are collected into a per-row
+report instead of stopping at the first bad line. The valid rows are then
+written BATCH_SIZE at a time; each batch:
+- loads the products it updates in one SELECT ... FOR UPDATE, locking them
+  in id order like checkout does, and merges the changed columns over them;
+- writes all updates with one multi-row INSERT ... ON CONFLICT (id) DO UPDATE
+  and all new products with one multi-row INSERT, then commits.
+
+updated_at only moves for products whose CONTENT_COLUMNS changed, so a
+price or stock sheet does not mark every product changed for the sitemap.
+
+Rows with errors are skipped; the rest are applied. With dry_run nothing is
+written. Committed product ids accumulate in the report as batches commit,
+so a caller that passes its own report can publish them (`publish_changes`)
+even when a later batch fails.
+
+Usage (from the backend directory):
+    python product_import.py products.csv [--dry-run]
+    python product_import.py --export products.csv
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import case, func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Add current dir to path to import database
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import AsyncSessionLocal, Category, Product
+import cache_bus
+
+BATCH_SIZE = int(os.getenv('PRODUCT_IMPORT_BATCH_SIZE', '500'))
+MAX_IMPORT_ROWS = int(os.getenv('PRODUCT_IMPORT_MAX_ROWS', '50000'))
+
+IMPORT_COLUMNS = ('name', 'description', 'category_id', 'category', 'price', 'stock', 'image_url', 'is_featured')
+PRODUCT_COLUMNS = ('name', 'description', 'category_id', 'price', 'stock', 'image_url', 'is_featured')
+# Changes to these date the product page (updated_at, the sitemap's lastmod)
+CONTENT_COLUMNS = ('name', 'description', 'category_id')
+EXPORT_COLUMNS = ('id', 'name', 'description', 'category_id', 'category', 'price', 'stock', 'image_url', 'is_featured')
+
+
+class CSVFormatError(ValueError):
+    """The file as a whole cannot be imported (bad header, too many rows)."""
+
+
+class ProductImportRow(BaseModel):
+    id: Optional[int] = Field(default=None, gt=0)
+    name: Optional[str] = Field(default=None, min_length=1, max_length=200)
+    description: Optional[str] = None
+    category_id: Optional[int] = Field(default=None, gt=0)
+    category: Optional[str] = None
+    price: Optional[float] = Field(default=None, ge=0, lt=10 ** 8)
+    stock: Optional[int] = Field(default=None, ge=0)
+    image_url: Optional[str] = Field(default=None, max_length=500)
+    is_featured: Optional[bool] = None
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return '; '.join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+def parse_rows(lines: Iterable[str]) -> Tuple[List[Tuple[int, ProductImportRow]], List[dict]]:
+    """Read and validate a whole CSV; returns ([(line number, row)], [row errors]).
+
+    Blocking (it reads and decodes the file), so callers run it in a thread.
+    Raises CSVFormatError for problems with the file as a whole.
+    """
+    try:
+        reader = csv.DictReader(lines)
+        header = [column.strip() for column in (reader.fieldnames or [])]
+        unknown = [column for column in header if column not in IMPORT_COLUMNS and column != 'id']
+        if not header:
+            raise CSVFormatError('CSV file is empty')
+        if unknown:
+            raise CSVFormatError(f"Unknown CSV columns: {', '.join(unknown)}")
+        reader.fieldnames = header
+
+        rows, errors = [], []
+        for count, raw in enumerate(reader, start=1):
+            if count > MAX_IMPORT_ROWS:
+                raise CSVFormatError(f'CSV has more than {MAX_IMPORT_ROWS} rows')
+            # Blank cells mean "leave unchanged"; extra cells past the header land under None
+            raw = {k: v.strip() for k, v in raw.items() if k and v is not None and v.strip()}
+            try:
+                rows.append((reader.line_num, ProductImportRow(**raw)))
+            except ValidationError as e:
+                errors.append({'line': reader.line_num, 'id': raw.get('id'), 'error': _format_validation_error(e)})
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise CSVFormatError(f'Could not read CSV: {e}') from e
+    return rows, errors
+
+
+async def _category_ids_by_name(db) -> Dict[str, int]:
+    result = await db.execute(select(Category.id, Category.name))
+    return {name.lower(): category_id for category_id, name in result}
+
+
+async def _apply_batch(db, batch, categories: Dict[str, int], dry_run: bool, report: dict) -> List[int]:
+    category_ids = set(categories.values())
+    rows = []
+    for line, row in batch:
+        values = row.model_dump(exclude_unset=True, exclude={'id', 'category'})
+        if row.category is not None:
+            category_id = categories.get(row.category.lower())
+            if category_id is None:
+                report['errors'].append({'line': line, 'id': row.id, 'error': f'Unknown category: {row.category}'})
+                continue
+            values['category_id'] = category_id
+        elif row.category_id is not None and row.category_id not in category_ids:
+            report['errors'].append({'line': line, 'id': row.id, 'error': f'Unknown category_id: {row.category_id}'})
+            continue
+        rows.append((line, row.id, values))
+
+    update_ids = [product_id for _, product_id, _ in rows if product_id is not None]
+    existing = {}
+    if update_ids:
+        result = await db.execute(
+            select(Product.id, *(getattr(Product, c) for c in PRODUCT_COLUMNS))
+            .where(Product.id.in_(update_ids))
+            .order_by(Product.id)
+            .with_for_update()
+        )
+        existing = {row.id: dict(row._mapping) for row in result}
+
+    updates: Dict[int, dict] = {}
+    inserts = []
+    for line, product_id, values in rows:
+        if product_id is None:
+            if 'name' not in values or 'price' not in values:
+                report['errors'].append({'line': line, 'id': None, 'error': 'New products need name and price'})
+                continue
+            inserts.append(values)
+        elif product_id not in existing:
+            report['errors'].append({'line': line, 'id': product_id, 'error': f'Product {product_id} not found'})
+        else:
+            # Later rows for the same id win, like applying the file top to bottom
+            merged = updates.get(product_id) or dict(existing[product_id])
+            merged.update(values)
+            updates[product_id] = merged
+
+    report['updated'] += len(updates)
+    report['created'] += len(inserts)
+    if dry_run:
+        await db.rollback()
+        return []
+
+    touched = list(updates)
+    if updates:
+        upsert = pg_insert if db.bind.dialect.name == 'postgresql' else sqlite_insert
+        stmt = upsert(Product).values([updates[product_id] for product_id in sorted(updates)])
+        content_changed = or_(*(getattr(Product, c).is_distinct_from(stmt.excluded[c]) for c in CONTENT_COLUMNS))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.id],
+            set_={
+                **{c: stmt.excluded[c] for c in PRODUCT_COLUMNS},
+                'updated_at': case((content_changed, func.now()), else_=Product.updated_at),
+            },
+        )
+        await db.execute(stmt)
+    if inserts:
+        # Every row carries the same keys, as a multi-row VALUES requires
+        defaults = {'description': None, 'category_id': None, 'stock': 0, 'image_url': None, 'is_featured': False}
+        result = await db.execute(
+            insert(Product).values([{**defaults, **values} for values in inserts]).returning(Product.id)
+        )
+        touched.extend(result.scalars())
+    await db.commit()
+    return touched
+
+
+def new_report(dry_run: bool = False) -> dict:
+    return {'rows': 0, 'created': 0, 'updated': 0, 'errors': [], 'dry_run': dry_run, 'product_ids': []}
+
+
+async def import_products(lines: Iterable[str], dry_run: bool = False, report: Optional[dict] = None) -> dict:
+    """Apply a product CSV. Returns the report, including the ids of every product written.
+
+    report (from new_report) is filled in place, so after an exception it
+    still lists the products of the batches that were committed.
+    """
+    report = new_report(dry_run) if report is None else report
+    rows, report['errors'] = await asyncio.to_thread(parse_rows, lines)
+    report['rows'] = len(rows) + len(report['errors'])
+    async with AsyncSessionLocal() as db:
+        categories = await _category_ids_by_name(db)
+        for start in range(0, len(rows), BATCH_SIZE):
+            report['product_ids'].extend(
+                await _apply_batch(db, rows[start:start + BATCH_SIZE], categories, dry_run, report)
+            )
+    report['errors'].sort(key=lambda error: error['line'])
+    return report
+
+
+def publish_changes(product_ids: List[int]) -> None:
+    """Evict imported products from every worker's caches and mark the sitemap stale."""
+    if not product_ids:
+        return
+    cache_bus.publish(cache_bus.CATALOG, product_ids)
+    cache_bus.publish(cache_bus.PRODUCT_LISTS)
+    cache_bus.publish(cache_bus.SITEMAP)
+
+
+async def export_products(out) -> int:
+    """Write every product as CSV in the import format; returns the row count."""
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(
+                Product.id, Product.name, Product.description, Product.category_id, Category.name,
+                Product.price, Product.stock, Product.image_url, Product.is_featured,
+            )
+            .outerjoin(Category, Product.category_id == Category.id)
+            .order_by(Product.id)
+            .execution_options(yield_per=2000)
+        )
+        async for row in result:
+            writer.writerow(['' if value is None else value for value in row])
+            count += 1
+    return count
+
+
+def text_lines(binary_file) -> io.TextIOWrapper:
+    """Decode an uploaded file as UTF-8 (a leading BOM from spreadsheet exports is dropped)."""
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+async def main(args) -> None:
+    from database import engine
+
+    try:
+        if args.export:
+            with open(args.csv_path, 'w', newline='', encoding='utf-8') as out:
+                print(f'Exported {await export_products(out)} products to {args.csv_path}')
+            return
+        report = new_report(args.dry_run)
+        try:
+            with open(args.csv_path, newline='', encoding='utf-8-sig') as f:
+                await import_products(f, dry_run=args.dry_run, report=report)
+        finally:
+            if report['product_ids']:
+                # Running servers evict these products and rebuild the sitemap
+                publish_changes(report['product_ids'])
+                try:
+                    await cache_bus.flush()
+                except Exception as e:
+                    print(f'Could not notify running servers ({e}); they pick up the changes within their cache TTLs.')
+        for error in report['errors']:
+            print(f"line {error['line']}: {error['error']}")
+        action = 'Would apply' if args.dry_run else 'Applied'
+        print(f"{action} {report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+              f"{len(report['errors'])} errors")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Bulk import or export products as CSV')
+    parser.add_argument('csv_path', help='CSV file to read (or write with --export)')
+    parser.add_argument('--dry-run', action='store_true', help='validate and report without writing')
+    parser.add_argument('--export', action='store_true', help='write the current catalog in the import format')
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    except CSVFormatError as e:
+        sys.exit(f'Import failed: {e}')
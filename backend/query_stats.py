@@ -0,0 +1,153 @@
+"""Per-request SQL instrumentation.
+
+SQLAlchemy cursor events count every statement and accumulate the time spent
+in the database for the request currently being served. The request is tracked
+through a ContextVar so the numbers stay correct with many concurrent requests
+on one event loop.
+
+Statements that repeat within one request (same parameterized SQL, e.g. the
+per-item product lookup in a loop) are flagged as likely N+1 patterns.
+
+These are the only cursor timers on the engine; other recorders (the slow
+query log) subscribe with `observe` instead of timing every statement again.
+"""
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+
+# Maximum number of statements a single request may issue (0 disables the check)
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', '0'))
+# In strict mode (meant for tests / CI) a request over budget fails with a 500
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+# Same statement issued this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '3'))
+
+
+class RequestQueryStats:
+    """Statement count and DB time collected for one request."""
+
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000.0
+
+    def repeated_statements(self) -> Dict[str, int]:
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= N_PLUS_ONE_THRESHOLD
+        }
+
+    def over_budget(self) -> bool:
+        return QUERY_BUDGET > 0 and self.count > QUERY_BUDGET
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration_ms:.2f};desc="{self.count} queries"'
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar('request_query_stats', default=None)
+
+# Process-wide totals per endpoint, exposed through the admin metrics endpoint
+_route_metrics: Dict[str, dict] = {}
+# Called with (statement, parameters, seconds) after every statement
+_observers: List[Callable[[str, object, float], None]] = []
+
+
+def begin_request():
+    """Start collecting stats for the current request; returns the reset token."""
+    return _current_stats.set(RequestQueryStats())
+
+
+def end_request(token) -> None:
+    _current_stats.reset(token)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+def record_request(route: str, stats: RequestQueryStats) -> Dict[str, int]:
+    """Fold one request's stats into the process totals.
+
+    Returns the statements flagged as repeated so the caller can report them.
+    """
+    metrics = _route_metrics.setdefault(route, {
+        'requests': 0,
+        'queries': 0,
+        'db_time_ms': 0.0,
+        'max_queries': 0,
+        'n_plus_one_requests': 0,
+        'over_budget_requests': 0,
+    })
+    repeated = stats.repeated_statements()
+    metrics['requests'] += 1
+    metrics['queries'] += stats.count
+    metrics['db_time_ms'] += stats.duration_ms
+    metrics['max_queries'] = max(metrics['max_queries'], stats.count)
+    if repeated:
+        metrics['n_plus_one_requests'] += 1
+    if stats.over_budget():
+        metrics['over_budget_requests'] += 1
+    return repeated
+
+
+def get_metrics() -> Dict[str, dict]:
+    """Snapshot of per-endpoint query metrics with derived averages."""
+    snapshot = {}
+    for route, metrics in sorted(_route_metrics.items()):
+        requests = metrics['requests'] or 1
+        snapshot[route] = {
+            **metrics,
+            'db_time_ms': round(metrics['db_time_ms'], 2),
+            'avg_queries': round(metrics['queries'] / requests, 2),
+            'avg_db_time_ms': round(metrics['db_time_ms'] / requests, 2),
+        }
+    return snapshot
+
+
+def reset_metrics() -> None:
+    _route_metrics.clear()
+
+
+def observe(callback: Callable[[str, object, float], None]) -> None:
+    """Have callback(statement, parameters, seconds) called after every timed statement."""
+    _observers.append(callback)
+
+
+def install(engine) -> None:
+    """Attach the cursor event listeners to an (async) engine."""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start_time'].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        for callback in _observers:
+            callback(statement, parameters, duration)
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_start_time'):
+            conn.info['query_start_time'].pop()
@@ -0,0 +1,279 @@
+"""Time-boxed cart reservations against product stock.
+
+A reservation holds a quantity of one product for one user until expires_at
+(RESERVATION_TTL_MINUTES after it was last set). The total held per product
+is kept in products.reserved, so the stock a shopper can still buy is
+`stock - reserved`, read from the product row alone.
+
+Every change to a product's counters is a single conditional UPDATE of that
+product row, e.g.
+
+    UPDATE products SET reserved = reserved + :n
+    WHERE id = :id AND stock - reserved >= :n
+
+which either succeeds atomically or matches no row (not enough stock). These
+counter updates keep products.updated_at as it is: it dates the product's
+content (the sitemap's lastmod), not its stock. Hot
+SKUs therefore only contend on their own row lock for the length of one
+statement; nothing reads stock into Python and writes it back.
+
+Expired reservations keep counting against stock until the sweeper deletes
+them and hands their quantity back, in batches that skip rows a checkout is
+currently consuming. Ordering consumes the customer's own reservation, so an
+expired but unswept hold is still honoured for its owner.
+
+Every transaction locks reservation rows before product rows, and product
+rows in id order, so checkouts, cart updates and the sweeper cannot
+deadlock on each other. Reservations that disappear without going through
+this module (a user deleted with ON DELETE CASCADE) would leave
+products.reserved too high; the sweeper reconciles the counters against the
+live reservations every RESERVATION_RECONCILE_SECONDS.
+"""
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, select, update
+
+from database import AsyncSessionLocal, InventoryReservation, Product
+import cache_bus
+
+RESERVATION_TTL_MINUTES = int(os.getenv('RESERVATION_TTL_MINUTES', '15'))
+RESERVATION_SWEEP_SECONDS = int(os.getenv('RESERVATION_SWEEP_SECONDS', '30'))
+RESERVATION_RECONCILE_SECONDS = int(os.getenv('RESERVATION_RECONCILE_SECONDS', '600'))
+SWEEP_BATCH_SIZE = 1000
+
+
+def available_stock():
+    """Stock not held by reservations, never below zero (an admin may lower stock under the held amount)."""
+    return case((Product.stock > Product.reserved, Product.stock - Product.reserved), else_=0)
+
+
+def _expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(minutes=RESERVATION_TTL_MINUTES)
+
+
+async def _adjust_reserved(db, product_id: int, delta: int) -> bool:
+    """Add delta to the product's reserved count; increases only succeed while enough stock is free."""
+    stmt = update(Product).where(Product.id == product_id).values(reserved=Product.reserved + delta, updated_at=Product.updated_at)
+    if delta > 0:
+        stmt = stmt.where(Product.stock - Product.reserved >= delta)
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount == 1
+
+
+async def _release_rows(db, rows) -> None:
+    """Return (product_id, quantity) pairs to available stock, one UPDATE per product."""
+    released: Dict[int, int] = defaultdict(int)
+    for product_id, quantity in rows:
+        released[product_id] += quantity
+    if not released:
+        return
+    products = Product.__table__
+    await db.execute(
+        update(products)
+        .where(products.c.id == bindparam('b_id'))
+        .values(reserved=products.c.reserved - bindparam('b_quantity'), updated_at=products.c.updated_at),
+        [{'b_id': product_id, 'b_quantity': quantity} for product_id, quantity in sorted(released.items())],
+    )
+
+
+async def set_reservations(db, user_id: int, items: Dict[int, int]) -> List[dict]:
+    """Make the user's reservations match items ({product_id: quantity}) and restart their TTL.
+
+    Products not in items are released (and reported with quantity 0). Each
+    product is reserved all-or-nothing: when not enough stock is free the
+    existing hold is kept and the product is reported with 'reserved': False.
+    Runs in db's transaction; the caller commits.
+    """
+    result = await db.execute(
+        select(InventoryReservation)
+        .where(InventoryReservation.user_id == user_id)
+        .with_for_update()
+    )
+    existing = {r.product_id: r for r in result.scalars()}
+    expires_at = _expiry()
+
+    stale = [r for product_id, r in existing.items() if product_id not in items]
+    if stale:
+        await db.execute(delete(InventoryReservation).where(InventoryReservation.id.in_([r.id for r in stale])))
+
+    outcome = []
+    # One pass in product id order (released and reserved alike) keeps the row locks in a fixed order
+    for product_id in sorted({*items, *existing}):
+        quantity = items.get(product_id, 0)
+        current = existing.get(product_id)
+        held = current.quantity if current else 0
+        ok = await _adjust_reserved(db, product_id, quantity - held) if quantity != held else True
+        if product_id not in items:
+            outcome.append({'product_id': product_id, 'quantity': 0, 'requested': 0, 'reserved': True})
+            continue
+        if ok:
+            if current:
+                current.quantity = quantity
+                current.expires_at = expires_at
+            else:
+                db.add(InventoryReservation(user_id=user_id, product_id=product_id, quantity=quantity, expires_at=expires_at))
+        elif current:
+            current.expires_at = expires_at
+        outcome.append({'product_id': product_id, 'quantity': quantity if ok else held, 'requested': quantity, 'reserved': ok})
+    await db.flush()
+    return outcome
+
+
+async def release_all(db, user_id: int) -> List[int]:
+    """Release every hold of the user; returns the product ids released."""
+    result = await db.execute(
+        delete(InventoryReservation)
+        .where(InventoryReservation.user_id == user_id)
+        .returning(InventoryReservation.product_id, InventoryReservation.quantity)
+    )
+    rows = result.all()
+    await _release_rows(db, rows)
+    return [product_id for product_id, _ in rows]
+
+
+async def held_quantities(db, user_id: int, product_ids) -> Dict[int, int]:
+    result = await db.execute(
+        select(InventoryReservation.product_id, InventoryReservation.quantity)
+        .where(InventoryReservation.user_id == user_id, InventoryReservation.product_id.in_(product_ids))
+    )
+    return dict(result.all())
+
+
+async def reservation_summary(db, user_id: int) -> dict:
+    """The user's reservations with each product's current available stock."""
+    result = await db.execute(
+        select(
+            InventoryReservation.product_id,
+            InventoryReservation.quantity,
+            InventoryReservation.expires_at,
+            Product.name.label('product_name'),
+            available_stock().label('available_stock'),
+        )
+        .join(Product, Product.id == InventoryReservation.product_id)
+        .where(InventoryReservation.user_id == user_id)
+        .order_by(InventoryReservation.product_id)
+    )
+    items = [dict(row) for row in result.mappings()]
+    return {'items': items, 'expires_at': min((item['expires_at'] for item in items), default=None)}
+
+
+async def consume(db, user_id: int, quantities: Dict[int, int]) -> Tuple[Dict[int, object], List[int]]:
+    """Take quantities ({product_id: quantity}) out of stock for an order, and end all of the user's holds.
+
+    Each product is taken with one conditional UPDATE that also credits the
+    user's reservation for it; products the user held but is not ordering go
+    back to available stock. The user's reservations are deleted (and so
+    locked) before any product row, like the sweeper does.
+
+    Returns ({product_id: (id, name, price) row}, product ids whose hold was
+    released). Stops at the first product that does not exist or whose
+    quantity exceeds the user's hold plus unreserved stock; that product and
+    the ones after it are missing from the rows and the caller must roll
+    back. Runs in db's transaction, so a failed order restores the holds.
+    """
+    result = await db.execute(
+        delete(InventoryReservation)
+        .where(InventoryReservation.user_id == user_id)
+        .returning(InventoryReservation.product_id, InventoryReservation.quantity)
+    )
+    held = dict(result.all())
+    products = {}
+    for product_id in sorted({*quantities, *held}):
+        quantity = quantities.get(product_id, 0)
+        credit = held.get(product_id, 0)
+        if not quantity:
+            await _adjust_reserved(db, product_id, -credit)
+            continue
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock - (Product.reserved - credit) >= quantity)
+            .values(stock=Product.stock - quantity, reserved=Product.reserved - credit, updated_at=Product.updated_at)
+            .returning(Product.id, Product.name, Product.price)
+            .execution_options(synchronize_session=False)
+        )
+        product = result.one_or_none()
+        if product is None:
+            break
+        products[product_id] = product
+    return products, [product_id for product_id in held if product_id not in quantities]
+
+
+async def sweep_expired() -> int:
+    """Delete expired reservations and return their quantities to stock. Returns the number swept."""
+    swept = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            batch = (
+                select(InventoryReservation.id)
+                .where(InventoryReservation.expires_at <= datetime.now(timezone.utc))
+                .order_by(InventoryReservation.expires_at)
+                .limit(SWEEP_BATCH_SIZE)
+                # Rows locked by an in-flight checkout are left for the next pass
+                .with_for_update(skip_locked=True)
+            )
+            result = await session.execute(
+                delete(InventoryReservation)
+                .where(InventoryReservation.id.in_(batch.scalar_subquery()))
+                .returning(InventoryReservation.product_id, InventoryReservation.quantity)
+            )
+            rows = result.all()
+            await _release_rows(session, rows)
+            await session.commit()
+        if rows:
+            # Quoted and listed stock for these products goes up again on every worker
+            cache_bus.publish(cache_bus.CATALOG, {product_id for product_id, _ in rows})
+            cache_bus.publish(cache_bus.PRODUCT_LISTS)
+        swept += len(rows)
+        if len(rows) < SWEEP_BATCH_SIZE:
+            return swept
+
+
+async def reconcile_reserved() -> List[int]:
+    """Correct products.reserved where it differs from the sum of live reservations; returns the product ids fixed.
+
+    Both sides are read in one statement, so they come from one snapshot and
+    transactions in flight (which change both together) do not show up as a
+    difference. The fix is applied as a relative adjustment for the same reason.
+    """
+    async with AsyncSessionLocal() as session:
+        held = (
+            select(InventoryReservation.product_id, func.sum(InventoryReservation.quantity).label('quantity'))
+            .group_by(InventoryReservation.product_id)
+            .subquery('held')
+        )
+        held_quantity = func.coalesce(held.c.quantity, 0)
+        result = await session.execute(
+            select(Product.id, Product.reserved - held_quantity)
+            .outerjoin(held, held.c.product_id == Product.id)
+            .where(Product.reserved != held_quantity)
+            .order_by(Product.id)
+        )
+        excess = result.all()
+        if excess:
+            await _release_rows(session, excess)
+            await session.commit()
+    if excess:
+        print(f"Reconciled reserved stock for {len(excess)} products")
+        cache_bus.publish(cache_bus.CATALOG, [product_id for product_id, _ in excess])
+        cache_bus.publish(cache_bus.PRODUCT_LISTS)
+    return [product_id for product_id, _ in excess]
+
+
+async def run_sweeper() -> None:
+    last_reconciled = 0.0
+    while True:
+        try:
+            await sweep_expired()
+            if time.monotonic() - last_reconciled >= RESERVATION_RECONCILE_SECONDS:
+                await reconcile_reserved()
+                last_reconciled = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Reservation sweep failed: {e}")
+        await asyncio.sleep(RESERVATION_SWEEP_SECONDS)
@@ -0,0 +1,105 @@
+"""Review moderation queue and set-based bulk moderation.
+
+A review is pending until a moderator approves or rejects it; both set
+moderated_at, which takes the review out of the queue. The queue is read from
+the partial index ix_reviews_moderation_queue (pending reviews only, by
+created_at, id), so listing it does not scan the approved reviews.
+
+Bulk actions (approve, reject, delete) select reviews by id list or by
+filter (status, product, rating range, date range, keyword) and run as one
+UPDATE or DELETE ... RETURNING, whatever the number of reviews. The product
+ids in the result let the caller refresh rating rollups once per batch.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+
+from database import REVIEW_QUEUE_PREDICATE, Product, Review
+
+MODERATION_ACTIONS = ('approve', 'reject', 'delete')
+REVIEW_STATUSES = ('pending', 'approved', 'rejected')
+
+
+def status_condition(status: str):
+    if status == 'pending':
+        return REVIEW_QUEUE_PREDICATE
+    if status == 'approved':
+        return Review.is_approved == True
+    return (Review.is_approved == False) & Review.moderated_at.is_not(None)
+
+
+def filter_conditions(
+    status: Optional[str] = None,
+    product_id: Optional[int] = None,
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    keyword: Optional[str] = None,
+) -> list:
+    conditions = []
+    if status:
+        conditions.append(status_condition(status))
+    if product_id:
+        conditions.append(Review.product_id == product_id)
+    if min_rating is not None:
+        conditions.append(Review.rating >= min_rating)
+    if max_rating is not None:
+        conditions.append(Review.rating <= max_rating)
+    if created_after is not None:
+        conditions.append(Review.created_at >= created_after)
+    if created_before is not None:
+        conditions.append(Review.created_at < created_before)
+    if keyword:
+        escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f'%{escaped}%'
+        conditions.append(or_(
+            Review.comment.ilike(pattern, escape='\\'),
+            Review.customer_name.ilike(pattern, escape='\\'),
+        ))
+    return conditions
+
+
+def queue_query(conditions: list, limit: int, offset: int = 0):
+    """Pending reviews, oldest first, with their product name."""
+    return (
+        select(Review, Product.name.label('product_name'))
+        .outerjoin(Product, Product.id == Review.product_id)
+        .where(REVIEW_QUEUE_PREDICATE, *conditions)
+        .order_by(Review.created_at, Review.id)
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+async def queue_size(db, conditions: list) -> int:
+    return (await db.execute(select(func.count()).select_from(Review).where(REVIEW_QUEUE_PREDICATE, *conditions))).scalar_one()
+
+
+async def moderate(db, action: str, review_ids: Optional[List[int]] = None, conditions: Optional[list] = None) -> dict:
+    """Apply action to the selected reviews in db's transaction (the caller commits).
+
+    Returns {'affected': n, 'review_ids': [...], 'product_ids': [...]}.
+    """
+    where = list(conditions or [])
+    if review_ids is not None:
+        where.append(Review.id.in_(review_ids))
+
+    if action == 'delete':
+        stmt = delete(Review).where(*where)
+    else:
+        stmt = (
+            update(Review)
+            .where(*where)
+            .values(is_approved=action == 'approve', moderated_at=func.now())
+        )
+    result = await db.execute(
+        stmt.returning(Review.id, Review.product_id).execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    return {
+        'affected': len(rows),
+        'review_ids': [review_id for review_id, _ in rows],
+        'product_ids': sorted({product_id for _, product_id in rows if product_id is not None}),
+    }
@@ -0,0 +1,191 @@
+"""Full-text product search.
+
+On PostgreSQL each product carries a `search_vector` tsvector built from its
+name (weight A), category name (B) and description (C), indexed with GIN.
+A generated column cannot read the category name from another table, so the
+vector is maintained by triggers instead: one on products (insert, or update
+of name/description/category) and one on categories (rename), which refreshes
+that category's products.
+
+Queries are prefix matches on every term (`term:*`), so results appear as the
+customer types. Ranking uses ts_rank_cd over the weighted vector; highlight
+snippets come from ts_headline, computed only for the rows on the requested
+page because it re-parses the document text.
+
+Other databases (SQLite for local runs) fall back to a case-insensitive
+substring match without ranking or highlights.
+"""
+import os
+import re
+from typing import List, Optional
+
+from sqlalchemy import and_, desc, func, literal_column, or_, select, text
+
+from database import Category, Product
+
+SEARCH_TS_CONFIG = os.getenv('SEARCH_TS_CONFIG', 'english')
+if not re.fullmatch(r'[a-z_]+', SEARCH_TS_CONFIG):
+    raise ValueError(f'Invalid SEARCH_TS_CONFIG: {SEARCH_TS_CONFIG!r}')
+NAME_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, HighlightAll=true'
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "'
+
+# Terms are reduced to word characters so user input never reaches the tsquery parser as syntax
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+search_vector = literal_column('products.search_vector')
+
+SEARCH_DDL = [
+    'ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    f"""
+    CREATE OR REPLACE FUNCTION products_search_vector(p_name text, p_description text, p_category_id integer)
+    RETURNS tsvector LANGUAGE sql STABLE AS $$
+        SELECT setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(p_name, '')), 'A')
+            || setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(
+                   (SELECT name FROM categories WHERE id = p_category_id), '')), 'B')
+            || setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(p_description, '')), 'C')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION products_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := products_search_vector(NEW.name, NEW.description, NEW.category_id);
+        RETURN NEW;
+    END
+    $$
+    """,
+    'DROP TRIGGER IF EXISTS products_search_vector_update ON products',
+    """
+    CREATE TRIGGER products_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description, category_id ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_trigger()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION categories_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE products
+        SET search_vector = products_search_vector(name, description, category_id)
+        WHERE category_id = NEW.id;
+        RETURN NULL;
+    END
+    $$
+    """,
+    'DROP TRIGGER IF EXISTS categories_search_vector_update ON categories',
+    """
+    CREATE TRIGGER categories_search_vector_update
+    AFTER UPDATE OF name ON categories
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION categories_search_vector_trigger()
+    """,
+    'CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)',
+    # Rows that predate the trigger
+    """
+    UPDATE products
+    SET search_vector = products_search_vector(name, description, category_id)
+    WHERE search_vector IS NULL
+    """,
+]
+
+
+async def install(conn) -> None:
+    """Create the search column, triggers and index (idempotent, PostgreSQL only)."""
+    if conn.dialect.name != 'postgresql':
+        return
+    for statement in SEARCH_DDL:
+        await conn.execute(text(statement))
+
+
+def search_terms(q: str) -> List[str]:
+    return TERM_PATTERN.findall(q.lower())[:MAX_TERMS]
+
+
+def prefix_tsquery(terms: List[str]) -> str:
+    """'organic hon' -> 'organic:* & hon:*'"""
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _html_escaped(column):
+    # ts_headline returns the document text verbatim around the <mark> tags
+    return func.replace(func.replace(func.replace(func.coalesce(column, ''), '&', '&amp;'), '<', '&lt;'), '>', '&gt;')
+
+
+async def search_products(db, q: str, columns, category_id: Optional[int] = None,
+                          page: int = 1, page_size: int = 20) -> dict:
+    """Ranked, paginated matches for q with highlight snippets.
+
+    columns are the product list columns to return (Category is outer-joined).
+    Returns {'items': [...], 'total': int}; items carry those columns plus
+    'rank', 'name_highlight' and 'description_highlight'.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return {'items': [], 'total': 0}
+
+    offset = (page - 1) * page_size
+    if db.bind.dialect.name != 'postgresql':
+        return await _search_products_fallback(db, terms, columns, category_id, offset, page_size)
+
+    tsquery = func.to_tsquery(literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig"), prefix_tsquery(terms))
+    rank = func.ts_rank_cd(search_vector, tsquery, 32).label('rank')
+    conditions = [search_vector.op('@@')(tsquery)]
+    if category_id:
+        conditions.append(Product.category_id == category_id)
+
+    # Rank and page on the index first; only the page's rows get headlines
+    matches = (
+        select(Product.id, rank, func.count().over().label('total'))
+        .where(and_(*conditions))
+        .order_by(desc('rank'), Product.id)
+        .limit(page_size)
+        .offset(offset)
+        .cte('matches')
+    )
+    config = literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig")
+    result = await db.execute(
+        select(
+            *columns,
+            matches.c.rank,
+            matches.c.total,
+            func.ts_headline(config, _html_escaped(Product.name), tsquery, NAME_HEADLINE_OPTIONS).label('name_highlight'),
+            func.ts_headline(config, _html_escaped(Product.description), tsquery, HEADLINE_OPTIONS).label('description_highlight'),
+        )
+        .join(matches, matches.c.id == Product.id)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .order_by(desc(matches.c.rank), Product.id)
+    )
+    rows = [dict(row) for row in result.mappings()]
+    total = rows[0].pop('total') if rows else await _count_matches(db, conditions, offset)
+    for row in rows[1:]:
+        row.pop('total')
+    return {'items': rows, 'total': total}
+
+
+async def _count_matches(db, conditions, offset: int) -> int:
+    # Only needed when the requested page is past the end
+    if offset == 0:
+        return 0
+    return (await db.execute(select(func.count()).select_from(Product).where(and_(*conditions)))).scalar_one()
+
+
+async def _search_products_fallback(db, terms: List[str], columns, category_id: Optional[int],
+                                    offset: int, page_size: int) -> dict:
+    term_conditions = [
+        or_(Product.name.ilike(f'%{term}%'), Product.description.ilike(f'%{term}%'), Category.name.ilike(f'%{term}%'))
+        for term in terms
+    ]
+    conditions = term_conditions + ([Product.category_id == category_id] if category_id else [])
+    base = select(Product.id).outerjoin(Category, Product.category_id == Category.id).where(and_(*conditions))
+    total = (await db.execute(select(func.count()).select_from(base.subquery()))).scalar_one()
+    result = await db.execute(
+        select(*columns)
+        .outerjoin(Category, Product.category_id == Category.id)
+        .where(and_(*conditions))
+        .order_by(Product.name, Product.id)
+        .limit(page_size)
+        .offset(offset)
+    )
+    items = [
+        dict(row, rank=0.0, name_highlight=None, description_highlight=None)
+        for row in result.mappings()
+    ]
+    return {'items': items, 'total': total}
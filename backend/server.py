@@ -1,21 +1,22 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime, timezone
 from sqlalchemy import select, update, delete, desc, func
 from sqlalchemy.orm import selectinload
+import asyncio
 import os
+import time
 import uuid
 from dotenv import load_dotenv
 from pathlib import Path
-import shutil
 from fastapi import Request, Response
 
 from database import (
-    init_db,
+    engine,
     get_db,
+    AsyncSessionLocal,
     User,
     Product,
     Category,
@@ -26,16 +27,37 @@ from database import (
     IndianState,
     IndianCity,
 )
-from auth import hash_password, verify_password, create_access_token, get_current_user, get_current_admin
-from email_service import send_order_confirmation_email
+from auth import hash_password, verify_password, create_access_token, get_current_user, get_current_admin, get_optional_user
+from email_service import send_order_confirmation_email, send_order_status_emails
 
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from fastapi.responses import JSONResponse
-
-from locations_seed import seed_indian_states, seed_indian_cities
+from fastapi.responses import JSONResponse, StreamingResponse
+
+import query_stats
+import slow_query_log
+from fast_json import json_response
+from uploads import save_image_upload
+import image_variants
+from static_files import CachedStaticFiles
+from compression import CompressionMiddleware, compressed_cache
+import admission
+import sitemap_cache
+import search
+import product_filters
+import migrate
+import idempotency
+import reservations
+import catalog_cache
+import product_import
+import order_status
+import review_moderation
+import order_events
+import pg_notify
+import cache_bus
+import single_flight
 
 
 ROOT_DIR = Path(__file__).parent
@@ -45,14 +67,21 @@ secure_cookie = ENVIRONMENT == "production"
 
 app = FastAPI()
 api_router = APIRouter(prefix='/api')
-limiter = Limiter(key_func=get_remote_address)
+# Rate limiting can be switched off for load tests (RATE_LIMIT_ENABLED=false)
+limiter = Limiter(
+    key_func=get_remote_address,
+    enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true",
+)
 
 app.state.limiter = limiter
 app.add_middleware(SlowAPIMiddleware)
+# Inside CORS so shed responses still carry CORS headers; before routing, so they cost no DB work
+app.add_middleware(admission.AdmissionControlMiddleware)
 
 
-# Mount static files for serving uploaded images
-app.mount("/static", StaticFiles(directory=str(ROOT_DIR / "static")), name="static")
+# Mount static files for serving uploaded images (content-hashed names are cached as immutable)
+app.mount("/static", CachedStaticFiles(directory=str(ROOT_DIR / "static")), name="static")
+app.mount("/sitemaps", sitemap_cache.sitemap_shards, name="sitemaps")
 
 raw_cors_origins = os.environ.get("CORS_ORIGINS")
 if ENVIRONMENT == "production":
@@ -74,8 +103,46 @@ app.add_middleware(
     allow_origins=allowed_origins,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=['Server-Timing', 'Idempotent-Replayed'],
 )
 
+
+@app.middleware('http')
+async def sql_instrumentation(request: Request, call_next):
+    """Count queries and DB time per request and report them via Server-Timing."""
+    token = query_stats.begin_request()
+    try:
+        response = await call_next(request)
+        stats = query_stats.current_stats()
+    finally:
+        query_stats.end_request(token)
+
+    # Mounted apps (e.g. /static) have no function name; unmatched paths share one bucket
+    endpoint = request.scope.get('endpoint')
+    if endpoint is None:
+        route = 'unmatched'
+    else:
+        route = getattr(endpoint, '__name__', None) or type(endpoint).__name__
+    repeated = query_stats.record_request(route, stats)
+    for statement, count in repeated.items():
+        print(f'Possible N+1 in {route}: statement repeated {count}x: {statement[:200]}')
+
+    if stats.over_budget():
+        print(f'Query budget exceeded in {route}: {stats.count} > {query_stats.QUERY_BUDGET}')
+        if query_stats.QUERY_BUDGET_STRICT:
+            return JSONResponse(
+                status_code=500,
+                content={'detail': f'Query budget exceeded: {stats.count} queries (budget {query_stats.QUERY_BUDGET})'},
+                headers={'Server-Timing': stats.server_timing()},
+            )
+
+    response.headers.append('Server-Timing', stats.server_timing())
+    return response
+
+
+# Outermost, so it compresses whatever the inner layers produce
+app.add_middleware(CompressionMiddleware)
+
 # Pydantic Models
 class UserSignup(BaseModel):
     name: str = Field(min_length=1, max_length=255)
@@ -115,6 +182,11 @@ class ProductCreate(BaseModel):
     image_url: Optional[str] = None
     is_featured: bool = False
 
+class ImageVariantResponse(BaseModel):
+    url: str
+    width: int
+    format: str
+
 class ProductResponse(BaseModel):
     id: int
     name: str
@@ -123,13 +195,41 @@ class ProductResponse(BaseModel):
     category_name: Optional[str] = None
     price: float
     stock: int
+    # Stock not held by other shoppers' cart reservations
+    available_stock: Optional[int] = None
     image_url: Optional[str]
     is_featured: bool
     created_at: datetime
+    image_srcset: List[ImageVariantResponse] = []
 
     class Config:
         from_attributes = True
 
+class ProductSearchResult(ProductResponse):
+    rank: float
+    # HTML-escaped text with matches wrapped in <mark>
+    name_highlight: Optional[str] = None
+    description_highlight: Optional[str] = None
+
+class ProductSearchResponse(BaseModel):
+    items: List[ProductSearchResult]
+    total: int
+    page: int
+    page_size: int
+
+class ProductImportError(BaseModel):
+    line: int
+    # The id cell as given when the row could not be parsed
+    id: Optional[Union[int, str]] = None
+    error: str
+
+class ProductImportResponse(BaseModel):
+    rows: int
+    created: int
+    updated: int
+    errors: List[ProductImportError]
+    dry_run: bool
+
 class CategoryCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -147,7 +247,7 @@ class CategoryResponse(BaseModel):
 
 class OrderItemCreate(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class OrderCreate(BaseModel):
     items: List[OrderItemCreate]
@@ -189,6 +289,74 @@ class OrderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CartReservationRequest(BaseModel):
+    items: List[OrderItemCreate] = Field(max_length=100)
+
+class ReservationItemResponse(BaseModel):
+    product_id: int
+    product_name: str
+    quantity: int
+    available_stock: int
+    expires_at: datetime
+
+class ReservationShortfall(BaseModel):
+    product_id: int
+    requested: int
+    reserved: int
+
+class CartReservationResponse(BaseModel):
+    items: List[ReservationItemResponse]
+    expires_at: Optional[datetime]
+    # Items that could not be held in full; their previous hold (if any) is kept
+    shortfalls: List[ReservationShortfall] = []
+
+class CartQuoteRequest(BaseModel):
+    items: List[OrderItemCreate] = Field(min_length=1, max_length=100)
+
+class CartQuoteLine(BaseModel):
+    product_id: int
+    product_name: str
+    image_url: Optional[str]
+    quantity: int
+    unit_price: float
+    subtotal: float
+    available_stock: int
+    in_stock: bool
+
+class CartQuoteResponse(BaseModel):
+    items: List[CartQuoteLine]
+    total: float
+    # True when every line can be ordered in the requested quantity
+    available: bool
+    # Requested products that no longer exist
+    missing_product_ids: List[int] = []
+
+ORDER_STATUS_PATTERN = '^(' + '|'.join(order_status.ORDER_STATUSES) + ')$'
+
+class OrderStatusBulkUpdate(BaseModel):
+    status: str = Field(pattern=ORDER_STATUS_PATTERN)
+    # Select orders either by id or by current status (oldest first, up to limit; ignored for order_ids)
+    order_ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=order_status.MAX_BULK_ORDERS)
+    from_status: Optional[str] = Field(default=None, pattern=ORDER_STATUS_PATTERN)
+    created_before: Optional[datetime] = None
+    limit: int = Field(default=1000, ge=1, le=order_status.MAX_BULK_ORDERS)
+
+class OrderStatusChange(BaseModel):
+    id: int
+    order_number: str
+    previous_status: str
+
+class OrderStatusRejection(BaseModel):
+    id: int
+    status: Optional[str]
+    error: str
+
+class OrderStatusBulkResponse(BaseModel):
+    status: str
+    updated: int
+    orders: List[OrderStatusChange]
+    rejected: List[OrderStatusRejection]
+
 class ReviewCreate(BaseModel):
     product_id: Optional[int] = None
     customer_name: str
@@ -202,11 +370,34 @@ class ReviewResponse(BaseModel):
     rating: float
     comment: Optional[str]
     is_approved: bool
+    moderated_at: Optional[datetime] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class ModerationQueueItem(ReviewResponse):
+    product_name: Optional[str] = None
+
+class ModerationQueueResponse(BaseModel):
+    items: List[ModerationQueueItem]
+    total: int
+
+class ReviewModerationFilter(BaseModel):
+    status: Optional[str] = Field(default=None, pattern='^(' + '|'.join(review_moderation.REVIEW_STATUSES) + ')$')
+    product_id: Optional[int] = None
+    min_rating: Optional[float] = Field(default=None, ge=0, le=5)
+    max_rating: Optional[float] = Field(default=None, ge=0, le=5)
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    keyword: Optional[str] = Field(default=None, min_length=1, max_length=200)
+
+class ReviewModerationRequest(BaseModel):
+    action: str = Field(pattern='^(' + '|'.join(review_moderation.MODERATION_ACTIONS) + ')$')
+    # Select reviews either by id or by filter
+    review_ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=10000)
+    filter: Optional[ReviewModerationFilter] = None
+
 class AdminLogin(BaseModel):
     username: str
     password: str
@@ -335,6 +526,81 @@ async def validate_state_and_city(
         )
 
 
+# Columns for product list views, in ProductResponse field order
+PRODUCT_LIST_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.description,
+    Product.category_id,
+    Category.name.label('category_name'),
+    Product.price,
+    Product.stock,
+    reservations.available_stock().label('available_stock'),
+    Product.image_url,
+    Product.is_featured,
+    Product.created_at,
+)
+
+
+def product_row_to_dict(row) -> dict:
+    product_dict = dict(row)
+    product_dict['price'] = float(product_dict['price'])
+    return product_dict
+
+
+async def product_srcset(db, image_url: Optional[str]) -> list:
+    variants = await image_variants.load_variants(db, [image_url])
+    return variants.get(image_url, [])
+
+
+# Query builders for the hot list endpoints; tests/test_query_plans.py EXPLAINs these
+def my_orders_query(user_id: int):
+    return (
+        select(Order).options(selectinload(Order.order_items))
+        .where(Order.user_id == user_id)
+        .order_by(desc(Order.created_at))
+    )
+
+
+def admin_orders_query(status_filter: Optional[str] = None, limit: Optional[int] = None, offset: int = 0):
+    query = select(Order).options(selectinload(Order.order_items))
+    if status_filter:
+        query = query.where(Order.status == status_filter)
+    query = query.order_by(desc(Order.created_at)).offset(offset)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def approved_reviews_query(product_id: Optional[int] = None):
+    query = select(Review).where(Review.is_approved == True)
+    if product_id:
+        query = query.where(Review.product_id == product_id)
+    return query.order_by(desc(Review.created_at))
+
+
+def order_to_dict(order: Order) -> dict:
+    """Serialize an order with its loaded items into the OrderResponse shape."""
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'customer_name': order.customer_name,
+        'email': order.email,
+        'phone': order.phone,
+        'address': order.address,
+        'city': order.city,
+        'state': order.state,
+        'pincode': order.pincode,
+        'total_amount': float(order.total_amount),
+        'status': order.status,
+        'notes': order.notes,
+        'created_at': order.created_at,
+        'items': [{'id': item.id, 'product_id': item.product_id, 'product_name': item.product_name,
+                   'quantity': item.quantity, 'price': float(item.price), 'subtotal': float(item.subtotal)}
+                  for item in order.order_items]
+    }
+
+
 # User Auth Endpoints
 @api_router.post('/auth/signup')
 @limiter.limit("5/minute")
@@ -480,35 +746,85 @@ async def update_profile(profile_data: UserProfileUpdate, current_user = Depends
     return user
 
 # Product Endpoints
-@api_router.get('/products', response_model=List[ProductResponse])
-async def get_products(category_id: Optional[int] = None, featured: Optional[bool] = None, db = Depends(get_db)):
-    query = select(Product).options(selectinload(Product.category))
-    if category_id:
-        query = query.where(Product.category_id == category_id)
-    if featured:
-        query = query.where(Product.is_featured == True)
-    query = query.order_by(desc(Product.created_at))
+async def load_product_list(
+    category_id: Optional[int],
+    featured: Optional[bool],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    in_stock: bool,
+    min_rating: Optional[float],
+    sort: str,
+    limit: Optional[int],
+    offset: int,
+) -> list:
+    """One page of the product list, on its own session so concurrent requests can share it."""
+    conditions = product_filters.filter_conditions(category_id, min_price, max_price, in_stock, min_rating, featured)
+    # Select plain columns (no ORM identity map / relationship loading) for the list view
+    query = select(*PRODUCT_LIST_COLUMNS).outerjoin(Category, Product.category_id == Category.id)
+    if product_filters.needs_stats(conditions, sort):
+        query = product_filters.with_stats(query)
+    if conditions:
+        query = query.where(*conditions.values())
+    query = query.order_by(*product_filters.sort_order(sort)).offset(offset)
+    if limit:
+        query = query.limit(limit)
     
-    result = await db.execute(query)
-    products = result.scalars().all()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(query)
+        products_list = [product_row_to_dict(row) for row in result.mappings()]
+        
+        variants = await image_variants.load_variants(db, (p['image_url'] for p in products_list))
+    for product_dict in products_list:
+        product_dict['image_srcset'] = variants.get(product_dict['image_url'], [])
+    return products_list
+
+@api_router.get('/products', response_model=List[ProductResponse])
+async def get_products(
+    category_id: Optional[int] = None,
+    featured: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    sort: str = Query('newest', pattern='^(' + '|'.join(product_filters.SORT_OPTIONS) + ')$'),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    # Concurrent requests for the same page share one query (single_flight.py)
+    params = (category_id, featured, min_price, max_price, in_stock, min_rating, sort, limit, offset)
+    products_list = await single_flight.product_lists.get(params, lambda: load_product_list(*params))
+    return json_response(products_list)
+
+@api_router.get('/products/facets')
+async def get_product_facets(
+    category_id: Optional[int] = None,
+    featured: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    db = Depends(get_db),
+):
+    """Category and price-bucket counts for the current filters"""
+    conditions = product_filters.filter_conditions(category_id, min_price, max_price, in_stock, min_rating, featured)
+    return await product_filters.facet_counts(db, conditions)
+
+@api_router.get('/products/search', response_model=ProductSearchResponse)
+async def search_products(
+    q: str = Query(min_length=1, max_length=200),
+    category_id: Optional[int] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=50),
+    db = Depends(get_db),
+):
+    results = await search.search_products(db, q, PRODUCT_LIST_COLUMNS, category_id, page, page_size)
+    items = [product_row_to_dict(row) for row in results['items']]
     
-    products_list = []
-    for product in products:
-        product_dict = {
-            'id': product.id,
-            'name': product.name,
-            'description': product.description,
-            'category_id': product.category_id,
-            'category_name': product.category.name if product.category else None,
-            'price': float(product.price),
-            'stock': product.stock,
-            'image_url': product.image_url,
-            'is_featured': product.is_featured,
-            'created_at': product.created_at
-        }
-        products_list.append(product_dict)
+    variants = await image_variants.load_variants(db, (p['image_url'] for p in items))
+    for product_dict in items:
+        product_dict['image_srcset'] = variants.get(product_dict['image_url'], [])
     
-    return products_list
+    return json_response({'items': items, 'total': results['total'], 'page': page, 'page_size': page_size})
 
 @api_router.get('/products/{product_id}', response_model=ProductResponse)
 async def get_product(product_id: int, db = Depends(get_db)):
@@ -525,17 +841,25 @@ async def get_product(product_id: int, db = Depends(get_db)):
         'category_name': product.category.name if product.category else None,
         'price': float(product.price),
         'stock': product.stock,
+        'available_stock': max(product.stock - product.reserved, 0),
         'image_url': product.image_url,
         'is_featured': product.is_featured,
-        'created_at': product.created_at
+        'created_at': product.created_at,
+        'image_srcset': await product_srcset(db, product.image_url)
     }
 
 # Category Endpoints
+async def load_categories() -> list:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Category.id, Category.name, Category.description, Category.image_url, Category.created_at)
+            .order_by(Category.name)
+        )
+        return [dict(row) for row in result.mappings()]
+
 @api_router.get('/categories', response_model=List[CategoryResponse])
-async def get_categories(db = Depends(get_db)):
-    result = await db.execute(select(Category).order_by(Category.name))
-    categories = result.scalars().all()
-    return categories
+async def get_categories():
+    return await single_flight.categories.get('all', load_categories)
 
 # Order Endpoints
 @api_router.post('/orders', response_model=OrderResponse)
@@ -546,6 +870,14 @@ async def create_order(
     current_user = Depends(get_current_user),
     db = Depends(get_db),
 ):
+    # Retries with the same key replay the first response instead of ordering twice
+    idempotency_key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+    if idempotency_key is not None:
+        request_hash = idempotency.request_fingerprint(order_data.model_dump_json())
+        replay = await idempotency.claim(db, current_user['user_id'], idempotency_key, request_hash)
+        if replay is not None:
+            return replay
+
     await validate_state_and_city(db, order_data.state, order_data.city)
 
     result = await db.execute(select(User).where(User.id == current_user['user_id']))
@@ -553,17 +885,26 @@ async def create_order(
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
     
+    quantities = {}
+    for item in order_data.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    # Each product is decremented with one conditional UPDATE that also consumes the
+    # customer's reservation; holds on products left out of the order go back to stock
+    # now, not at expiry. Locks are taken in a fixed order (see reservations.py).
+    products, released = await reservations.consume(db, user.id, quantities)
+    for product_id in sorted(quantities):
+        if product_id not in products:
+            name = await db.scalar(select(Product.name).where(Product.id == product_id))
+            if name is None:
+                raise HTTPException(status_code=404, detail=f'Product {product_id} not found')
+            raise HTTPException(status_code=400, detail=f'Insufficient stock for {name}')
+
     total_amount = 0
     order_items_data = []
     
     for item in order_data.items:
-        result = await db.execute(select(Product).where(Product.id == item.product_id))
-        product = result.scalar_one_or_none()
-        if not product:
-            raise HTTPException(status_code=404, detail=f'Product {item.product_id} not found')
-        if product.stock < item.quantity:
-            raise HTTPException(status_code=400, detail=f'Insufficient stock for {product.name}')
-        
+        product = products[item.product_id]
         subtotal = float(product.price) * item.quantity
         total_amount += subtotal
         order_items_data.append({
@@ -573,8 +914,6 @@ async def create_order(
             'price': float(product.price),
             'subtotal': subtotal
         })
-        
-        product.stock -= item.quantity
     
     order_number = f'ORD-{uuid.uuid4().hex[:8].upper()}'
     new_order = Order(
@@ -597,10 +936,10 @@ async def create_order(
         order_item = OrderItem(order_id=new_order.id, **item_data)
         db.add(order_item)
     
-    await db.commit()
-    await db.refresh(new_order, ['order_items'])
-    
-    email_data = {
+    await db.flush()
+    await db.refresh(new_order, ['created_at', 'status', 'order_items'])
+    response = {
+        'id': new_order.id,
         'order_number': new_order.order_number,
         'customer_name': new_order.customer_name,
         'email': new_order.email,
@@ -611,13 +950,24 @@ async def create_order(
         'pincode': new_order.pincode,
         'total_amount': float(new_order.total_amount),
         'status': new_order.status,
-        'created_at': new_order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        'items': order_items_data
+        'notes': new_order.notes,
+        'created_at': new_order.created_at,
+        'items': [{'id': item.id, 'product_id': item.product_id, 'product_name': item.product_name, 
+                   'quantity': item.quantity, 'price': float(item.price), 'subtotal': float(item.subtotal)} 
+                  for item in new_order.order_items]
     }
-    await send_order_confirmation_email(email_data)
+    order = OrderResponse.model_validate(response)
+    if idempotency_key is not None:
+        # Stored in the same transaction as the order, so a replay exists exactly when the order does
+        await idempotency.store_response(db, current_user['user_id'], idempotency_key, order.model_dump_json())
+    # The full order, so admin order lists can add the row without fetching it
+    await order_events.record(db, order_events.ORDER_CREATED, [order.model_dump(mode='json')])
+    await db.commit()
+    catalog_cache.invalidate([*quantities, *released])
+    # List pages show available stock, which this order just changed
+    single_flight.product_lists.invalidate()
     
-    return {
-        'id': new_order.id,
+    email_data = {
         'order_number': new_order.order_number,
         'customer_name': new_order.customer_name,
         'email': new_order.email,
@@ -628,50 +978,96 @@ async def create_order(
         'pincode': new_order.pincode,
         'total_amount': float(new_order.total_amount),
         'status': new_order.status,
-        'notes': new_order.notes,
-        'created_at': new_order.created_at,
-        'items': [{'id': item.id, 'product_id': item.product_id, 'product_name': item.product_name, 
-                   'quantity': item.quantity, 'price': float(item.price), 'subtotal': float(item.subtotal)} 
-                  for item in new_order.order_items]
+        'created_at': new_order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'items': order_items_data
     }
+    await send_order_confirmation_email(email_data)
+    
+    return response
+
+# Cart Endpoints
+@api_router.post('/cart/quote', response_model=CartQuoteResponse)
+async def quote_cart(cart: CartQuoteRequest, current_user = Depends(get_optional_user), db = Depends(get_db)):
+    """Price a whole cart in one request; products come from the catalog cache when warm."""
+    quantities = {}
+    for item in cart.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    # The customer's own holds are part of what they can still buy
+    products, held = await catalog_cache.get_products(db, quantities, current_user['user_id'] if current_user else None)
+
+    lines = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        available = product['available_stock'] + held.get(product_id, 0)
+        lines.append({
+            'product_id': product_id,
+            'product_name': product['name'],
+            'image_url': product['image_url'],
+            'quantity': quantity,
+            'unit_price': product['price'],
+            'subtotal': round(product['price'] * quantity, 2),
+            'available_stock': available,
+            'in_stock': available >= quantity,
+        })
+    return json_response({
+        'items': lines,
+        'total': round(sum(line['subtotal'] for line in lines), 2),
+        'available': all(line['in_stock'] for line in lines) and len(lines) == len(quantities),
+        'missing_product_ids': [product_id for product_id in quantities if product_id not in products],
+    })
+
+# Cart Reservation Endpoints
+@api_router.get('/cart/reservations', response_model=CartReservationResponse)
+async def get_cart_reservations(current_user = Depends(get_current_user), db = Depends(get_db)):
+    return await reservations.reservation_summary(db, current_user['user_id'])
+
+@api_router.put('/cart/reservations', response_model=CartReservationResponse)
+@limiter.limit("30/minute")
+async def set_cart_reservations(
+    cart: CartReservationRequest,
+    request: Request,
+    current_user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    """Hold the cart's quantities for RESERVATION_TTL_MINUTES; replaces the user's previous holds."""
+    quantities = {}
+    for item in cart.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    outcome = await reservations.set_reservations(db, current_user['user_id'], quantities)
+    await db.commit()
+    catalog_cache.invalidate([o['product_id'] for o in outcome])
+    # List pages show available stock, which holds reduce
+    single_flight.product_lists.invalidate()
+    
+    summary = await reservations.reservation_summary(db, current_user['user_id'])
+    summary['shortfalls'] = [
+        {'product_id': o['product_id'], 'requested': o['requested'], 'reserved': o['quantity']}
+        for o in outcome if not o['reserved']
+    ]
+    return summary
+
+@api_router.delete('/cart/reservations')
+async def release_cart_reservations(current_user = Depends(get_current_user), db = Depends(get_db)):
+    released = await reservations.release_all(db, current_user['user_id'])
+    await db.commit()
+    catalog_cache.invalidate(released)
+    if released:
+        single_flight.product_lists.invalidate()
+    return {'message': 'Reservations released'}
 
 @api_router.get('/orders/my-orders', response_model=List[OrderResponse])
 async def get_my_orders(current_user = Depends(get_current_user), db = Depends(get_db)):
-    result = await db.execute(
-        select(Order).options(selectinload(Order.order_items))
-        .where(Order.user_id == current_user['user_id'])
-        .order_by(desc(Order.created_at))
-    )
+    result = await db.execute(my_orders_query(current_user['user_id']))
     orders = result.scalars().all()
     
-    return [{
-        'id': order.id,
-        'order_number': order.order_number,
-        'customer_name': order.customer_name,
-        'email': order.email,
-        'phone': order.phone,
-        'address': order.address,
-        'city': order.city,
-        'state': order.state,
-        'pincode': order.pincode,
-        'total_amount': float(order.total_amount),
-        'status': order.status,
-        'notes': order.notes,
-        'created_at': order.created_at,
-        'items': [{'id': item.id, 'product_id': item.product_id, 'product_name': item.product_name,
-                   'quantity': item.quantity, 'price': float(item.price), 'subtotal': float(item.subtotal)}
-                  for item in order.order_items]
-    } for order in orders]
+    return json_response([order_to_dict(order) for order in orders])
 
 # Review Endpoints
 @api_router.get('/reviews', response_model=List[ReviewResponse])
 async def get_reviews(product_id: Optional[int] = None, db = Depends(get_db)):
-    query = select(Review).where(Review.is_approved == True)
-    if product_id:
-        query = query.where(Review.product_id == product_id)
-    query = query.order_by(desc(Review.created_at))
-    
-    result = await db.execute(query)
+    result = await db.execute(approved_reviews_query(product_id))
     reviews = result.scalars().all()
     return reviews
 
@@ -765,29 +1161,21 @@ async def admin_me(current_admin = Depends(get_current_admin)):
 
 # Admin Image Upload
 @api_router.post('/admin/upload-image')
-async def upload_image(file: UploadFile = File(...), current_admin = Depends(get_current_admin)):
-    # Validate file type
-    allowed_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    
-    if file_ext not in allowed_extensions:
-        raise HTTPException(status_code=400, detail='Invalid file type. Only images are allowed.')
-    
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-    upload_path = ROOT_DIR / "static" / "uploads" / unique_filename
-    
-    # Save file
-    try:
-        with open(upload_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f'Failed to upload image: {str(e)}')
+async def upload_image(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_admin = Depends(get_current_admin),
+):
+    # Streamed to disk off the event loop; type is taken from the file's magic bytes
+    unique_filename = await save_image_upload(file)
     
     # Return the path to access the image (frontend will prepend backend base URL)
     # This keeps the base URL single-sourced from the frontend .env
     image_path = f"/static/uploads/{unique_filename}"
     
+    # Resized WebP/JPEG variants are built in the process pool after the response
+    background_tasks.add_task(image_variants.create_variants, image_path)
+    
     return {
         'image_path': image_path,
         'filename': unique_filename
@@ -799,6 +1187,8 @@ async def admin_create_product(product_data: ProductCreate, current_admin = Depe
     new_product = Product(**product_data.model_dump())
     db.add(new_product)
     await db.commit()
+    sitemap_cache.invalidate()
+    single_flight.product_lists.invalidate()
     await db.refresh(new_product, ['category'])
     
     return {
@@ -811,7 +1201,8 @@ async def admin_create_product(product_data: ProductCreate, current_admin = Depe
         'stock': new_product.stock,
         'image_url': new_product.image_url,
         'is_featured': new_product.is_featured,
-        'created_at': new_product.created_at
+        'created_at': new_product.created_at,
+        'image_srcset': await product_srcset(db, new_product.image_url)
     }
 
 @api_router.put('/admin/products/{product_id}', response_model=ProductResponse)
@@ -825,6 +1216,9 @@ async def admin_update_product(product_id: int, product_data: ProductCreate, cur
         setattr(product, key, value)
     
     await db.commit()
+    sitemap_cache.invalidate()
+    catalog_cache.invalidate([product.id])
+    single_flight.product_lists.invalidate()
     await db.refresh(product, ['category'])
     
     return {
@@ -837,9 +1231,28 @@ async def admin_update_product(product_id: int, product_data: ProductCreate, cur
         'stock': product.stock,
         'image_url': product.image_url,
         'is_featured': product.is_featured,
-        'created_at': product.created_at
+        'created_at': product.created_at,
+        'image_srcset': await product_srcset(db, product.image_url)
     }
 
+@api_router.post('/admin/products/import', response_model=ProductImportResponse)
+async def admin_import_products(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    current_admin = Depends(get_current_admin),
+):
+    """Create/update products from a CSV (see product_import for the format); returns a per-row error report."""
+    report = product_import.new_report(dry_run)
+    try:
+        # The file is parsed and checked as a whole before any product is written
+        await product_import.import_products(product_import.text_lines(file.file), dry_run=dry_run, report=report)
+    except product_import.CSVFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Once for the whole file rather than per product, including batches committed before a failure
+        product_import.publish_changes(report['product_ids'])
+    return report
+
 @api_router.delete('/admin/products/{product_id}')
 async def admin_delete_product(product_id: int, current_admin = Depends(get_current_admin), db = Depends(get_db)):
     result = await db.execute(select(Product).where(Product.id == product_id))
@@ -849,6 +1262,9 @@ async def admin_delete_product(product_id: int, current_admin = Depends(get_curr
     
     await db.delete(product)
     await db.commit()
+    sitemap_cache.invalidate()
+    catalog_cache.invalidate([product_id])
+    single_flight.product_lists.invalidate()
     return {'message': 'Product deleted successfully'}
 
 # Admin Category Management
@@ -857,6 +1273,8 @@ async def admin_create_category(category_data: CategoryCreate, current_admin = D
     new_category = Category(**category_data.model_dump())
     db.add(new_category)
     await db.commit()
+    sitemap_cache.invalidate()
+    single_flight.categories.invalidate()
     await db.refresh(new_category)
     return new_category
 
@@ -871,6 +1289,10 @@ async def admin_update_category(category_id: int, category_data: CategoryCreate,
         setattr(category, key, value)
     
     await db.commit()
+    sitemap_cache.invalidate()
+    single_flight.categories.invalidate()
+    # Product lists carry the category name
+    single_flight.product_lists.invalidate()
     await db.refresh(category)
     return category
 
@@ -883,48 +1305,188 @@ async def admin_delete_category(category_id: int, current_admin = Depends(get_cu
     
     await db.delete(category)
     await db.commit()
+    sitemap_cache.invalidate()
+    single_flight.categories.invalidate()
+    single_flight.product_lists.invalidate()
     return {'message': 'Category deleted successfully'}
 
 # Admin Order Management
 @api_router.get('/admin/orders', response_model=List[OrderResponse])
-async def admin_get_orders(status_filter: Optional[str] = None, current_admin = Depends(get_current_admin), db = Depends(get_db)):
-    query = select(Order).options(selectinload(Order.order_items))
-    if status_filter:
-        query = query.where(Order.status == status_filter)
-    query = query.order_by(desc(Order.created_at))
-    
-    result = await db.execute(query)
+async def admin_get_orders(
+    status_filter: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_admin = Depends(get_current_admin),
+    db = Depends(get_db),
+):
+    result = await db.execute(admin_orders_query(status_filter, limit, offset))
     orders = result.scalars().all()
     
-    return [{
-        'id': order.id,
-        'order_number': order.order_number,
-        'customer_name': order.customer_name,
-        'email': order.email,
-        'phone': order.phone,
-        'address': order.address,
-        'city': order.city,
-        'state': order.state,
-        'pincode': order.pincode,
-        'total_amount': float(order.total_amount),
-        'status': order.status,
-        'notes': order.notes,
-        'created_at': order.created_at,
-        'items': [{'id': item.id, 'product_id': item.product_id, 'product_name': item.product_name,
-                   'quantity': item.quantity, 'price': float(item.price), 'subtotal': float(item.subtotal)}
-                  for item in order.order_items]
-    } for order in orders]
+    return json_response([order_to_dict(order) for order in orders])
+
+def schedule_status_change_events(background_tasks: BackgroundTasks, target: str, result: dict) -> None:
+    """Downstream work for a committed status change, once per batch rather than per order."""
+    if target in order_status.NOTIFY_STATUSES:
+        background_tasks.add_task(send_order_status_emails, result['updated'])
+    if result['restocked_product_ids']:
+        catalog_cache.invalidate(result['restocked_product_ids'])
+        single_flight.product_lists.invalidate()
+        # Cancelled orders no longer count towards units sold
+        background_tasks.add_task(product_filters.refresh_product_stats, result['restocked_product_ids'])
 
 @api_router.patch('/admin/orders/{order_id}/status')
-async def admin_update_order_status(order_id: int, status: str, current_admin = Depends(get_current_admin), db = Depends(get_db)):
-    result = await db.execute(select(Order).where(Order.id == order_id))
-    order = result.scalar_one_or_none()
-    if not order:
-        raise HTTPException(status_code=404, detail='Order not found')
-    
-    order.status = status
+async def admin_update_order_status(
+    order_id: int,
+    background_tasks: BackgroundTasks,
+    status: str = Query(..., pattern=ORDER_STATUS_PATTERN),
+    current_admin = Depends(get_current_admin),
+    db = Depends(get_db),
+):
+    result = await order_status.transition(db, status, order_ids=[order_id])
+    if result['rejected']:
+        rejection = result['rejected'][0]
+        raise HTTPException(status_code=404 if rejection['status'] is None else 409, detail=rejection['error'])
     await db.commit()
-    return {'message': 'Order status updated', 'order_number': order.order_number, 'status': status}
+    schedule_status_change_events(background_tasks, status, result)
+    return {'message': 'Order status updated', 'order_number': result['updated'][0]['order_number'], 'status': status}
+
+@api_router.post('/admin/orders/status', response_model=OrderStatusBulkResponse)
+async def admin_bulk_update_order_status(
+    change: OrderStatusBulkUpdate,
+    background_tasks: BackgroundTasks,
+    current_admin = Depends(get_current_admin),
+    db = Depends(get_db),
+):
+    """Move many orders to one status in a single UPDATE; invalid transitions are reported, not applied."""
+    if (change.order_ids is None) == (change.from_status is None):
+        raise HTTPException(status_code=400, detail='Provide either order_ids or from_status')
+    sources = order_status.sources_for(change.status)
+    if change.from_status is not None and change.from_status not in sources:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Cannot change status from {change.from_status} to {change.status}; allowed from: {', '.join(sources) or 'none'}",
+        )
+    result = await order_status.transition(
+        db, change.status, order_ids=change.order_ids, from_status=change.from_status,
+        created_before=change.created_before, limit=change.limit,
+    )
+    await db.commit()
+    schedule_status_change_events(background_tasks, change.status, result)
+    return {
+        'status': change.status,
+        'updated': len(result['updated']),
+        'orders': result['updated'],
+        'rejected': result['rejected'],
+    }
+
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+SSE_REPLAY_LIMIT = 1000
+
+def sse_message(message: dict) -> str:
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {message['data']}\n\n"
+
+@api_router.get('/admin/orders/events')
+async def admin_order_events(
+    request: Request,
+    last_event_id: Optional[int] = Query(None, ge=0),
+    current_admin = Depends(get_current_admin),
+):
+    """Server-Sent Events feed of order_created and order_status_changed events.
+
+    Resumes after the Last-Event-ID header (sent by EventSource when it
+    reconnects) or the last_event_id query parameter. If more than
+    SSE_REPLAY_LIMIT events were missed, a `reset` event tells the client to
+    reload its lists instead. The stream ends when the admin token expires,
+    so the reconnect is authenticated again.
+    """
+    header = request.headers.get('last-event-id', '')
+    if header.isdigit():
+        last_event_id = int(header)
+    token_expires_at = current_admin.get('exp')
+    # Subscribe before replaying so nothing committed in between is lost; replayed ids are skipped below
+    subscriber = order_events.hub.subscribe()
+
+    async def stream():
+        try:
+            yield f'retry: {SSE_RETRY_MS}\n\n'
+            replayed = set()
+            if last_event_id is not None:
+                missed = await order_events.events_after(last_event_id, SSE_REPLAY_LIMIT + 1)
+                if len(missed) > SSE_REPLAY_LIMIT:
+                    yield f'id: {await order_events.latest_id()}\nevent: reset\ndata: {{}}\n\n'
+                else:
+                    for message in missed:
+                        replayed.add(message['id'])
+                        yield sse_message(message)
+            # A dropped (too slow) subscriber gets what is queued, then reconnects and replays the rest.
+            # Client disconnects cancel this generator, which unsubscribes in the finally.
+            while not (subscriber.dropped and subscriber.queue.empty()):
+                if token_expires_at is not None and time.time() >= token_expires_at:
+                    return
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                if message['id'] not in replayed:
+                    yield sse_message(message)
+        finally:
+            order_events.hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+# Admin Query Metrics
+@api_router.get('/admin/metrics/queries')
+async def admin_get_query_metrics(current_admin = Depends(get_current_admin)):
+    """Per-endpoint query counts and DB time since process start"""
+    return query_stats.get_metrics()
+
+@api_router.get('/admin/metrics/compression')
+async def admin_get_compression_metrics(current_admin = Depends(get_current_admin)):
+    """Compressed-body cache usage"""
+    return compressed_cache.stats()
+
+@api_router.get('/admin/metrics/catalog-cache')
+async def admin_get_catalog_cache_metrics(current_admin = Depends(get_current_admin)):
+    """Catalog (cart pricing) cache usage"""
+    return catalog_cache.catalog_cache.stats()
+
+@api_router.get('/admin/metrics/admission')
+async def admin_get_admission_metrics(current_admin = Depends(get_current_admin)):
+    """Requests in flight and shed per route class, and DB pool checkout pressure"""
+    return admission.stats()
+
+@api_router.get('/admin/metrics/read-cache')
+async def admin_get_read_cache_metrics(current_admin = Depends(get_current_admin)):
+    """Coalesced product list and category cache usage"""
+    return {'product_lists': single_flight.product_lists.stats(), 'categories': single_flight.categories.stats()}
+
+@api_router.get('/admin/metrics/slow-queries')
+async def admin_get_slow_queries(
+    limit: int = Query(20, ge=1, le=100),
+    sort: str = Query('total', pattern='^(' + '|'.join(slow_query_log.SORT_KEYS) + ')$'),
+    explain: bool = False,
+    current_admin = Depends(get_current_admin),
+):
+    """Top statement fingerprints by total/mean/p95/max time or call count"""
+    top = slow_query_log.top_fingerprints(limit, sort)
+    if explain:
+        if not slow_query_log.SLOW_QUERY_EXPLAIN:
+            raise HTTPException(status_code=400, detail='EXPLAIN capture is disabled (set SLOW_QUERY_EXPLAIN=true)')
+        # Plans are only captured for the worst few to keep the report cheap
+        for stats in top[:5]:
+            await slow_query_log.capture_plan(engine, stats)
+    return {
+        'threshold_ms': slow_query_log.SLOW_QUERY_MS,
+        'sort': sort,
+        'fingerprints': [stats.to_dict() for stats in top],
+    }
 
 # Admin User Management
 @api_router.get('/admin/users')
@@ -1122,37 +1684,110 @@ async def admin_create_review(review_data: ReviewCreate, current_admin = Depends
     return new_review
 
 @api_router.patch('/admin/reviews/{review_id}/approve')
-async def admin_approve_review(review_id: int, is_approved: bool, current_admin = Depends(get_current_admin), db = Depends(get_db)):
-    result = await db.execute(select(Review).where(Review.id == review_id))
-    review = result.scalar_one_or_none()
-    if not review:
+async def admin_approve_review(
+    review_id: int,
+    is_approved: bool,
+    background_tasks: BackgroundTasks,
+    current_admin = Depends(get_current_admin),
+    db = Depends(get_db),
+):
+    result = await review_moderation.moderate(db, 'approve' if is_approved else 'reject', review_ids=[review_id])
+    if not result['affected']:
         raise HTTPException(status_code=404, detail='Review not found')
-    
-    review.is_approved = is_approved
     await db.commit()
+    background_tasks.add_task(product_filters.refresh_product_stats, result['product_ids'])
     return {'message': 'Review approval status updated'}
 
+@api_router.get('/admin/reviews/queue', response_model=ModerationQueueResponse)
+async def admin_review_queue(
+    product_id: Optional[int] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    max_rating: Optional[float] = Query(None, ge=0, le=5),
+    keyword: Optional[str] = Query(None, min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_admin = Depends(get_current_admin),
+    db = Depends(get_db),
+):
+    """Reviews awaiting moderation, oldest first"""
+    conditions = review_moderation.filter_conditions(
+        product_id=product_id, min_rating=min_rating, max_rating=max_rating, keyword=keyword
+    )
+    result = await db.execute(review_moderation.queue_query(conditions, limit, offset))
+    items = [
+        {**ReviewResponse.model_validate(review).model_dump(), 'product_name': product_name}
+        for review, product_name in result.all()
+    ]
+    return {'items': items, 'total': await review_moderation.queue_size(db, conditions)}
+
+@api_router.post('/admin/reviews/moderate')
+async def admin_moderate_reviews(
+    request_data: ReviewModerationRequest,
+    background_tasks: BackgroundTasks,
+    current_admin = Depends(get_current_admin),
+    db = Depends(get_db),
+):
+    """Approve, reject or delete many reviews in one statement"""
+    if (request_data.review_ids is None) == (request_data.filter is None):
+        raise HTTPException(status_code=400, detail='Provide either review_ids or filter')
+    conditions = None
+    if request_data.filter is not None:
+        conditions = review_moderation.filter_conditions(**request_data.filter.model_dump())
+        if not conditions:
+            raise HTTPException(status_code=400, detail='Filter must set at least one field')
+    
+    result = await review_moderation.moderate(db, request_data.action, request_data.review_ids, conditions)
+    await db.commit()
+    # Ratings shown on products change once, after the whole batch
+    if result['product_ids']:
+        background_tasks.add_task(product_filters.refresh_product_stats, result['product_ids'])
+    return {'action': request_data.action, 'affected': result['affected']}
+
 app.include_router(api_router)
 
 @app.on_event('startup')
 async def startup():
-    await init_db()
-    # Seed reference data for Indian states (idempotent)
-    from database import AsyncSessionLocal
-
-    async with AsyncSessionLocal() as session:
-        await seed_indian_states(session)
-        await seed_indian_cities(session)
+    # Migrations and seed data are a deploy step (python migrate.py); workers only check the version
+    await migrate.verify_schema()
+    app.state.stats_refresher = asyncio.create_task(product_filters.run_stats_refresher())
+    app.state.idempotency_purger = asyncio.create_task(idempotency.run_purger())
+    app.state.reservation_sweeper = asyncio.create_task(reservations.run_sweeper())
+    app.state.pg_listener = asyncio.create_task(pg_notify.listener.run())
+    app.state.order_event_hub = asyncio.create_task(order_events.hub.run())
+    app.state.order_event_purger = asyncio.create_task(order_events.run_purger())
+    app.state.cache_bus_publisher = asyncio.create_task(cache_bus.run_publisher())
+
+@app.on_event('shutdown')
+async def shutdown():
+    app.state.stats_refresher.cancel()
+    app.state.idempotency_purger.cancel()
+    app.state.reservation_sweeper.cancel()
+    app.state.pg_listener.cancel()
+    app.state.order_event_hub.cancel()
+    app.state.order_event_purger.cancel()
+    app.state.cache_bus_publisher.cancel()
+    try:
+        # Evictions published in the last few milliseconds still reach the other workers
+        await cache_bus.flush()
+    except Exception as e:
+        print(f"Cache invalidation flush on shutdown failed: {e}")
+    image_variants.shutdown_executor()
 
 @app.get('/')
 async def root():
     return {'message': 'Samruddhi Organics API'}
 
+@app.get('/sitemap.xml', include_in_schema=False)
+async def sitemap_xml(request: Request):
+    return await sitemap_cache.index_response(request.scope)
+
+HEALTH_DB_TIMEOUT_SECONDS = float(os.getenv('HEALTH_DB_TIMEOUT_SECONDS', '2'))
+
 @app.get('/health')
 async def health(db = Depends(get_db)):
     try:
-        # Simple DB check
-        await db.execute(select(1))
+        # Simple DB check, bounded so a saturated pool fails the check instead of hanging it
+        await asyncio.wait_for(db.execute(select(1)), timeout=HEALTH_DB_TIMEOUT_SECONDS)
     except Exception:
         raise HTTPException(status_code=503, detail='Database unavailable')
     return {'status': 'ok'}
@@ -0,0 +1,118 @@
+"""Request coalescing (single-flight) with stale-while-revalidate for hot reads.
+
+`SingleFlightCache.get(key, load)` returns the value cached for key (the
+query and its parameters). On a miss the first caller starts `load()` as a
+task and every concurrent caller for the same key awaits that same task, so
+a cold or expired key costs one query however many requests arrive at once.
+Loaders open their own session, so a caller that disconnects does not cancel
+the load for the others.
+
+Entries are fresh for `ttl` seconds, then stale for another `stale_ttl`: a
+stale entry is served as is while one background task reloads it. Past that
+it is a miss again. Failed loads are not cached; every waiter gets the
+exception, and a failed background refresh leaves the stale entry in place.
+Nothing is served stale while cache_bus is not delivering evictions.
+
+Each cache is a cache_bus namespace. `invalidate()` drops every entry on all
+workers, and loads that started before it are neither stored nor joined.
+Cached values are shared between requests and must not be mutated.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import cache_bus
+
+PRODUCT_LIST_CACHE_TTL_SECONDS = float(os.getenv('PRODUCT_LIST_CACHE_TTL_SECONDS', '10'))
+CATEGORY_CACHE_TTL_SECONDS = float(os.getenv('CATEGORY_CACHE_TTL_SECONDS', '300'))
+STALE_WHILE_REVALIDATE_SECONDS = float(os.getenv('STALE_WHILE_REVALIDATE_SECONDS', '60'))
+
+
+class SingleFlightCache:
+    """LRU of loaded values with at most one load in flight per key."""
+
+    def __init__(self, namespace: str, ttl: float, stale_ttl: float, max_entries: int = 1000):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.generation = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Task] = {}
+        cache_bus.register(namespace, self.evict)
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            if age < self.ttl + self.stale_ttl and cache_bus.reliable():
+                self.stale_hits += 1
+                if key not in self._loading:
+                    self._start(key, load)
+                return entry[1]
+
+        task = self._loading.get(key)
+        if task is None:
+            self.misses += 1
+            task = self._start(key, load)
+        else:
+            self.coalesced += 1
+        # Shielded so one waiter being cancelled does not cancel the load for the rest
+        return await asyncio.shield(task)
+
+    def _start(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        generation = self.generation
+        task = asyncio.create_task(load())
+        self._loading[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done, generation))
+        return task
+
+    def _finished(self, key: Hashable, task: asyncio.Task, generation: int) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            print(f"{self.namespace} cache load failed: {error}")
+            return
+        if generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic(), task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def evict(self, keys: Optional[list] = None) -> None:
+        """Drop entries on this worker; loads already running finish for their waiters only."""
+        self.generation += 1
+        if keys is None:
+            self._entries.clear()
+            self._loading.clear()
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+            self._loading.pop(key, None)
+
+    def invalidate(self) -> None:
+        cache_bus.publish(self.namespace)
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries), 'loading': len(self._loading), 'hits': self.hits,
+            'stale_hits': self.stale_hits, 'misses': self.misses, 'coalesced': self.coalesced,
+        }
+
+
+product_lists = SingleFlightCache(cache_bus.PRODUCT_LISTS, PRODUCT_LIST_CACHE_TTL_SECONDS, STALE_WHILE_REVALIDATE_SECONDS)
+categories = SingleFlightCache(cache_bus.CATEGORIES, CATEGORY_CACHE_TTL_SECONDS, STALE_WHILE_REVALIDATE_SECONDS, max_entries=1)
@@ -0,0 +1,102 @@
+"""Sitemap served by the backend.
+
+`/sitemap.xml` and `/sitemaps/<shard>.xml.gz` are built lazily by
+generate_sitemap into SITEMAP_CACHE_DIR and served from there with
+ETag/Last-Modified, so crawler hits between catalog changes are plain file
+reads or 304s. The admin product and category endpoints call `invalidate()`;
+the next sitemap request then runs an incremental rebuild that only rewrites
+the shards whose products changed. Unchanged files keep their mtime, so their
+validators stay stable.
+
+The dirty flag is per process; invalidations reach the other workers through
+cache_bus, and SITEMAP_MAX_AGE bounds how long one that missed a message can
+serve a sitemap that predates the change.
+"""
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from starlette.responses import Response
+from starlette.types import Scope
+
+import cache_bus
+from generate_sitemap import INDEX_FILE, SHARD_DIR, generate_sitemap_async, get_base_url
+from static_files import CachedStaticFiles
+
+ROOT_DIR = Path(__file__).parent
+SITEMAP_CACHE_DIR = Path(os.getenv('SITEMAP_CACHE_DIR') or ROOT_DIR / 'cache' / 'sitemap')
+SITEMAP_MAX_AGE = int(os.getenv('SITEMAP_MAX_AGE', '300'))
+# Where crawlers fetch shards from; the storefront proxies /sitemaps/ here by default
+SITEMAP_SHARD_BASE_URL = os.getenv('SITEMAP_SHARD_BASE_URL')
+
+_lock = asyncio.Lock()
+_dirty = True
+_built_at = 0.0
+
+
+def _mark_dirty(keys=None) -> None:
+    global _dirty
+    _dirty = True
+
+
+def invalidate() -> None:
+    """Mark the sitemap stale on every worker; it is rebuilt on the next request."""
+    cache_bus.publish(cache_bus.SITEMAP)
+
+
+cache_bus.register(cache_bus.SITEMAP, _mark_dirty)
+
+
+def _is_stale() -> bool:
+    if _dirty or time.monotonic() - _built_at > SITEMAP_MAX_AGE:
+        return True
+    return not (SITEMAP_CACHE_DIR / INDEX_FILE).exists()
+
+
+async def ensure_fresh() -> None:
+    global _dirty, _built_at
+    if not _is_stale():
+        return
+    async with _lock:
+        if not _is_stale():
+            return
+        # Cleared before building so an invalidation during the build triggers another one
+        _dirty = False
+        try:
+            await generate_sitemap_async(
+                str(SITEMAP_CACHE_DIR), base_url=get_base_url(), shard_base_url=SITEMAP_SHARD_BASE_URL
+            )
+        except Exception:
+            _dirty = True
+            raise
+        _built_at = time.monotonic()
+
+
+class SitemapFiles(CachedStaticFiles):
+    """Static files from the sitemap cache, rebuilt first when stale."""
+
+    async def check_config(self) -> None:
+        # The cache directory only exists after the first build
+        await ensure_fresh()
+        await super().check_config()
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        await ensure_fresh()
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        # Shards are served as gzip files, not as gzip-encoded XML
+        if str(full_path).endswith('.gz') and 'content-type' in response.headers:
+            response.headers['content-type'] = 'application/gzip'
+        return response
+
+
+sitemap_index = SitemapFiles(directory=str(SITEMAP_CACHE_DIR), check_dir=False)
+sitemap_shards = SitemapFiles(directory=str(SITEMAP_CACHE_DIR / SHARD_DIR), check_dir=False)
+
+
+async def index_response(scope: Scope) -> Response:
+    return await sitemap_index.get_response(INDEX_FILE, scope)
@@ -0,0 +1,206 @@
+"""Slow-query recorder with statement fingerprints.
+
+Every statement is normalized to a fingerprint (literals, bind placeholders and
+IN-lists collapsed) and timings are aggregated per fingerprint: count, total,
+max and p50/p95 over a bounded window of recent samples. Only statements slower
+than SLOW_QUERY_MS are printed.
+
+For each fingerprint the slowest SELECT seen so far is kept together with its
+parameters, so the admin report can EXPLAIN the worst offenders on demand
+instead of on the request path. EXPLAIN ANALYZE executes the statement, so it
+is only used for plain reads from tables; a SELECT that locks rows or calls a
+function with side effects (advisory locks, pg_notify, sequences) gets a plain
+EXPLAIN, which plans it without running it.
+
+Timings come from query_stats' cursor listeners (see `install`).
+"""
+import hashlib
+import os
+import re
+from collections import deque
+from typing import Dict, List, Optional
+
+import query_stats
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+# Number of recent timings kept per fingerprint for percentile estimates
+SLOW_QUERY_SAMPLES = int(os.getenv('SLOW_QUERY_SAMPLES', '500'))
+# Allow the admin report to EXPLAIN (ANALYZE for plain reads) the worst statements
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_NUMBERED_PLACEHOLDER = re.compile(r'\$\d+')
+_CAST = re.compile(r'\?::[\w\[\]]+(?:\(\d+(?:,\s*\d+)?\))?')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|(?<![:\w]):\w+')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+_FROM = re.compile(r'\bFROM\b', re.IGNORECASE)
+_LOCKING_CLAUSE = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b', re.IGNORECASE)
+_SIDE_EFFECT_CALL = re.compile(
+    r'\b(?:pg_(?:try_)?advisory\w*|pg_notify|nextval|setval|set_config|pg_sleep\w*|lo_\w+|dblink\w*'
+    r'|pg_cancel_backend|pg_terminate_backend)\s*\(',
+    re.IGNORECASE,
+)
+
+
+def normalize_statement(statement: str) -> str:
+    """Reduce a statement to its shape so that calls differing only in values match."""
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _NUMBERED_PLACEHOLDER.sub('?', normalized)
+    normalized = _CAST.sub('?', normalized)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _IN_LIST.sub('IN (...)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+def can_analyze(statement: str) -> bool:
+    """Whether running the statement under EXPLAIN ANALYZE only reads tables."""
+    return (
+        statement.lstrip().upper().startswith('SELECT')
+        and _FROM.search(statement) is not None
+        and _LOCKING_CLAUSE.search(statement) is None
+        and _SIDE_EFFECT_CALL.search(statement) is None
+    )
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class FingerprintStats:
+    """Aggregated timings for one statement fingerprint."""
+
+    __slots__ = (
+        'fingerprint', 'statement', 'count', 'total_ms', 'max_ms', 'slow_count',
+        'samples', 'worst_statement', 'worst_parameters', 'plan', 'plan_analyzed',
+    )
+
+    def __init__(self, fingerprint_id: str, statement: str):
+        self.fingerprint = fingerprint_id
+        self.statement = statement
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow_count = 0
+        self.samples = deque(maxlen=SLOW_QUERY_SAMPLES)
+        self.worst_statement: Optional[str] = None
+        self.worst_parameters = None
+        self.plan = None
+        self.plan_analyzed = False
+
+    def add(self, raw_statement: str, parameters, duration_ms: float) -> None:
+        self.count += 1
+        self.total_ms += duration_ms
+        self.samples.append(duration_ms)
+        if duration_ms >= SLOW_QUERY_MS:
+            self.slow_count += 1
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+            if raw_statement.lstrip().upper().startswith('SELECT'):
+                self.worst_statement = raw_statement
+                self.worst_parameters = parameters
+                # A new worst case invalidates the previously captured plan
+                self.plan = None
+
+    def to_dict(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            'fingerprint': self.fingerprint,
+            'statement': self.statement,
+            'count': self.count,
+            'slow_count': self.slow_count,
+            'total_ms': round(self.total_ms, 2),
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else 0.0,
+            'p50_ms': round(_percentile(ordered, 50), 2),
+            'p95_ms': round(_percentile(ordered, 95), 2),
+            'max_ms': round(self.max_ms, 2),
+            'plan': self.plan,
+            'plan_analyzed': self.plan_analyzed,
+        }
+
+
+_fingerprints: Dict[str, FingerprintStats] = {}
+# Raw statement -> fingerprint id, so the regexes run once per distinct statement
+_normalized_cache: Dict[str, str] = {}
+_NORMALIZED_CACHE_SIZE = 5000
+
+
+def record(statement: str, parameters, duration_ms: float) -> None:
+    fingerprint_id = _normalized_cache.get(statement)
+    if fingerprint_id is None:
+        normalized = normalize_statement(statement)
+        fingerprint_id = fingerprint(normalized)
+        if len(_normalized_cache) >= _NORMALIZED_CACHE_SIZE:
+            _normalized_cache.clear()
+        _normalized_cache[statement] = fingerprint_id
+        if fingerprint_id not in _fingerprints:
+            _fingerprints[fingerprint_id] = FingerprintStats(fingerprint_id, normalized)
+
+    _fingerprints[fingerprint_id].add(statement, parameters, duration_ms)
+
+    if duration_ms >= SLOW_QUERY_MS:
+        print(f'Slow query ({duration_ms:.1f} ms) [{fingerprint_id}]: {_WHITESPACE.sub(" ", statement)[:500]}')
+
+
+SORT_KEYS = {
+    'total': lambda s: s.total_ms,
+    'mean': lambda s: s.total_ms / s.count if s.count else 0.0,
+    'p95': lambda s: _percentile(sorted(s.samples), 95),
+    'max': lambda s: s.max_ms,
+    'count': lambda s: s.count,
+}
+
+
+def top_fingerprints(limit: int = 20, sort: str = 'total') -> List[FingerprintStats]:
+    return sorted(_fingerprints.values(), key=SORT_KEYS[sort], reverse=True)[:limit]
+
+
+async def capture_plan(engine, stats: FingerprintStats):
+    """EXPLAIN the worst recorded call of a fingerprint, with ANALYZE and BUFFERS when can_analyze allows.
+
+    Runs on its own connection inside a transaction that is always rolled back.
+    """
+    if not stats.worst_statement or stats.plan is not None:
+        return stats.plan
+    analyze = can_analyze(stats.worst_statement)
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            result = await conn.exec_driver_sql(
+                f'EXPLAIN ({options}) {stats.worst_statement}',
+                stats.worst_parameters or (),
+            )
+            stats.plan_analyzed = analyze
+            stats.plan = result.scalar()
+        except Exception as e:
+            stats.plan = {'error': str(e)}
+        finally:
+            await trans.rollback()
+    return stats.plan
+
+
+def reset() -> None:
+    _fingerprints.clear()
+    _normalized_cache.clear()
+
+
+def _on_statement(statement: str, parameters, duration: float) -> None:
+    # EXPLAIN runs issued by the report itself are not part of the workload
+    if statement.startswith('EXPLAIN ('):
+        return
+    record(statement, parameters, duration * 1000.0)
+
+
+def install() -> None:
+    """Record every statement timed by query_stats (which must be installed on the engine)."""
+    query_stats.observe(_on_statement)
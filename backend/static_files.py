@@ -0,0 +1,143 @@
+"""Static file serving with long-lived caching and byte-range support.
+
+Uploads and their variants are stored under content-hashed names, so a given
+URL always refers to the same bytes. Those paths are served with an immutable
+one-year Cache-Control and an ETag derived from the hash itself, which stays
+stable across workers and deploys. Other files (legacy random names) get a
+short max-age and revalidate through ETag/Last-Modified.
+
+Starlette's FileResponse does not implement Range requests in the version we
+pin, so single byte ranges (including If-Range) are handled here; multi-range
+requests fall back to the full body, which RFC 9110 allows.
+
+Uploads are images, which are already compressed, so nothing here is served
+with a Content-Encoding.
+"""
+import os
+import re
+from typing import Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600, must-revalidate"
+
+# <sha256 prefix>.<ext> for originals, <sha256 prefix>-<width>w.<ext> for variants
+CONTENT_HASHED_NAME = re.compile(r"^(?P<hash>[0-9a-f]{40})\.\w+$|^(?P<variant_hash>[0-9a-f]{20})-\d+w\.\w+$")
+
+
+def content_hash_from_path(path: str) -> Optional[str]:
+    match = CONTENT_HASHED_NAME.match(os.path.basename(path))
+    if not match:
+        return None
+    return match.group("hash") or match.group("variant_hash")
+
+
+def parse_byte_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single 'bytes=' range into inclusive (start, end).
+
+    Returns None for headers we do not serve partially (malformed or multiple
+    ranges) and raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text == "":
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(0, file_size - length), file_size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else file_size - 1
+    except ValueError:
+        if start_text.isdigit() or end_text.isdigit():
+            raise
+        return None
+    if start >= file_size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, min(end, file_size - 1)
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that can send a single byte range with 206 Partial Content."""
+
+    def __init__(self, *args, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.byte_range = byte_range
+        self.headers["accept-ranges"] = "bytes"
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{self.stat_result.st_size}"
+            self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.byte_range is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = self.byte_range
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        content_hash = content_hash_from_path(str(full_path))
+
+        headers = {"cache-control": IMMUTABLE_CACHE_CONTROL if content_hash else DEFAULT_CACHE_CONTROL}
+        if content_hash:
+            headers["etag"] = f'"{content_hash}"'
+
+        response = RangeFileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        range_header = request_headers.get("range")
+        if range_header and status_code == 200 and self._if_range_matches(request_headers, response.headers):
+            try:
+                byte_range = parse_byte_range(range_header, stat_result.st_size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={"content-range": f"bytes */{stat_result.st_size}", "accept-ranges": "bytes"},
+                )
+            if byte_range is not None:
+                return RangeFileResponse(
+                    full_path, status_code=status_code, stat_result=stat_result,
+                    headers=headers, byte_range=byte_range,
+                )
+        return response
+
+    @staticmethod
+    def _if_range_matches(request_headers: Headers, response_headers) -> bool:
+        """A Range is only honoured if If-Range (when sent) still matches the file."""
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            return if_range == response_headers.get("etag")
+        return if_range == response_headers.get("last-modified")
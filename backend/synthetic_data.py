@@ -0,0 +1,301 @@
+"""Deterministic synthetic data generator for performance testing.
+
+Creates configurable volumes of users, categories, products, orders (with
+items) and reviews. The same --seed always produces the same rows (dates are
+relative to the run date), so benchmark runs and query-plan checks are
+reproducible.
+
+Rows are written in batches: on PostgreSQL through asyncpg's binary COPY,
+elsewhere (e.g. SQLite for quick local runs) through multi-row INSERTs. Primary
+keys are assigned up front so orders and their items can be streamed without
+round trips; sequences are moved past the loaded ids at the end.
+
+Distributions are skewed the way a real store is: product popularity and
+repeat customers follow a Zipf-like curve, order volume grows over time with
+a daily shopping peak, most orders carry 1-3 items and order status depends
+on the order's age.
+
+Usage (from the backend directory):
+    python synthetic_data.py --users 100000 --products 20000 --orders 5000000 --reviews 200000
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable, List, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, func, insert, text
+
+from auth import hash_password
+from database import AsyncSessionLocal, User, Category, Product, Order, OrderItem, Review
+from locations_seed import INDIAN_STATES, SEED_CITIES
+
+CATEGORY_NAMES = [
+    'Organic Seeds', 'Organic Fertilizers', 'Bio-Pesticides', 'Farming Tools',
+    'Growth Promoters', 'Soil Conditioners', 'Irrigation Supplies', 'Animal Feed',
+]
+PRODUCT_WORDS = [
+    'Neem', 'Vermicompost', 'Tomato', 'Wheat', 'Spinach', 'Carrot', 'Chilli', 'Okra',
+    'Cow Dung', 'Seaweed', 'Jeevamrut', 'Trichoderma', 'Panchagavya', 'Mustard', 'Turmeric',
+]
+PRODUCT_KINDS = ['Seeds', 'Powder', 'Oil', 'Granules', 'Spray', 'Cake', 'Liquid', 'Kit']
+FIRST_NAMES = ['Ramesh', 'Sunita', 'Vijay', 'Priya', 'Anil', 'Kavita', 'Suresh', 'Meena', 'Rahul', 'Pooja']
+LAST_NAMES = ['Patil', 'Deshmukh', 'Kumar', 'Sharma', 'Reddy', 'Iyer', 'Singh', 'Joshi', 'Naidu', 'Gupta']
+REVIEW_PHRASES = [
+    'Excellent quality', 'Good value for money', 'Fast delivery', 'Works as described',
+    'Improved my yield', 'Packaging could be better', 'Will buy again', 'Not as expected',
+]
+# (rating, weight) - storefront ratings skew positive with a long negative tail
+RATING_WEIGHTS = [(Decimal(r), w) for r, w in [('5.0', 45), ('4.0', 30), ('3.0', 12), ('2.0', 6), ('1.0', 7)]]
+# Number of line items per order
+ITEM_COUNT_WEIGHTS = [(1, 45), (2, 28), (3, 14), (4, 7), (5, 4), (6, 2)]
+
+
+def zipf_cum_weights(n: int, exponent: float = 1.1) -> List[float]:
+    """Cumulative Zipf weights for rank 1..n, for use with random.choices."""
+    return list(itertools.accumulate(1.0 / math.pow(rank, exponent) for rank in range(1, n + 1)))
+
+
+def order_timestamp(rng: random.Random, now: datetime, days: int) -> datetime:
+    """Order time with linearly growing volume over the window and a daytime peak."""
+    # sqrt of a uniform sample has a linearly increasing density
+    age_days = days * (1.0 - math.sqrt(rng.random()))
+    day = now - timedelta(days=int(age_days))
+    hour = min(23, max(0, int(rng.gauss(14, 4))))
+    timestamp = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60), microsecond=0)
+    # Today's later hours have not happened yet; mirror them into the hours before now
+    if timestamp > now:
+        timestamp = (now - (timestamp - now)).replace(microsecond=0)
+    return timestamp
+
+
+def order_status(rng: random.Random, age: timedelta) -> str:
+    if age < timedelta(days=1):
+        return rng.choices(['pending', 'processing', 'cancelled'], [70, 25, 5])[0]
+    if age < timedelta(days=7):
+        return rng.choices(['processing', 'shipped', 'delivered', 'cancelled'], [20, 45, 30, 5])[0]
+    return rng.choices(['delivered', 'cancelled'], [93, 7])[0]
+
+
+def batched(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+async def bulk_load(session, table, columns: Sequence[str], rows: List[Tuple]) -> None:
+    """Write a batch of rows with COPY on PostgreSQL, multi-row INSERT otherwise."""
+    if not rows:
+        return
+    if session.bind.dialect.name == 'postgresql':
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table.name, records=rows, columns=list(columns))
+    else:
+        await session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+
+async def next_id(session, model) -> int:
+    return (await session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+async def reset_sequences(session) -> None:
+    if session.bind.dialect.name != 'postgresql':
+        return
+    for table in ('users', 'categories', 'products', 'orders', 'order_items', 'reviews'):
+        await session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+    await session.commit()
+
+
+async def generate(
+    users: int = 1000,
+    products: int = 500,
+    orders: int = 10000,
+    reviews: int = 2000,
+    days: int = 730,
+    seed: int = 42,
+    batch_size: int = 20000,
+) -> dict:
+    """Generate the requested volumes and return the id ranges that were created."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    # bcrypt is deliberately slow; every synthetic user shares one hash
+    password_hash = hash_password('synthetic-password')
+    state_names = {s['code']: s['name'] for s in INDIAN_STATES}
+    started = time.perf_counter()
+
+    async with AsyncSessionLocal() as session:
+        # Categories (reuse existing ones by name)
+        category_ids = []
+        for name in CATEGORY_NAMES:
+            category = await session.scalar(select(Category).where(Category.name == name))
+            if not category:
+                category = Category(name=name, description=f'{name} for organic farming')
+                session.add(category)
+                await session.flush()
+            category_ids.append(category.id)
+        await session.commit()
+
+        # Users
+        first_user_id = await next_id(session, User)
+        user_rows = []
+        user_ids = list(range(first_user_id, first_user_id + users))
+        for user_id in user_ids:
+            city = rng.choice(SEED_CITIES)
+            user_rows.append((
+                user_id,
+                f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                f'synthetic-{seed}-{user_id}@samruddhiorganics.test',
+                f'9{rng.randrange(10**9):09d}',
+                password_hash,
+                f'{rng.randint(1, 999)} Farm Road',
+                city['name'],
+                state_names[city['state_code']],
+                f'{rng.randint(110000, 855999)}',
+                True,
+                now - timedelta(days=rng.randint(0, days)),
+            ))
+        user_columns = ('id', 'name', 'email', 'phone', 'password_hash', 'address', 'city', 'state',
+                        'pincode', 'is_active', 'created_at')
+        for batch in batched(user_rows, batch_size):
+            await bulk_load(session, User.__table__, user_columns, batch)
+            await session.commit()
+        print(f'Created {users} users')
+
+        # Products
+        first_product_id = await next_id(session, Product)
+        product_ids = list(range(first_product_id, first_product_id + products))
+        product_rows = []
+        prices = {}
+        for product_id in product_ids:
+            # Numeric columns are loaded as Decimal so binary COPY encodes them exactly
+            price = Decimal(f'{rng.lognormvariate(5.8, 0.8):.2f}')
+            prices[product_id] = (f'{rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_KINDS)} #{product_id}', price)
+            created_at = now - timedelta(days=rng.randint(0, days))
+            product_rows.append((
+                product_id,
+                prices[product_id][0],
+                'Certified organic product for healthy soil and crops. ' * rng.randint(1, 5),
+                rng.choice(category_ids),
+                price,
+                rng.choice([0, rng.randint(1, 9), rng.randint(10, 1000)]),
+                f'/static/uploads/synthetic-{product_id % 50}.png',
+                rng.random() < 0.05,
+                created_at,
+                created_at + timedelta(days=rng.randint(0, 30)),
+            ))
+        product_columns = ('id', 'name', 'description', 'category_id', 'price', 'stock', 'image_url',
+                           'is_featured', 'created_at', 'updated_at')
+        for batch in batched(product_rows, batch_size):
+            await bulk_load(session, Product.__table__, product_columns, batch)
+            await session.commit()
+        print(f'Created {products} products')
+
+        # Orders and order items, streamed in batches
+        product_cum_weights = zipf_cum_weights(len(product_ids))
+        user_cum_weights = zipf_cum_weights(len(user_ids), exponent=0.8)
+        item_counts, item_count_weights = zip(*ITEM_COUNT_WEIGHTS)
+        users_by_id = {row[0]: row for row in user_rows}
+        next_order_id = await next_id(session, Order)
+        next_item_id = await next_id(session, OrderItem)
+        order_columns = ('id', 'order_number', 'user_id', 'customer_name', 'email', 'phone', 'address', 'city',
+                         'state', 'pincode', 'total_amount', 'status', 'created_at', 'updated_at')
+        item_columns = ('id', 'order_id', 'product_id', 'product_name', 'quantity', 'price', 'subtotal')
+
+        created_orders = 0
+        while created_orders < orders:
+            order_rows, item_rows = [], []
+            for _ in range(min(batch_size, orders - created_orders)):
+                order_id = next_order_id
+                next_order_id += 1
+                user = users_by_id[rng.choices(user_ids, cum_weights=user_cum_weights)[0]]
+                created_at = order_timestamp(rng, now, days)
+                item_count = rng.choices(item_counts, item_count_weights)[0]
+                total = Decimal('0')
+                for product_id in set(rng.choices(product_ids, cum_weights=product_cum_weights, k=item_count)):
+                    name, price = prices[product_id]
+                    quantity = rng.choices([1, 2, 3, 5, 10], [60, 20, 10, 6, 4])[0]
+                    subtotal = price * quantity
+                    total += subtotal
+                    item_rows.append((next_item_id, order_id, product_id, name, quantity, price, subtotal))
+                    next_item_id += 1
+                order_rows.append((
+                    order_id, f'SYN-{seed}-{order_id:09d}', user[0], user[1], user[2], user[3], user[5],
+                    user[6], user[7], user[8], total, order_status(rng, now - created_at),
+                    created_at, created_at,
+                ))
+            await bulk_load(session, Order.__table__, order_columns, order_rows)
+            await bulk_load(session, OrderItem.__table__, item_columns, item_rows)
+            await session.commit()
+            created_orders += len(order_rows)
+            print(f'Created {created_orders}/{orders} orders')
+
+        # Reviews
+        first_review_id = await next_id(session, Review)
+        ratings, rating_weights = zip(*RATING_WEIGHTS)
+        review_columns = ('id', 'product_id', 'customer_name', 'rating', 'comment', 'is_approved', 'created_at')
+        review_rows = (
+            (
+                review_id,
+                rng.choices(product_ids, cum_weights=product_cum_weights)[0] if product_ids else None,
+                f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                rng.choices(ratings, rating_weights)[0],
+                '. '.join(rng.sample(REVIEW_PHRASES, rng.randint(1, 3))),
+                rng.random() < 0.8,
+                order_timestamp(rng, now, days),
+            )
+            for review_id in range(first_review_id, first_review_id + reviews)
+        )
+        for batch in batched(review_rows, batch_size):
+            await bulk_load(session, Review.__table__, review_columns, batch)
+            await session.commit()
+        print(f'Created {reviews} reviews')
+
+        await reset_sequences(session)
+
+    elapsed = time.perf_counter() - started
+    print(f'Synthetic data generated in {elapsed:.1f}s')
+    return {
+        'user_ids': (first_user_id, first_user_id + users - 1),
+        'product_ids': (first_product_id, first_product_id + products - 1),
+        'elapsed_s': round(elapsed, 1),
+    }
+
+
+async def create_schema() -> None:
+    import migrate
+    await migrate.upgrade()
+    await migrate.sync_seed_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic data for performance testing')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--reviews', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=730, help='order history window in days')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    args = parser.parse_args()
+
+    async def run():
+        await create_schema()
+        await generate(args.users, args.products, args.orders, args.reviews, args.days, args.seed, args.batch_size)
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Image upload storage.
+
+Uploads are streamed to disk in chunks with every blocking file operation
+pushed to the threadpool, so large files never stall the event loop. The size
+is capped while streaming, the real file type is sniffed from its magic bytes
+(the client-supplied extension is ignored), and the data is written to a
+temporary file that is atomically renamed into place once complete.
+
+Files are content-addressed: the stored name is the SHA-256 of the bytes, so
+re-uploading the same image reuses the existing file, and a URL never changes
+meaning, which lets static_files serve it as immutable.
+"""
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+ROOT_DIR = Path(__file__).parent
+UPLOAD_DIR = ROOT_DIR / "static" / "uploads"
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+# Hex digits of the SHA-256 kept in stored filenames (see static_files.CONTENT_HASHED_NAME)
+CONTENT_HASH_LENGTH = 40
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Return the file extension for a supported image format, based on magic bytes."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    if max_bytes >= 1024 * 1024:
+        limit = f"{max_bytes / (1024 * 1024):g} MB"
+    else:
+        limit = f"{max_bytes // 1024} KB"
+    return HTTPException(status_code=413, detail=f"File too large. Maximum size is {limit}.")
+
+
+def _remove_quietly(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+async def save_image_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """Stream an uploaded image into UPLOAD_DIR and return the stored filename.
+
+    Raises HTTPException 413 when the file exceeds max_bytes and 400 when its
+    content is not a supported image type.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    await run_in_threadpool(UPLOAD_DIR.mkdir, parents=True, exist_ok=True)
+    tmp_path = UPLOAD_DIR / f".tmp-{uuid.uuid4().hex}"
+    buffer = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        first_chunk = await file.read(CHUNK_SIZE)
+        file_ext = sniff_image_type(first_chunk)
+        if file_ext is None:
+            raise HTTPException(status_code=400, detail="Invalid file type. Only JPEG, PNG, GIF and WebP images are allowed.")
+
+        written = 0
+        digest = hashlib.sha256()
+        chunk = first_chunk
+        while chunk:
+            written += len(chunk)
+            if written > max_bytes:
+                raise _too_large(max_bytes)
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+            chunk = await file.read(CHUNK_SIZE)
+
+        await run_in_threadpool(buffer.close)
+        filename = f"{digest.hexdigest()[:CONTENT_HASH_LENGTH]}{file_ext}"
+        final_path = UPLOAD_DIR / filename
+        # Same bytes already stored: keep the existing file, the temp copy is dropped below
+        if not await run_in_threadpool(final_path.exists):
+            await run_in_threadpool(os.replace, tmp_path, final_path)
+        return filename
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
+    finally:
+        if not buffer.closed:
+            await run_in_threadpool(buffer.close)
+        await run_in_threadpool(_remove_quietly, tmp_path)
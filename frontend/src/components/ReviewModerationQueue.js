@@ -0,0 +1,131 @@
+import React, { useState, useEffect, useCallback } from 'react';
+import { Check, X, Trash2, Star } from 'lucide-react';
+import { toast } from 'sonner';
+
+const PAGE_SIZE = 50;
+
+// Pending product reviews, oldest first, with bulk approve / reject / delete
+const ReviewModerationQueue = ({ adminAxios, onModerated }) => {
+    const [queue, setQueue] = useState({ items: [], total: 0 });
+    const [offset, setOffset] = useState(0);
+    const [keyword, setKeyword] = useState('');
+    const [selectedIds, setSelectedIds] = useState([]);
+
+    const fetchQueue = useCallback(async () => {
+        try {
+            const params = { limit: PAGE_SIZE, offset };
+            if (keyword) params.keyword = keyword;
+            const res = await adminAxios.get('/admin/reviews/queue', { params });
+            setQueue(res.data);
+            setSelectedIds([]);
+        } catch (error) {
+            toast.error('Failed to fetch moderation queue');
+        }
+    }, [adminAxios, offset, keyword]);
+
+    useEffect(() => {
+        fetchQueue();
+    }, [fetchQueue]);
+
+    const toggleSelected = (id) => {
+        setSelectedIds(prev => prev.includes(id) ? prev.filter(x => x !== id) : [...prev, id]);
+    };
+
+    const allSelected = queue.items.length > 0 && selectedIds.length === queue.items.length;
+
+    const moderate = async (action, body) => {
+        if (action === 'delete' && !window.confirm('Permanently delete the selected reviews?')) return;
+        try {
+            const res = await adminAxios.post('/admin/reviews/moderate', { action, ...body });
+            toast.success(`${res.data.affected} review${res.data.affected === 1 ? '' : 's'} ${action === 'delete' ? 'deleted' : `${action}d`}`);
+            fetchQueue();
+            if (onModerated) onModerated();
+        } catch (error) {
+            toast.error(error.response?.data?.detail || 'Failed to moderate reviews');
+        }
+    };
+
+    const moderateMatching = (action) => {
+        if (!keyword) return;
+        if (!window.confirm(`${action.charAt(0).toUpperCase() + action.slice(1)} all ${queue.total} pending reviews matching "${keyword}"?`)) return;
+        moderate(action, { filter: { status: 'pending', keyword } });
+    };
+
+    return (
+        <div className="card mb-8" data-testid="moderation-queue">
+            <div className="flex flex-wrap items-center justify-between gap-4 mb-4">
+                <h3 className="text-2xl font-bold font-syne text-forest">Moderation Queue ({queue.total})</h3>
+                <input
+                    type="text"
+                    value={keyword}
+                    onChange={(e) => { setKeyword(e.target.value); setOffset(0); }}
+                    placeholder="Filter by keyword"
+                    className="px-4 py-2 rounded-full border-2 border-forest/20"
+                    data-testid="moderation-keyword"
+                />
+            </div>
+
+            <div className="flex flex-wrap items-center gap-2 mb-4">
+                <label className="flex items-center space-x-2 mr-2">
+                    <input
+                        type="checkbox"
+                        checked={allSelected}
+                        onChange={() => setSelectedIds(allSelected ? [] : queue.items.map(r => r.id))}
+                        className="w-4 h-4 accent-forest"
+                    />
+                    <span className="text-sm">{selectedIds.length} selected</span>
+                </label>
+                <button disabled={!selectedIds.length} onClick={() => moderate('approve', { review_ids: selectedIds })} className="px-4 py-2 rounded-full text-sm font-medium bg-green-100 text-green-800 disabled:opacity-50 flex items-center space-x-1">
+                    <Check className="w-4 h-4" /><span>Approve</span>
+                </button>
+                <button disabled={!selectedIds.length} onClick={() => moderate('reject', { review_ids: selectedIds })} className="px-4 py-2 rounded-full text-sm font-medium bg-yellow-100 text-yellow-800 disabled:opacity-50 flex items-center space-x-1">
+                    <X className="w-4 h-4" /><span>Reject</span>
+                </button>
+                <button disabled={!selectedIds.length} onClick={() => moderate('delete', { review_ids: selectedIds })} className="px-4 py-2 rounded-full text-sm font-medium bg-red-100 text-red-800 disabled:opacity-50 flex items-center space-x-1">
+                    <Trash2 className="w-4 h-4" /><span>Delete</span>
+                </button>
+                {keyword && queue.total > 0 && (
+                    <button onClick={() => moderateMatching('delete')} className="px-4 py-2 rounded-full text-sm font-medium text-red-700 hover:bg-red-50" data-testid="moderation-delete-matching">
+                        Delete all {queue.total} matching
+                    </button>
+                )}
+            </div>
+
+            {queue.items.length === 0 ? (
+                <p className="text-earth/60 py-6 text-center">No reviews awaiting moderation</p>
+            ) : (
+                <div className="space-y-2">
+                    {queue.items.map((review) => (
+                        <label key={review.id} className="flex items-start space-x-3 bg-cream p-3 rounded-lg cursor-pointer" data-testid={`queue-review-${review.id}`}>
+                            <input
+                                type="checkbox"
+                                checked={selectedIds.includes(review.id)}
+                                onChange={() => toggleSelected(review.id)}
+                                className="mt-1 w-4 h-4 accent-forest"
+                            />
+                            <div className="flex-grow">
+                                <div className="flex items-center space-x-2 text-sm">
+                                    <span className="font-bold">{review.customer_name}</span>
+                                    <span className="flex items-center text-earth/70"><Star className="w-3 h-3 mr-1" />{review.rating}</span>
+                                    {review.product_name && <span className="text-earth/60">on {review.product_name}</span>}
+                                    <span className="text-earth/50">{new Date(review.created_at).toLocaleDateString('en-IN')}</span>
+                                </div>
+                                {review.comment && <p className="text-sm mt-1">{review.comment}</p>}
+                            </div>
+                        </label>
+                    ))}
+                </div>
+            )}
+
+            {queue.total > PAGE_SIZE && (
+                <div className="flex justify-between items-center mt-4 text-sm">
+                    <button disabled={offset === 0} onClick={() => setOffset(Math.max(0, offset - PAGE_SIZE))} className="px-4 py-2 rounded-full bg-forest/10 disabled:opacity-50">Previous</button>
+                    <span>{offset + 1}–{Math.min(offset + PAGE_SIZE, queue.total)} of {queue.total}</span>
+                    <button disabled={offset + PAGE_SIZE >= queue.total} onClick={() => setOffset(offset + PAGE_SIZE)} className="px-4 py-2 rounded-full bg-forest/10 disabled:opacity-50">Next</button>
+                </div>
+            )}
+        </div>
+    );
+};
+
+export default ReviewModerationQueue;
@@ -0,0 +1,24 @@
+import { useEffect, useRef } from 'react';
+
+const API_URL = process.env.REACT_APP_BACKEND_URL;
+const EVENT_TYPES = ['order_created', 'order_status_changed', 'reset'];
+
+// Live admin order feed (GET /api/admin/orders/events). EventSource reconnects by itself
+// and resumes after the last event it saw; `reset` means too much was missed to replay,
+// so the page should reload its data instead.
+export const useOrderEvents = (enabled, handlers) => {
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  useEffect(() => {
+    if (!enabled || typeof EventSource === 'undefined') return undefined;
+    const source = new EventSource(`${API_URL}/api/admin/orders/events`, { withCredentials: true });
+    EVENT_TYPES.forEach((type) => {
+      source.addEventListener(type, (event) => {
+        const handler = handlersRef.current[type];
+        if (handler) handler(JSON.parse(event.data));
+      });
+    });
+    return () => source.close();
+  }, [enabled]);
+};
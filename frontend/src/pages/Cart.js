@@ -1,14 +1,27 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { Trash2, Plus, Minus, ShoppingBag } from 'lucide-react';
 import { useCart } from '../context/CartContext';
-import { useAuth } from '../context/AuthContext';
+import { useAuth, userAxios } from '../context/AuthContext';
 import { toast } from 'sonner';
 
 const Cart = () => {
   const { cart, removeFromCart, updateQuantity, getTotalPrice, getTotalItems } = useCart();
   const { isAuthenticated } = useAuth();
   const navigate = useNavigate();
+  // Current prices and stock for the whole cart, priced server-side in one request
+  const [quote, setQuote] = useState(null);
+
+  useEffect(() => {
+    if (cart.length === 0) return;
+    const items = cart.map(item => ({ product_id: item.id, quantity: item.quantity }));
+    userAxios.post('/cart/quote', { items })
+      .then(({ data }) => setQuote(data))
+      .catch(error => console.error('Quote error:', error));
+  }, [cart]);
+
+  const quoteLine = (productId) => quote?.items.find(line => line.product_id === productId);
+  const totalPrice = quote ? quote.total : getTotalPrice();
 
   const handleCheckout = () => {
     if (!isAuthenticated) {
@@ -45,7 +58,10 @@ const Cart = () => {
 
         <div className="grid lg:grid-cols-3 gap-8">
           <div className="lg:col-span-2 space-y-4">
-            {cart.map((item) => (
+            {cart.map((item) => {
+              const line = quoteLine(item.id);
+              const unitPrice = line ? line.unit_price : item.price;
+              return (
               <div key={item.id} className="card flex items-center space-x-4" data-testid={`cart-item-${item.id}`}>
                 <img
                   src={item.image_url || 'https://via.placeholder.com/150x150?text=Product'}
@@ -54,10 +70,15 @@ const Cart = () => {
                 />
                 <div className="flex-grow">
                   <h3 className="font-bold text-lg font-syne" data-testid={`item-name-${item.id}`}>{item.name}</h3>
-                  <p className="text-earth/60 text-sm">₹{item.price} per unit</p>
+                  <p className="text-earth/60 text-sm">₹{unitPrice} per unit</p>
                   <p className="text-forest font-bold" data-testid={`item-subtotal-${item.id}`}>
-                    Subtotal: ₹{(item.price * item.quantity).toFixed(2)}
+                    Subtotal: ₹{(unitPrice * item.quantity).toFixed(2)}
                   </p>
+                  {line && !line.in_stock && (
+                    <p className="text-red-600 text-sm" data-testid={`item-stock-warning-${item.id}`}>
+                      {line.available_stock > 0 ? `Only ${line.available_stock} left in stock` : 'Out of stock'}
+                    </p>
+                  )}
                 </div>
                 <div className="flex items-center space-x-3">
                   <button
@@ -84,7 +105,8 @@ const Cart = () => {
                   <Trash2 className="w-5 h-5 text-red-600" />
                 </button>
               </div>
-            ))}
+              );
+            })}
           </div>
 
           <div className="lg:col-span-1">
@@ -93,7 +115,7 @@ const Cart = () => {
               <div className="space-y-3 mb-6">
                 <div className="flex justify-between text-earth/70">
                   <span>Items ({getTotalItems()})</span>
-                  <span data-testid="items-total">₹{getTotalPrice().toFixed(2)}</span>
+                  <span data-testid="items-total">₹{totalPrice.toFixed(2)}</span>
                 </div>
                 <div className="flex justify-between text-earth/70">
                   <span>Shipping</span>
@@ -101,7 +123,7 @@ const Cart = () => {
                 </div>
                 <div className="border-t border-earth/10 pt-3 mt-3 flex justify-between text-2xl font-bold">
                   <span>Total</span>
-                  <span className="text-forest" data-testid="total-price">₹{getTotalPrice().toFixed(2)}</span>
+                  <span className="text-forest" data-testid="total-price">₹{totalPrice.toFixed(2)}</span>
                 </div>
               </div>
               <button
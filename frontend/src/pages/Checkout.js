@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import { useCart } from '../context/CartContext';
@@ -14,6 +14,9 @@ const Checkout = () => {
   const { cart, getTotalPrice, clearCart } = useCart();
   const navigate = useNavigate();
   const [loading, setLoading] = useState(false);
+  // Idempotency key for the order being placed; reused when a submit is retried after
+  // a network failure so the backend never creates the same order twice
+  const pendingOrder = useRef(null);
   const [formData, setFormData] = useState({
     customer_name: '',
     phone: '',
@@ -48,6 +51,20 @@ const Checkout = () => {
     }
   }, [isAuthenticated, cart, navigate, user]);
 
+  // Hold the cart's stock while the customer fills in the form; the hold expires on its own
+  useEffect(() => {
+    if (!isAuthenticated || cart.length === 0) return;
+    const items = cart.map(item => ({ product_id: item.id, quantity: item.quantity }));
+    userAxios.put('/cart/reservations', { items })
+      .then(({ data }) => {
+        data.shortfalls.forEach(shortfall => {
+          const item = cart.find(cartItem => cartItem.id === shortfall.product_id);
+          toast.warning(`Only limited stock left for ${item?.name || 'an item'} in your cart`);
+        });
+      })
+      .catch(error => console.error('Reservation error:', error));
+  }, [isAuthenticated, cart, userAxios]);
+
   const handleUseProfileAddress = () => {
     if (!user) return;
     setFormData(prev => ({
@@ -79,12 +96,23 @@ const Checkout = () => {
         ...formData
       };
 
-      await userAxios.post('/orders', orderData);
+      const payload = JSON.stringify(orderData);
+      if (!pendingOrder.current || pendingOrder.current.payload !== payload) {
+        pendingOrder.current = { key: crypto.randomUUID(), payload };
+      }
+
+      await userAxios.post('/orders', orderData, {
+        headers: { 'Idempotency-Key': pendingOrder.current.key }
+      });
+      pendingOrder.current = null;
       clearCart();
       toast.success('Order placed successfully!');
       navigate('/dashboard');
     } catch (error) {
       console.error('Order error:', error);
+      // The server rejected the order, so a corrected resubmit is a new request;
+      // keep the key on network errors and 409 (the original may still be in flight)
+      if (error.response && error.response.status !== 409) pendingOrder.current = null;
       toast.error(error.response?.data?.detail || 'Failed to place order');
     } finally {
       setLoading(false);
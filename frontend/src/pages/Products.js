@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { Link, useNavigate } from 'react-router-dom';
+import { Link, useNavigate, useSearchParams } from 'react-router-dom';
 import { Search } from 'lucide-react';
 import axios from 'axios';
 import { motion } from 'framer-motion';
@@ -11,8 +11,14 @@ const API_URL = process.env.REACT_APP_BACKEND_URL;
 const Products = () => {
   const [products, setProducts] = useState([]);
   const [categories, setCategories] = useState([]);
-  const [selectedCategory, setSelectedCategory] = useState(null);
+  const [searchParams] = useSearchParams();
+  // Category listings are linked from the sitemap as /products?category=<id>
+  const [selectedCategory, setSelectedCategory] = useState(() => {
+    const categoryId = parseInt(searchParams.get('category'), 10);
+    return Number.isNaN(categoryId) ? null : categoryId;
+  });
   const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
   const [loading, setLoading] = useState(true);
   const { addToCart } = useCart();
   const navigate = useNavigate();
@@ -23,6 +29,28 @@ const Products = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [selectedCategory]);
 
+  // Search runs server-side (debounced) instead of filtering the full catalog here
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return undefined;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const params = { q: query, page_size: 50 };
+        if (selectedCategory) {
+          params.category_id = selectedCategory;
+        }
+        const res = await axios.get(`${API_URL}/api/products/search`, { params });
+        setSearchResults(res.data.items);
+      } catch (error) {
+        console.error('Failed to search products:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery, selectedCategory]);
+
   const fetchCategories = async () => {
     try {
       const res = await axios.get(`${API_URL}/api/categories`);
@@ -48,10 +76,7 @@ const Products = () => {
     }
   };
 
-  const filteredProducts = products.filter(product =>
-    product.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    product.description?.toLowerCase().includes(searchQuery.toLowerCase())
-  );
+  const filteredProducts = searchResults ?? products;
 
   const handleAddToCart = (product, e) => {
     e.preventDefault();
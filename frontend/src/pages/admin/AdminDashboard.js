@@ -4,6 +4,7 @@ import { Package, ShoppingCart, Users, AlertTriangle, LogOut, MessageSquare, Tre
 import { AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
 import { toast } from 'sonner';
 import { useAdmin } from '../../context/AdminContext';
+import { useOrderEvents } from '../../hooks/useOrderEvents';
 
 const AdminDashboard = () => {
   const [stats, setStats] = useState(null);
@@ -25,6 +26,23 @@ const AdminDashboard = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [isAuthenticated, authLoading, navigate, timeRange]);
 
+  // Order counters follow the live order feed rather than refetching /admin/stats
+  useOrderEvents(isAuthenticated, {
+    order_created: (order) => {
+      setStats(prev => prev && {
+        ...prev,
+        total_orders: prev.total_orders + 1,
+        pending_orders: prev.pending_orders + (order.status === 'pending' ? 1 : 0)
+      });
+      toast.info(`New order ${order.order_number} from ${order.customer_name}`);
+    },
+    order_status_changed: ({ status, previous_status }) => {
+      const delta = (status === 'pending' ? 1 : 0) - (previous_status === 'pending' ? 1 : 0);
+      if (delta !== 0) setStats(prev => prev && { ...prev, pending_orders: prev.pending_orders + delta });
+    },
+    reset: () => fetchStats()
+  });
+
   const fetchStats = async () => {
     try {
       const res = await adminAxios.get('/admin/stats');
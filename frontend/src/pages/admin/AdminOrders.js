@@ -3,12 +3,26 @@ import { useNavigate, Link } from 'react-router-dom';
 import { ArrowLeft, Eye } from 'lucide-react';
 import { toast } from 'sonner';
 import { useAdmin } from '../../context/AdminContext';
+import { useOrderEvents } from '../../hooks/useOrderEvents';
+
+// Mirrors backend/order_status.py; delivered and cancelled are final
+const ORDER_TRANSITIONS = {
+  pending: ['processing', 'cancelled'],
+  processing: ['shipped', 'cancelled'],
+  shipped: ['delivered'],
+  delivered: [],
+  cancelled: []
+};
+const BULK_STATUSES = ['processing', 'shipped', 'delivered', 'cancelled'];
+
+const capitalize = (status) => status.charAt(0).toUpperCase() + status.slice(1);
 
 const AdminOrders = () => {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
   const [selectedOrder, setSelectedOrder] = useState(null);
   const [statusFilter, setStatusFilter] = useState('');
+  const [selectedIds, setSelectedIds] = useState([]);
   const navigate = useNavigate();
   const { isAuthenticated, loading: authLoading, adminAxios } = useAdmin();
 
@@ -23,12 +37,27 @@ const AdminOrders = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [isAuthenticated, authLoading, navigate, statusFilter]);
 
+  // Live updates: new orders and status changes arrive as events instead of list refetches
+  useOrderEvents(isAuthenticated, {
+    order_created: (order) => {
+      if (statusFilter && statusFilter !== order.status) return;
+      setOrders(prev => prev.some(o => o.id === order.id) ? prev : [order, ...prev]);
+    },
+    order_status_changed: ({ id, status }) => {
+      setOrders(prev => statusFilter && statusFilter !== status
+        ? prev.filter(o => o.id !== id)
+        : prev.map(o => o.id === id ? { ...o, status } : o));
+    },
+    reset: () => fetchOrders()
+  });
+
   const fetchOrders = async () => {
     try {
       let url = '/admin/orders';
       if (statusFilter) url += `?status_filter=${statusFilter}`;
       const res = await adminAxios.get(url);
       setOrders(res.data);
+      setSelectedIds([]);
     } catch (error) {
       toast.error('Failed to fetch orders');
     } finally {
@@ -43,7 +72,25 @@ const AdminOrders = () => {
       fetchOrders();
       setSelectedOrder(null);
     } catch (error) {
-      toast.error('Failed to update status');
+      toast.error(error.response?.data?.detail || 'Failed to update status');
+    }
+  };
+
+  const toggleSelected = (orderId) => {
+    setSelectedIds(prev => prev.includes(orderId) ? prev.filter(id => id !== orderId) : [...prev, orderId]);
+  };
+
+  const handleBulkStatusUpdate = async (newStatus) => {
+    try {
+      const res = await adminAxios.post('/admin/orders/status', { status: newStatus, order_ids: selectedIds });
+      const { updated, rejected } = res.data;
+      toast.success(`${updated} order${updated === 1 ? '' : 's'} marked ${newStatus}`);
+      if (rejected.length > 0) {
+        toast.warning(`${rejected.length} order${rejected.length === 1 ? ' was' : 's were'} skipped: ${rejected[0].error}`);
+      }
+      fetchOrders();
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Failed to update orders');
     }
   };
 
@@ -92,6 +139,25 @@ const AdminOrders = () => {
           </div>
         </div>
 
+        {selectedIds.length > 0 && (
+          <div className="card mb-4 flex flex-wrap items-center gap-2" data-testid="bulk-status-bar">
+            <span className="font-medium mr-2">{selectedIds.length} selected:</span>
+            {BULK_STATUSES.map((status) => (
+              <button
+                key={status}
+                onClick={() => handleBulkStatusUpdate(status)}
+                className="px-4 py-2 rounded-full text-sm font-medium bg-forest/10 text-forest hover:bg-forest hover:text-white transition-all"
+                data-testid={`bulk-status-${status}`}
+              >
+                Mark {capitalize(status)}
+              </button>
+            ))}
+            <button onClick={() => setSelectedIds([])} className="px-4 py-2 text-sm text-earth/60 hover:text-earth">
+              Clear
+            </button>
+          </div>
+        )}
+
         {loading ? (
           <div className="text-center py-20">
             <div className="inline-block animate-spin rounded-full h-12 w-12 border-4 border-forest border-t-transparent"></div>
@@ -105,7 +171,16 @@ const AdminOrders = () => {
             {orders.map((order) => (
               <div key={order.id} className="card" data-testid={`order-${order.id}`}>
                 <div className="flex items-start justify-between mb-4">
-                  <div>
+                  <div className="flex items-start space-x-3">
+                    <input
+                      type="checkbox"
+                      checked={selectedIds.includes(order.id)}
+                      onChange={() => toggleSelected(order.id)}
+                      disabled={ORDER_TRANSITIONS[order.status]?.length === 0}
+                      className="mt-2 w-4 h-4 accent-forest"
+                      data-testid={`select-order-${order.id}`}
+                    />
+                    <div>
                     <h3 className="font-bold text-xl font-syne" data-testid={`order-number-${order.id}`}>
                       Order #{order.order_number}
                     </h3>
@@ -118,6 +193,7 @@ const AdminOrders = () => {
                         minute: '2-digit'
                       })}
                     </p>
+                    </div>
                   </div>
                   <div className="flex items-center space-x-4">
                     <span className={`px-4 py-1 rounded-full text-sm font-medium ${getStatusColor(order.status)}`} data-testid={`order-status-${order.id}`}>
@@ -171,20 +247,19 @@ const AdminOrders = () => {
                     <div>
                       <p className="text-sm font-medium text-earth mb-2">Update Status:</p>
                       <div className="flex flex-wrap gap-2">
-                        {['pending', 'processing', 'shipped', 'delivered', 'cancelled'].map((status) => (
+                        {(ORDER_TRANSITIONS[order.status] || []).map((status) => (
                           <button
                             key={status}
                             onClick={() => handleStatusUpdate(order.id, status)}
-                            disabled={order.status === status}
-                            className={`px-4 py-2 rounded-full text-sm font-medium transition-all ${order.status === status
-                              ? 'bg-earth/20 text-earth/50 cursor-not-allowed'
-                              : 'bg-forest/10 text-forest hover:bg-forest hover:text-white'
-                              }`}
+                            className="px-4 py-2 rounded-full text-sm font-medium transition-all bg-forest/10 text-forest hover:bg-forest hover:text-white"
                             data-testid={`update-status-${status}-${order.id}`}
                           >
-                            {status.charAt(0).toUpperCase() + status.slice(1)}
+                            {capitalize(status)}
                           </button>
                         ))}
+                        {ORDER_TRANSITIONS[order.status]?.length === 0 && (
+                          <span className="text-sm text-earth/60">This order is {order.status}; its status is final.</span>
+                        )}
                       </div>
                     </div>
                   </div>
@@ -3,6 +3,7 @@ import { useNavigate, Link } from 'react-router-dom';
 import { Plus, Edit, Trash2, ArrowLeft, Star, MessageSquare } from 'lucide-react';
 import { toast } from 'sonner';
 import { useAdmin } from '../../context/AdminContext';
+import ReviewModerationQueue from '../../components/ReviewModerationQueue';
 
 const AdminReviews = () => {
     const [reviews, setReviews] = useState([]);
@@ -132,6 +133,8 @@ const AdminReviews = () => {
                     </button>
                 </div>
 
+                <ReviewModerationQueue adminAxios={adminAxios} onModerated={fetchReviews} />
+
                 {showForm && (
                     <div className="card mb-8">
                         <h3 className="text-2xl font-bold mb-6 font-syne text-forest">
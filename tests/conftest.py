@@ -0,0 +1,105 @@
+"""Shared setup for the tests that exercise the API against a scratch database.
+
+database.py builds its engine at import time, so the environment is set here,
+before any test module imports the backend: a throwaway SQLite file by
+default, or PLAN_TEST_DATABASE_URL when that is set (test_query_plans.py
+needs the engine on that database, and every module shares one engine).
+Email, rate limiting and load shedding are switched off.
+
+Requests go through httpx's ASGI transport, which does not run the startup
+hook, so no background task (sweeper, listener, publishers) is running;
+tests call those functions directly when they need them.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+SQLITE_PATH = Path(tempfile.gettempdir()) / f'samruddhi_tests_{os.getpid()}.db'
+os.environ['DATABASE_URL'] = os.getenv('PLAN_TEST_DATABASE_URL') or f'sqlite+aiosqlite:///{SQLITE_PATH}'
+os.environ['ENVIRONMENT'] = 'development'
+os.environ['GMAIL_APP_PASSWORD'] = ''
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+os.environ['LOAD_SHED_ENABLED'] = 'false'
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+
+@pytest.fixture(scope='module')
+def loop():
+    from database import engine
+
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+@pytest.fixture(scope='module')
+def db(loop):
+    """Fresh tables built by the migrations, with the reference data orders are validated against."""
+    from sqlalchemy import text
+
+    import migrate
+    from database import AsyncSessionLocal, Base, IndianCity, IndianState, engine
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.execute(text('DROP TABLE IF EXISTS schema_migrations'))
+        await migrate.upgrade()
+        async with AsyncSessionLocal() as session:
+            session.add(IndianState(code='DL', name='Delhi', type='ut'))
+            session.add(IndianCity(name='New Delhi', state_code='DL'))
+            await session.commit()
+
+    loop.run_until_complete(create())
+    yield AsyncSessionLocal
+    SQLITE_PATH.unlink(missing_ok=True)
+
+
+class Api:
+    """Synchronous wrapper around an ASGI client for the FastAPI app."""
+
+    def __init__(self, loop):
+        import httpx
+        from server import app
+
+        self.loop = loop
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test')
+
+    def request(self, method: str, path: str, token: str = None, **kwargs):
+        if token:
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'Cookie': f'access_token={token}'}
+        return self.loop.run_until_complete(self.client.request(method, path, **kwargs))
+
+    def get(self, path: str, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+
+@pytest.fixture(scope='module')
+def api(loop, db):
+    api = Api(loop)
+    yield api
+    loop.run_until_complete(api.client.aclose())
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    """In-process caches outlive a test; start each one cold."""
+    yield
+    if 'single_flight' in sys.modules:
+        import catalog_cache
+        import single_flight
+
+        single_flight.product_lists.evict()
+        single_flight.categories.evict()
+        catalog_cache.catalog_cache.invalidate()
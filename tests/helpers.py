@@ -0,0 +1,34 @@
+"""Test data and auth helpers shared by the API tests (conftest.py sets up the environment first)."""
+from auth import create_access_token
+from database import Product, User
+
+ORDER_ADDRESS = {
+    'customer_name': 'Test Customer',
+    'phone': '9876543210',
+    'address': '1 Test Street',
+    'city': 'New Delhi',
+    'state': 'Delhi',
+    'pincode': '110001',
+}
+
+
+def user_token(user_id: int) -> str:
+    return create_access_token({'user_id': user_id, 'email': f'user{user_id}@example.com'})
+
+
+def admin_token() -> str:
+    return create_access_token({'admin_id': 1, 'username': 'admin'}, role='admin')
+
+
+async def create_user(session, email: str) -> User:
+    user = User(name='Test Customer', email=email, password_hash='x')
+    session.add(user)
+    await session.flush()
+    return user
+
+
+async def create_product(session, name: str, stock: int = 10, price: float = 100.0) -> Product:
+    product = Product(name=name, price=price, stock=stock)
+    session.add(product)
+    await session.flush()
+    return product
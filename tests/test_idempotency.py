@@ -0,0 +1,102 @@
+"""Idempotency-Key on order creation: replays, mismatched bodies and retries after failure."""
+import uuid
+
+import pytest
+from sqlalchemy import func, select, update
+
+from database import Order, Product
+
+from .helpers import ORDER_ADDRESS, create_product, create_user, user_token
+
+
+@pytest.fixture
+def shop(api, db):
+    async def create():
+        async with db() as session:
+            user = await create_user(session, f'idem-{uuid.uuid4().hex[:8]}@example.com')
+            product = await create_product(session, 'Idempotent product', stock=5)
+            await session.commit()
+            return user.id, product.id
+
+    user_id, product_id = api.run(create())
+    return {'user_id': user_id, 'product_id': product_id}
+
+
+def order(api, shop, key, quantity=1, origin=None):
+    headers = {'Idempotency-Key': key}
+    if origin:
+        headers['Origin'] = origin
+    return api.post(
+        '/api/orders', token=user_token(shop['user_id']), headers=headers,
+        json={'items': [{'product_id': shop['product_id'], 'quantity': quantity}], **ORDER_ADDRESS},
+    )
+
+
+def stock_and_orders(api, db, shop):
+    async def read():
+        async with db() as session:
+            stock = await session.scalar(select(Product.stock).where(Product.id == shop['product_id']))
+            orders = await session.scalar(select(func.count(Order.id)).where(Order.user_id == shop['user_id']))
+            return stock, orders
+
+    return api.run(read())
+
+
+def test_retry_replays_the_first_response(api, db, shop):
+    first = order(api, shop, 'checkout-1')
+    assert first.status_code == 200, first.text
+    assert 'idempotent-replayed' not in first.headers
+
+    retry = order(api, shop, 'checkout-1')
+    assert retry.status_code == 200
+    assert retry.headers['idempotent-replayed'] == 'true'
+    assert retry.json()['order_number'] == first.json()['order_number']
+    assert stock_and_orders(api, db, shop) == (4, 1)
+
+
+def test_replayed_header_is_exposed_to_browsers(api, shop):
+    import server
+
+    origin = next((o for o in server.allowed_origins if o != '*'), 'http://localhost:3000')
+    order(api, shop, 'checkout-cors', origin=origin)
+    retry = order(api, shop, 'checkout-cors', origin=origin)
+    assert retry.headers['idempotent-replayed'] == 'true'
+    exposed = {h.strip().lower() for h in retry.headers['access-control-expose-headers'].split(',')}
+    assert 'idempotent-replayed' in exposed
+
+
+def test_key_reused_for_another_body_is_rejected(api, db, shop):
+    assert order(api, shop, 'checkout-2').status_code == 200
+    response = order(api, shop, 'checkout-2', quantity=2)
+    assert response.status_code == 422
+    assert stock_and_orders(api, db, shop) == (4, 1)
+
+
+def test_failed_attempt_does_not_burn_the_key(api, db, shop):
+    assert order(api, shop, 'checkout-3', quantity=6).status_code == 400
+
+    async def restock():
+        async with db() as session:
+            await session.execute(update(Product).where(Product.id == shop['product_id']).values(stock=10))
+            await session.commit()
+
+    api.run(restock())
+    response = order(api, shop, 'checkout-3', quantity=6)
+    assert response.status_code == 200, response.text
+    assert 'idempotent-replayed' not in response.headers
+    assert stock_and_orders(api, db, shop) == (4, 1)
+
+
+def test_keys_are_scoped_per_user(api, db, shop):
+    assert order(api, shop, 'shared-key').status_code == 200
+
+    async def other_user():
+        async with db() as session:
+            user = await create_user(session, f'idem-other-{uuid.uuid4().hex[:8]}@example.com')
+            await session.commit()
+            return user.id
+
+    other = {**shop, 'user_id': api.run(other_user())}
+    response = order(api, other, 'shared-key')
+    assert response.status_code == 200
+    assert 'idempotent-replayed' not in response.headers
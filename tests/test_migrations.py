@@ -0,0 +1,56 @@
+"""Versioned migrations: a migrated database matches the models, reruns are harmless, outages are not hidden."""
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import migrate
+from database import Base, engine
+
+
+def schema(loop):
+    def read(sync_conn):
+        inspector = inspect(sync_conn)
+        return {
+            table: (
+                {column['name']: column['nullable'] for column in inspector.get_columns(table)},
+                {index['name'] for index in inspector.get_indexes(table)},
+            )
+            for table in inspector.get_table_names()
+        }
+
+    async def run():
+        async with engine.connect() as conn:
+            return await conn.run_sync(read)
+
+    return loop.run_until_complete(run())
+
+
+def test_migrated_schema_matches_the_models(loop, db):
+    tables = schema(loop)
+    for table in Base.metadata.sorted_tables:
+        columns, indexes = tables[table.name]
+        assert columns == {column.name: column.nullable for column in table.columns}, table.name
+        assert {index.name for index in table.indexes} <= indexes, table.name
+    assert loop.run_until_complete(migrate.current_version()) == migrate.latest_version()
+
+
+def test_rerunning_every_migration_is_harmless(loop, db):
+    # A database from the old create_all startup has tables but no version table
+    before = schema(loop)
+
+    async def forget_versions():
+        async with engine.begin() as conn:
+            await conn.execute(text('DROP TABLE schema_migrations'))
+
+    loop.run_until_complete(forget_versions())
+    assert loop.run_until_complete(migrate.current_version()) is None
+    assert loop.run_until_complete(migrate.upgrade()) == [m.version for m in migrate.discover()]
+    assert schema(loop) == before
+
+
+def test_unreachable_database_is_not_reported_as_unmigrated(loop, db, tmp_path, monkeypatch):
+    unreachable = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/missing/dir/app.db')
+    monkeypatch.setattr(migrate, 'engine', unreachable)
+    with pytest.raises(Exception, match='unable to open database file'):
+        loop.run_until_complete(migrate.current_version())
+    loop.run_until_complete(unreachable.dispose())
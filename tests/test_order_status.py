@@ -0,0 +1,157 @@
+"""Order status state machine: the transition table and bulk transitions by id and by status."""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+import order_status
+import query_stats
+from database import Order, OrderItem, Product
+
+from .helpers import admin_token, create_product, create_user
+
+
+def test_transition_table():
+    assert order_status.sources_for('processing') == ['pending']
+    assert order_status.sources_for('shipped') == ['processing']
+    assert order_status.sources_for('delivered') == ['shipped']
+    assert sorted(order_status.sources_for('cancelled')) == ['pending', 'processing']
+    assert order_status.sources_for('pending') == []
+    assert set(order_status.TRANSITIONS) == set(order_status.ORDER_STATUSES)
+    for final in ('delivered', 'cancelled'):
+        assert not order_status.TRANSITIONS[final]
+
+
+@pytest.fixture(scope='module')
+def customer(api, db):
+    async def create():
+        async with db() as session:
+            user = await create_user(session, 'status@example.com')
+            product = await create_product(session, 'Status product', stock=50)
+            await session.commit()
+            return user.id, product.id
+
+    user_id, product_id = api.run(create())
+    return {'user_id': user_id, 'product_id': product_id}
+
+
+def create_orders(api, db, customer, statuses, created_at=None, quantity=1):
+    async def create():
+        async with db() as session:
+            orders = []
+            for n, status in enumerate(statuses):
+                order = Order(
+                    order_number=f'ORD-{uuid.uuid4().hex[:8].upper()}', user_id=customer['user_id'],
+                    customer_name='Test Customer', email='status@example.com', phone='9876543210',
+                    address='1 Test Street', total_amount=100, status=status,
+                )
+                if created_at is not None:
+                    order.created_at = created_at + timedelta(minutes=n)
+                order.order_items = [OrderItem(
+                    product_id=customer['product_id'], product_name='Status product',
+                    quantity=quantity, price=100, subtotal=100 * quantity,
+                )]
+                session.add(order)
+                orders.append(order)
+            await session.commit()
+            return [order.id for order in orders]
+
+    return api.run(create())
+
+
+def statuses(api, db, order_ids):
+    async def read():
+        async with db() as session:
+            result = await session.execute(select(Order.id, Order.status).where(Order.id.in_(order_ids)))
+            return dict(result.all())
+
+    return api.run(read())
+
+
+def bulk(api, **change):
+    return api.post('/api/admin/orders/status', token=admin_token(), json=change)
+
+
+def test_listed_orders_ignore_the_limit(api, db, customer):
+    ids = create_orders(api, db, customer, ['pending'] * 3)
+    response = bulk(api, status='processing', order_ids=ids, limit=1)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body['updated'] == 3 and body['rejected'] == []
+    assert set(statuses(api, db, ids).values()) == {'processing'}
+
+
+def test_listed_orders_in_the_wrong_state_are_rejected(api, db, customer):
+    pending, delivered = create_orders(api, db, customer, ['pending', 'delivered'])
+    body = bulk(api, status='processing', order_ids=[pending, delivered, 999999]).json()
+    assert [order['id'] for order in body['orders']] == [pending]
+    assert body['orders'][0]['previous_status'] == 'pending'
+    assert body['rejected'] == [
+        {'id': delivered, 'status': 'delivered', 'error': 'Cannot change status from delivered to processing'},
+        {'id': 999999, 'status': None, 'error': 'Order not found'},
+    ]
+    assert statuses(api, db, [delivered]) == {delivered: 'delivered'}
+
+
+def test_selection_by_status_takes_the_oldest_up_to_limit(api, db, customer):
+    created = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    ids = create_orders(api, db, customer, ['processing'] * 3, created_at=created)
+    body = bulk(
+        api, status='shipped', from_status='processing', limit=2,
+        created_before=(created + timedelta(days=1)).isoformat(),
+    ).json()
+    assert sorted(order['id'] for order in body['orders']) == ids[:2]
+    assert statuses(api, db, ids) == {ids[0]: 'shipped', ids[1]: 'shipped', ids[2]: 'processing'}
+
+
+def test_from_status_that_cannot_reach_the_target_is_refused(api, db, customer):
+    ids = create_orders(api, db, customer, ['pending'])
+    response = bulk(api, status='delivered', from_status='pending')
+    assert response.status_code == 409
+    assert response.json()['detail'] == 'Cannot change status from pending to delivered; allowed from: shipped'
+    assert statuses(api, db, ids) == {ids[0]: 'pending'}
+    with pytest.raises(ValueError):
+        api.run(order_status.transition(None, 'delivered', from_status='pending'))
+
+
+def test_exactly_one_selection_mode(api):
+    assert bulk(api, status='processing').status_code == 400
+    assert bulk(api, status='processing', order_ids=[1], from_status='pending').status_code == 400
+
+
+def test_cancelling_returns_items_to_stock(api, db, customer):
+    async def stock():
+        async with db() as session:
+            return await session.scalar(select(Product.stock).where(Product.id == customer['product_id']))
+
+    before = api.run(stock())
+    ids = create_orders(api, db, customer, ['pending', 'processing'], quantity=2)
+    body = bulk(api, status='cancelled', order_ids=ids).json()
+    assert body['updated'] == 2
+    assert api.run(stock()) == before + 4
+
+
+def test_restock_locks_products_in_id_order_before_updating(api, db, customer, monkeypatch):
+    statements = []
+    monkeypatch.setattr(query_stats, '_observers', [lambda statement, *_: statements.append(statement)])
+    ids = create_orders(api, db, customer, ['pending'])
+    assert bulk(api, status='cancelled', order_ids=ids).json()['updated'] == 1
+
+    def first(prefix):
+        return next(n for n, statement in enumerate(statements) if statement.lstrip().startswith(prefix))
+
+    lock = first('SELECT products.id')
+    assert 'ORDER BY products.id' in statements[lock]
+    assert lock < first('UPDATE products')
+
+
+def test_single_order_endpoint(api, db, customer):
+    shipped, = create_orders(api, db, customer, ['shipped'])
+    path = f'/api/admin/orders/{shipped}/status'
+    assert api.request('PATCH', path, token=admin_token(), params={'status': 'cancelled'}).status_code == 409
+    response = api.request('PATCH', path, token=admin_token(), params={'status': 'delivered'})
+    assert response.status_code == 200
+    assert statuses(api, db, [shipped]) == {shipped: 'delivered'}
+    missing = api.request('PATCH', '/api/admin/orders/999999/status', token=admin_token(), params={'status': 'shipped'})
+    assert missing.status_code == 404
@@ -0,0 +1,164 @@
+"""Bulk CSV product import: row reports, whole-file checks before writing, cache invalidation."""
+import argparse
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+
+import product_import
+from database import Product
+
+from .helpers import admin_token
+
+
+def upload(api, content, dry_run=False):
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    return api.post(
+        '/api/admin/products/import', token=admin_token(),
+        params={'dry_run': str(dry_run).lower()},
+        files={'file': ('products.csv', data, 'text/csv')},
+    )
+
+
+def names_in_db(api, db, prefix):
+    async def read():
+        async with db() as session:
+            result = await session.execute(select(Product.name).where(Product.name.like(f'{prefix}%')))
+            return sorted(result.scalars())
+
+    return api.run(read())
+
+
+def listed_names(api):
+    response = api.get('/api/products', params={'limit': 200})
+    assert response.status_code == 200
+    return {product['name'] for product in response.json()}
+
+
+@pytest.fixture
+def prefix():
+    return f'Import {uuid.uuid4().hex[:6]}'
+
+
+def test_creates_updates_and_reports_bad_rows(api, db, prefix):
+    response = upload(api, f'name,price,stock\n{prefix} A,10,5\n{prefix} B,-1,5\n{prefix} C,12,\n')
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report['rows'], report['created'], report['updated']) == (3, 2, 0)
+    assert [error['line'] for error in report['errors']] == [3]
+    assert names_in_db(api, db, prefix) == [f'{prefix} A', f'{prefix} C']
+
+    async def first_id():
+        async with db() as session:
+            return await session.scalar(select(Product.id).where(Product.name == f'{prefix} A'))
+
+    product_id = api.run(first_id())
+    response = upload(api, f'id,stock\n{product_id},42\n999999,1\n')
+    report = response.json()
+    assert (report['created'], report['updated']) == (0, 1)
+    assert report['errors'] == [{'line': 3, 'id': 999999, 'error': 'Product 999999 not found'}]
+
+
+def test_only_content_changes_move_updated_at(api, db, prefix):
+    upload(api, f'name,price,stock\n{prefix} A,10,5\n{prefix} B,10,5\n')
+    old = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    async def backdate():
+        async with db() as session:
+            await session.execute(update(Product).where(Product.name.like(f'{prefix}%')).values(updated_at=old))
+            await session.commit()
+            result = await session.execute(select(Product.name, Product.id).where(Product.name.like(f'{prefix}%')))
+            return dict(result.all())
+
+    async def updated_at():
+        async with db() as session:
+            result = await session.execute(select(Product.id, Product.updated_at).where(Product.id.in_(ids.values())))
+            return {product_id: value.replace(tzinfo=timezone.utc) for product_id, value in result.all()}
+
+    ids = api.run(backdate())
+    a, b = ids[f'{prefix} A'], ids[f'{prefix} B']
+    response = upload(api, f'id,name,price,stock\n{b},{prefix} B,12,7\n{a},{prefix} A renamed,10,5\n')
+    assert response.json()['updated'] == 2
+    stamps = api.run(updated_at())
+    assert stamps[b] == old
+    assert stamps[a] > old
+
+
+def test_dry_run_writes_nothing(api, db, prefix):
+    report = upload(api, f'name,price\n{prefix} A,10\n', dry_run=True).json()
+    assert report['created'] == 1 and report['dry_run']
+    assert names_in_db(api, db, prefix) == []
+
+
+def test_row_limit_is_checked_before_any_write(api, db, prefix, monkeypatch):
+    monkeypatch.setattr(product_import, 'BATCH_SIZE', 2)
+    monkeypatch.setattr(product_import, 'MAX_IMPORT_ROWS', 3)
+    rows = ''.join(f'{prefix} {n},10\n' for n in range(4))
+    response = upload(api, f'name,price\n{rows}')
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'CSV has more than 3 rows'
+    assert names_in_db(api, db, prefix) == []
+
+
+def test_undecodable_file_is_rejected_before_any_write(api, db, prefix, monkeypatch):
+    monkeypatch.setattr(product_import, 'BATCH_SIZE', 1)
+    content = f'name,price\n{prefix} A,10\n{prefix} B,10\n'.encode('utf-8') + b'\xff\xfe,1\n'
+    response = upload(api, content)
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith('Could not read CSV')
+    assert names_in_db(api, db, prefix) == []
+
+
+def test_unknown_columns_are_rejected(api):
+    response = upload(api, 'name,price,colour\nX,1,red\n')
+    assert response.status_code == 400
+    assert 'colour' in response.json()['detail']
+
+
+def test_import_refreshes_cached_product_lists(api, prefix):
+    listed_names(api)
+    assert upload(api, f'name,price\n{prefix} A,10\n').status_code == 200
+    assert f'{prefix} A' in listed_names(api)
+
+
+def test_batches_committed_before_a_failure_are_still_published(api, db, prefix, monkeypatch):
+    monkeypatch.setattr(product_import, 'BATCH_SIZE', 1)
+    apply_batch = product_import._apply_batch
+    calls = []
+
+    async def failing_second_batch(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError('database went away')
+        return await apply_batch(*args)
+
+    monkeypatch.setattr(product_import, '_apply_batch', failing_second_batch)
+    listed_names(api)
+    with pytest.raises(RuntimeError):
+        upload(api, f'name,price\n{prefix} A,10\n{prefix} B,10\n')
+    assert names_in_db(api, db, prefix) == [f'{prefix} A']
+    assert f'{prefix} A' in listed_names(api)
+
+
+def test_cli_import_refreshes_cached_product_lists(api, prefix, tmp_path):
+    path = tmp_path / 'products.csv'
+    path.write_text(f'name,price\n{prefix} CLI,10\n', encoding='utf-8')
+    listed_names(api)
+    api.run(product_import.main(argparse.Namespace(csv_path=str(path), dry_run=False, export=False)))
+    assert f'{prefix} CLI' in listed_names(api)
+
+
+def test_export_round_trips(api, db, prefix, tmp_path):
+    upload(api, f'name,price,stock\n{prefix} A,10,3\n')
+    path = tmp_path / 'export.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        count = api.run(product_import.export_products(out))
+
+    async def total():
+        async with db() as session:
+            return await session.scalar(select(func.count(Product.id)))
+
+    assert count == api.run(total())
+    report = upload(api, path.read_text(encoding='utf-8'), dry_run=True).json()
+    assert report['errors'] == [] and report['updated'] == count
@@ -0,0 +1,82 @@
+"""product_stats refresh: targeted refreshes after moderation and a full rebuild at most once per interval."""
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+import product_filters
+from database import ProductStats, Review
+
+from .helpers import admin_token, create_product
+
+OLD = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def products(api, db):
+    async def create():
+        async with db() as session:
+            ids = [(await create_product(session, f'Rated {uuid.uuid4().hex[:6]}')).id for _ in range(2)]
+            await session.commit()
+        await product_filters.refresh_product_stats()
+        return ids
+
+    return api.run(create())
+
+
+def stats(api, db, product_id):
+    async def read():
+        async with db() as session:
+            row = await session.get(ProductStats, product_id, populate_existing=True)
+            return row.rating_count, row.refreshed_at
+
+    return api.run(read())
+
+
+def backdate(api, db):
+    async def run():
+        async with db() as session:
+            await session.execute(update(ProductStats).values(refreshed_at=OLD))
+            await session.commit()
+
+    api.run(run())
+
+
+def test_approving_a_review_refreshes_only_its_product(api, db, products):
+    rated, other = products
+
+    async def add_review():
+        async with db() as session:
+            review = Review(product_id=rated, customer_name='Reviewer', rating=4)
+            session.add(review)
+            await session.commit()
+            return review.id
+
+    review_id = api.run(add_review())
+    backdate(api, db)
+    response = api.request(
+        'PATCH', f'/api/admin/reviews/{review_id}/approve', token=admin_token(), params={'is_approved': 'true'}
+    )
+    assert response.status_code == 200
+    assert stats(api, db, rated)[0] == 1
+    assert stats(api, db, other)[1].replace(tzinfo=timezone.utc) == OLD
+
+
+def test_full_refresh_runs_once_per_interval(api, db, products):
+    # The fixture has just rebuilt every row
+    assert not api.run(product_filters.refresh_stale_product_stats())
+    backdate(api, db)
+    assert api.run(product_filters.refresh_stale_product_stats())
+    assert not api.run(product_filters.refresh_stale_product_stats())
+
+
+def test_empty_targeted_refresh_does_nothing(api, db, products):
+    backdate(api, db)
+    api.run(product_filters.refresh_product_stats([]))
+
+    async def oldest():
+        async with db() as session:
+            return await session.scalar(select(ProductStats.refreshed_at).where(ProductStats.product_id == products[0]))
+
+    assert api.run(oldest()).replace(tzinfo=timezone.utc) == OLD
@@ -0,0 +1,160 @@
+"""Query budgets for the hot endpoints, enforced with QUERY_BUDGET_STRICT.
+
+Each endpoint runs with strict budgets on, so a change that adds a query per
+row (an N+1) or a stray lookup fails here with the 500 the middleware returns
+instead of slipping through as a slower page.
+"""
+import pytest
+
+import catalog_cache
+import query_stats
+
+from .helpers import ORDER_ADDRESS, admin_token, create_product, create_user, user_token
+
+# Statements per request; a page of many rows must cost the same as a page of one
+BUDGETS = {
+    'product_list': 2,
+    'my_orders': 2,
+    'admin_orders': 2,
+}
+# A cart of any size is priced from the catalog cache plus at most one query
+QUOTE_BUDGET = 1
+QUOTE_ITEMS = 20
+# Placing an order takes one conditional stock UPDATE and one item INSERT per distinct product
+CREATE_ORDER_BUDGET = 9
+CREATE_ORDER_BUDGET_PER_PRODUCT = 2
+
+
+@pytest.fixture
+def strict_budget(monkeypatch):
+    monkeypatch.setattr(query_stats, 'QUERY_BUDGET_STRICT', True)
+
+    def set_budget(budget: int) -> None:
+        monkeypatch.setattr(query_stats, 'QUERY_BUDGET', budget)
+
+    return set_budget
+
+
+@pytest.fixture(scope='module')
+def shop(api, db):
+    async def create():
+        async with db() as session:
+            user = await create_user(session, 'budget@example.com')
+            products = [await create_product(session, f'Budget product {n}', stock=100) for n in range(5)]
+            await session.commit()
+            return user.id, [product.id for product in products]
+
+    user_id, product_ids = api.run(create())
+    return {'user_id': user_id, 'product_ids': product_ids}
+
+
+def place_order(api, shop, quantity: int = 1):
+    return api.post(
+        '/api/orders',
+        token=user_token(shop['user_id']),
+        json={'items': [{'product_id': pid, 'quantity': quantity} for pid in shop['product_ids']], **ORDER_ADDRESS},
+    )
+
+
+def query_count(response) -> int:
+    timing = response.headers['server-timing']
+    return int(timing.split('desc="')[1].split(' ')[0])
+
+
+def test_product_list_within_budget(api, shop, strict_budget):
+    strict_budget(BUDGETS['product_list'])
+    response = api.get('/api/products')
+    assert response.status_code == 200, response.text
+    assert len(response.json()) >= len(shop['product_ids'])
+
+
+def test_create_order_within_budget(api, shop, strict_budget):
+    strict_budget(CREATE_ORDER_BUDGET + CREATE_ORDER_BUDGET_PER_PRODUCT * len(shop['product_ids']))
+    response = place_order(api, shop)
+    assert response.status_code == 200, response.text
+    assert len(response.json()['items']) == len(shop['product_ids'])
+
+
+def test_order_lists_within_budget(api, shop, strict_budget):
+    for _ in range(3):
+        assert place_order(api, shop).status_code == 200
+
+    strict_budget(BUDGETS['my_orders'])
+    response = api.get('/api/orders/my-orders', token=user_token(shop['user_id']))
+    assert response.status_code == 200, response.text
+    assert len(response.json()) >= 3
+
+    strict_budget(BUDGETS['admin_orders'])
+    response = api.get('/api/admin/orders', token=admin_token())
+    assert response.status_code == 200, response.text
+    assert len(response.json()) >= 3
+
+
+def test_over_budget_fails_in_strict_mode(api, shop, strict_budget):
+    strict_budget(1)
+    response = api.get('/api/orders/my-orders', token=user_token(shop['user_id']))
+    assert response.status_code == 500
+    assert 'Query budget exceeded' in response.json()['detail']
+    assert query_count(response) > 1
+
+
+def test_over_budget_only_reported_when_not_strict(api, shop, monkeypatch):
+    monkeypatch.setattr(query_stats, 'QUERY_BUDGET', 1)
+    response = api.get('/api/orders/my-orders', token=user_token(shop['user_id']))
+    assert response.status_code == 200
+    assert query_count(response) > 1
+
+
+@pytest.fixture(scope='module')
+def big_cart(api, db):
+    async def create():
+        async with db() as session:
+            user = await create_user(session, 'quote-budget@example.com')
+            products = [await create_product(session, f'Quote product {n}', stock=50) for n in range(QUOTE_ITEMS)]
+            await session.commit()
+            return user.id, [product.id for product in products]
+
+    user_id, product_ids = api.run(create())
+    return {'user_id': user_id, 'product_ids': product_ids}
+
+
+def quote(api, big_cart, token=None):
+    return api.post(
+        '/api/cart/quote', token=token,
+        json={'items': [{'product_id': pid, 'quantity': 2} for pid in big_cart['product_ids']]},
+    )
+
+
+def test_cart_quote_within_budget_cold_and_warm(api, big_cart, strict_budget):
+    user_id, product_ids = big_cart['user_id'], big_cart['product_ids']
+    token = user_token(user_id)
+    response = api.request(
+        'PUT', '/api/cart/reservations', token=token,
+        json={'items': [{'product_id': pid, 'quantity': 3} for pid in product_ids[:5]]},
+    )
+    assert response.status_code == 200, response.text
+    strict_budget(QUOTE_BUDGET)
+
+    catalog_cache.catalog_cache.invalidate()
+    cold = quote(api, big_cart, token)
+    assert cold.status_code == 200, cold.text
+    assert query_count(cold) == 1
+    warm = quote(api, big_cart, token)
+    assert query_count(warm) == 1
+    for response in (cold, warm):
+        stock = {line['product_id']: line['available_stock'] for line in response.json()['items']}
+        # Others see 47 of the held products; the customer holding them sees all 50
+        assert set(stock.values()) == {50}
+        assert len(stock) == QUOTE_ITEMS
+
+    # Half cached, half not: still one query, holds included
+    catalog_cache.catalog_cache.invalidate(product_ids[::2])
+    partial = quote(api, big_cart, token)
+    assert query_count(partial) == 1
+    assert {line['available_stock'] for line in partial.json()['items']} == {50}
+
+    catalog_cache.catalog_cache.invalidate()
+    assert query_count(quote(api, big_cart)) == 1
+    guest = quote(api, big_cart)
+    assert query_count(guest) == 0
+    assert {line['available_stock'] for line in guest.json()['items'][:5]} == {47}
@@ -0,0 +1,184 @@
+"""Cart reservations: holding stock, consuming holds at checkout, expiry and reconciliation."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select, update
+
+import reservations
+from database import InventoryReservation, Product
+
+from .helpers import ORDER_ADDRESS, create_product, create_user, user_token
+
+
+@pytest.fixture
+def shop(api, db):
+    async def create():
+        async with db() as session:
+            users = [await create_user(session, f'hold{n}-{datetime.now().timestamp()}@example.com') for n in range(2)]
+            products = [await create_product(session, f'Held product {n}', stock=10) for n in range(2)]
+            await session.commit()
+            return [user.id for user in users], [product.id for product in products]
+
+    user_ids, product_ids = api.run(create())
+    return {'user_ids': user_ids, 'product_ids': product_ids}
+
+
+def counters(api, db, product_id):
+    async def read():
+        async with db() as session:
+            product = await session.get(Product, product_id)
+            return product.stock, product.reserved
+
+    return api.run(read())
+
+
+def holds(api, db, user_id):
+    async def read():
+        async with db() as session:
+            result = await session.execute(
+                select(InventoryReservation.product_id, InventoryReservation.quantity)
+                .where(InventoryReservation.user_id == user_id)
+            )
+            return dict(result.all())
+
+    return api.run(read())
+
+
+def expire_holds(api, db, user_id):
+    async def expire():
+        async with db() as session:
+            await session.execute(
+                update(InventoryReservation)
+                .where(InventoryReservation.user_id == user_id)
+                .values(expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+            )
+            await session.commit()
+
+    api.run(expire())
+
+
+def reserve(api, user_id, items):
+    return api.request(
+        'PUT', '/api/cart/reservations', token=user_token(user_id),
+        json={'items': [{'product_id': pid, 'quantity': qty} for pid, qty in items.items()]},
+    )
+
+
+def order(api, user_id, items):
+    return api.post(
+        '/api/orders', token=user_token(user_id),
+        json={'items': [{'product_id': pid, 'quantity': qty} for pid, qty in items.items()], **ORDER_ADDRESS},
+    )
+
+
+def test_holds_reduce_available_stock_for_others(api, db, shop):
+    (alice, bob), (first, _) = shop['user_ids'], shop['product_ids']
+    assert reserve(api, alice, {first: 8}).status_code == 200
+    assert counters(api, db, first) == (10, 8)
+
+    response = reserve(api, bob, {first: 5})
+    assert response.status_code == 200
+    assert response.json()['shortfalls'] == [{'product_id': first, 'requested': 5, 'reserved': 0}]
+    assert order(api, bob, {first: 3}).status_code == 400
+    assert order(api, bob, {first: 2}).status_code == 200
+    assert counters(api, db, first) == (8, 8)
+
+
+def test_changing_the_cart_releases_dropped_products(api, db, shop):
+    alice, (first, second) = shop['user_ids'][0], shop['product_ids']
+    reserve(api, alice, {first: 2, second: 3})
+    reserve(api, alice, {second: 1})
+    assert holds(api, db, alice) == {second: 1}
+    assert counters(api, db, first) == (10, 0)
+    assert counters(api, db, second) == (10, 1)
+
+
+def test_order_consumes_holds_and_releases_the_rest(api, db, shop):
+    alice, (first, second) = shop['user_ids'][0], shop['product_ids']
+    reserve(api, alice, {first: 4, second: 2})
+    response = order(api, alice, {first: 4})
+    assert response.status_code == 200, response.text
+    assert counters(api, db, first) == (6, 0)
+    assert counters(api, db, second) == (10, 0)
+    assert holds(api, db, alice) == {}
+
+
+def test_failed_order_keeps_holds(api, db, shop):
+    alice, (first, second) = shop['user_ids'][0], shop['product_ids']
+    reserve(api, alice, {first: 4, second: 2})
+    response = order(api, alice, {first: 4, second: 11})
+    assert response.status_code == 400
+    assert counters(api, db, first) == (10, 4)
+    assert holds(api, db, alice) == {first: 4, second: 2}
+
+
+def test_sweeper_returns_expired_holds(api, db, shop):
+    alice, first = shop['user_ids'][0], shop['product_ids'][0]
+    reserve(api, alice, {first: 3})
+
+    expire_holds(api, db, alice)
+    assert api.run(reservations.sweep_expired()) >= 1
+    assert counters(api, db, first) == (10, 0)
+    assert holds(api, db, alice) == {}
+
+
+def test_reconcile_fixes_holds_removed_behind_its_back(api, db, shop):
+    alice, (first, second) = shop['user_ids'][0], shop['product_ids']
+    reserve(api, alice, {first: 3, second: 1})
+
+    async def cascade():
+        # What ON DELETE CASCADE does when the user is deleted
+        async with db() as session:
+            await session.execute(delete(InventoryReservation).where(InventoryReservation.user_id == alice))
+            await session.commit()
+
+    api.run(cascade())
+    assert counters(api, db, first) == (10, 3)
+    fixed = api.run(reservations.reconcile_reserved())
+    assert {first, second} <= set(fixed)
+    assert counters(api, db, first) == (10, 0)
+    assert counters(api, db, second) == (10, 0)
+    assert api.run(reservations.reconcile_reserved()) == []
+
+
+def test_stock_changes_leave_sitemap_shards_alone(api, db, shop):
+    import generate_sitemap
+
+    alice, (first, second) = shop['user_ids'][0], shop['product_ids']
+
+    async def buckets():
+        async with db() as session:
+            return await generate_sitemap.product_buckets(session)
+
+    async def backdate():
+        async with db() as session:
+            await session.execute(update(Product).values(updated_at=datetime(2025, 1, 1, tzinfo=timezone.utc)))
+            await session.commit()
+
+    api.run(backdate())
+    before = api.run(buckets())
+    reserve(api, alice, {first: 2, second: 1})
+    assert order(api, alice, {first: 2}).status_code == 200
+    api.run(reservations.reconcile_reserved())
+    assert api.run(buckets()) == before
+
+
+def test_listed_stock_follows_holds(api, db, shop):
+    alice, first = shop['user_ids'][0], shop['product_ids'][0]
+
+    def listed_stock():
+        response = api.get('/api/products', params={'limit': 200})
+        return next(p['available_stock'] for p in response.json() if p['id'] == first)
+
+    assert listed_stock() == 10
+    reserve(api, alice, {first: 4})
+    assert listed_stock() == 6
+    assert api.request('DELETE', '/api/cart/reservations', token=user_token(alice)).status_code == 200
+    assert listed_stock() == 10
+
+    reserve(api, alice, {first: 3})
+    assert listed_stock() == 7
+
+    expire_holds(api, db, alice)
+    api.run(reservations.sweep_expired())
+    assert listed_stock() == 10
@@ -0,0 +1,164 @@
+"""Single-flight read cache: coalescing, stale-while-revalidate, failures and invalidation."""
+import asyncio
+import itertools
+import uuid
+
+import pytest
+
+import cache_bus
+from single_flight import SingleFlightCache
+
+from .helpers import ORDER_ADDRESS, create_product, create_user, user_token
+
+TTL = 10
+STALE_TTL = 60
+
+
+@pytest.fixture
+def cache():
+    return SingleFlightCache(f'test-{uuid.uuid4().hex[:8]}', TTL, STALE_TTL)
+
+
+def age(cache, key, seconds):
+    """Pretend the entry for key was loaded `seconds` earlier than it was."""
+    loaded_at, value = cache._entries[key]
+    cache._entries[key] = (loaded_at - seconds, value)
+
+
+class Loader:
+    def __init__(self, delay=0.01, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+        self.values = itertools.count(1)
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('load failed')
+        return next(self.values)
+
+
+def test_concurrent_misses_share_one_load(loop, cache):
+    load = Loader()
+
+    async def run():
+        return await asyncio.gather(*(cache.get('key', load) for _ in range(50)))
+
+    assert loop.run_until_complete(run()) == [1] * 50
+    assert load.calls == 1
+    assert (cache.misses, cache.coalesced) == (1, 49)
+    assert loop.run_until_complete(cache.get('key', load)) == 1
+    assert cache.hits == 1
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(loop, cache):
+    load = Loader()
+    loop.run_until_complete(cache.get('key', load))
+    age(cache, 'key', TTL + 1)
+
+    async def run():
+        stale = await asyncio.gather(*(cache.get('key', load) for _ in range(10)))
+        await asyncio.sleep(0.05)
+        return stale, await cache.get('key', load)
+
+    stale, fresh = loop.run_until_complete(run())
+    assert stale == [1] * 10
+    assert fresh == 2
+    assert load.calls == 2
+    assert cache.stale_hits == 10
+
+
+def test_entry_past_the_stale_window_is_a_miss(loop, cache):
+    load = Loader()
+    loop.run_until_complete(cache.get('key', load))
+    age(cache, 'key', TTL + STALE_TTL + 1)
+    assert loop.run_until_complete(cache.get('key', load)) == 2
+    assert cache.stale_hits == 0
+
+
+def test_nothing_stale_while_evictions_are_not_delivered(loop, cache, monkeypatch):
+    load = Loader()
+    loop.run_until_complete(cache.get('key', load))
+    age(cache, 'key', TTL + 1)
+    monkeypatch.setattr(cache_bus, 'reliable', lambda: False)
+    assert loop.run_until_complete(cache.get('key', load)) == 2
+
+
+def test_failed_loads_are_not_cached(loop, cache):
+    load = Loader(fail=True)
+
+    async def run():
+        return await asyncio.gather(*(cache.get('key', load) for _ in range(5)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in loop.run_until_complete(run()))
+    assert load.calls == 1
+    load.fail = False
+    assert loop.run_until_complete(cache.get('key', load)) == 1
+
+
+def test_failed_refresh_keeps_the_stale_entry(loop, cache):
+    load = Loader()
+    loop.run_until_complete(cache.get('key', load))
+    age(cache, 'key', TTL + 1)
+    load.fail = True
+
+    async def run():
+        first = await cache.get('key', load)
+        await asyncio.sleep(0.05)
+        return first, await cache.get('key', load)
+
+    assert loop.run_until_complete(run()) == (1, 1)
+
+
+def test_load_started_before_invalidation_is_not_stored(loop, cache):
+    load = Loader(delay=0.05)
+
+    async def run():
+        before = asyncio.ensure_future(cache.get('key', load))
+        await asyncio.sleep(0.01)
+        cache.invalidate()
+        after = await cache.get('key', load)
+        return await before, after
+
+    assert loop.run_until_complete(run()) == (1, 2)
+    assert loop.run_until_complete(cache.get('key', load)) == 2
+    assert load.calls == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_load(loop, cache):
+    load = Loader(delay=0.05)
+
+    async def run():
+        first = asyncio.ensure_future(cache.get('key', load))
+        second = asyncio.ensure_future(cache.get('key', load))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert loop.run_until_complete(run()) == 1
+    assert load.calls == 1
+
+
+def test_orders_refresh_listed_stock(api, db):
+    async def create():
+        async with db() as session:
+            user = await create_user(session, f'lists-{uuid.uuid4().hex[:8]}@example.com')
+            product = await create_product(session, f'Listed {uuid.uuid4().hex[:6]}', stock=3)
+            await session.commit()
+            return user.id, product.id
+
+    user_id, product_id = api.run(create())
+
+    def listed_stock():
+        response = api.get('/api/products', params={'limit': 200})
+        return next(p['available_stock'] for p in response.json() if p['id'] == product_id)
+
+    assert listed_stock() == 3
+    response = api.post(
+        '/api/orders', token=user_token(user_id),
+        json={'items': [{'product_id': product_id, 'quantity': 3}], **ORDER_ADDRESS},
+    )
+    assert response.status_code == 200, response.text
+    assert listed_stock() == 0
@@ -0,0 +1,59 @@
+"""Slow query log: which worst-case statements may run under EXPLAIN ANALYZE, and shared timing."""
+import pytest
+from sqlalchemy import select
+
+import slow_query_log
+from database import Product
+
+from .helpers import admin_token
+
+
+@pytest.mark.parametrize('statement', [
+    'SELECT products.id, products.name FROM products WHERE products.id = $1',
+    'SELECT count(*) FROM orders JOIN order_items ON order_items.order_id = orders.id',
+    '  select id from reviews where product_id = $1 order by created_at desc limit 20',
+])
+def test_plain_reads_are_analyzed(statement):
+    assert slow_query_log.can_analyze(statement)
+
+
+@pytest.mark.parametrize('statement', [
+    'SELECT pg_advisory_lock($1)',
+    'SELECT pg_notify($1, $2)',
+    "SELECT nextval('orders_id_seq')",
+    'SELECT 1',
+    'SELECT orders.id FROM orders WHERE orders.id IN ($1, $2) ORDER BY orders.id FOR UPDATE',
+    'SELECT cart_reservations.id FROM cart_reservations FOR UPDATE SKIP LOCKED',
+    'SELECT id FROM products FOR NO KEY UPDATE',
+    'SELECT pg_try_advisory_xact_lock(id) FROM products',
+    'UPDATE products SET stock = stock - 1 WHERE id = $1',
+])
+def test_side_effects_and_locks_are_only_planned(statement):
+    assert not slow_query_log.can_analyze(statement)
+
+
+def test_statements_are_recorded_once(loop, db):
+    slow_query_log.reset()
+
+    async def run():
+        async with db() as session:
+            await session.execute(select(Product.id).where(Product.id == 1))
+
+    loop.run_until_complete(run())
+    recorded = [stats for stats in slow_query_log.top_fingerprints(100) if 'FROM products' in stats.statement]
+    assert len(recorded) == 1
+    assert recorded[0].count == 1
+
+
+@pytest.mark.parametrize('params', [{'sort': 'slowest'}, {'limit': 0}, {'limit': 101}])
+def test_report_rejects_unknown_sort_and_out_of_range_limit(api, params):
+    response = api.get('/api/admin/metrics/slow-queries', token=admin_token(), params=params)
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize('sort', sorted(slow_query_log.SORT_KEYS))
+def test_report_sorts_by_each_key(api, sort):
+    response = api.get('/api/admin/metrics/slow-queries', token=admin_token(), params={'sort': sort, 'limit': 5})
+    assert response.status_code == 200
+    assert response.json()['sort'] == sort
+    assert len(response.json()['fingerprints']) <= 5
@@ -0,0 +1,68 @@
+"""Byte ranges and caching headers for uploaded files."""
+import httpx
+import pytest
+
+from static_files import CachedStaticFiles, parse_byte_range
+
+SIZE = 1000
+HASHED_NAME = 'a' * 40 + '.jpg'
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, SIZE - 1)),
+    ('bytes=-100', (SIZE - 100, SIZE - 1)),
+    ('bytes=-5000', (0, SIZE - 1)),
+    ('bytes=900-5000', (900, SIZE - 1)),
+    ('BYTES = 0-0', (0, 0)),
+])
+def test_single_ranges(header, expected):
+    assert parse_byte_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=0-1,5-9', 'items=0-9', 'bytes=abc', 'bytes=a-b'])
+def test_ranges_served_in_full(header):
+    assert parse_byte_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=50-10', 'bytes=-0', 'bytes=5-x'])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, SIZE)
+
+
+@pytest.fixture
+def files(tmp_path, loop):
+    (tmp_path / HASHED_NAME).write_bytes(bytes(range(256)) * 4)
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=CachedStaticFiles(directory=str(tmp_path))), base_url='http://test'
+    )
+    yield lambda path, **headers: loop.run_until_complete(client.get(path, headers=headers))
+    loop.run_until_complete(client.aclose())
+
+
+def test_partial_content(files):
+    response = files(f'/{HASHED_NAME}', range='bytes=10-19')
+    assert response.status_code == 206
+    assert response.headers['content-range'] == f'bytes 10-19/{1024}'
+    assert response.content == bytes(range(10, 20))
+
+
+def test_unsatisfiable_range_is_416(files):
+    response = files(f'/{HASHED_NAME}', range='bytes=5000-')
+    assert response.status_code == 416
+    assert response.headers['content-range'] == 'bytes */1024'
+
+
+def test_stale_if_range_gets_full_body(files):
+    response = files(f'/{HASHED_NAME}', range='bytes=10-19', **{'if-range': '"something-else"'})
+    assert response.status_code == 200
+    assert len(response.content) == 1024
+
+
+def test_content_hashed_names_are_immutable(files):
+    response = files(f'/{HASHED_NAME}')
+    assert response.headers['cache-control'] == 'public, max-age=31536000, immutable'
+    assert response.headers['etag'] == f'"{"a" * 40}"'
+    assert 'content-encoding' not in response.headers
+    assert files(f'/{HASHED_NAME}', **{'if-none-match': response.headers['etag']}).status_code == 304
@@ -0,0 +1,16 @@
+"""Synthetic data generator: order timestamps stay in the past."""
+import random
+from datetime import datetime, timedelta, timezone
+
+import synthetic_data
+
+
+def test_order_timestamps_are_never_in_the_future():
+    rng = random.Random(7)
+    # Early morning, when most of today's daytime peak is still ahead
+    now = datetime(2026, 3, 10, 6, 30, tzinfo=timezone.utc)
+    stamps = [synthetic_data.order_timestamp(rng, now, days=30) for _ in range(20_000)]
+    assert max(stamps) <= now
+    assert min(stamps) >= now - timedelta(days=31)
+    # The newest day still gets orders, so the pending/processing bucket is populated
+    assert any(now - stamp < timedelta(days=1) for stamp in stamps)